@@ -0,0 +1,403 @@
+"""
+Balance and Transfer Alerts
+Evaluates alert rules on every newly stored transaction against running
+balances kept in memory, and delivers batched alerts to pluggable sinks
+
+Rules are loaded from the JSON file named by ALERT_RULES_FILE:
+    
+    {
+        "rules": [
+            {"type": "balance_below", "wallet": "0xabc...", "asset": "USDC", "threshold": "250000"},
+            {"type": "large_transfer", "asset": "ETH", "min_amount": "50", "direction": "outgoing"}
+        ],
+        "sinks": [
+            {"type": "log"},
+            {"type": "webhook", "url": "https://hooks.example.com/treasury"},
+            {"type": "file", "path": "alerts.jsonl"}
+        ]
+    }
+
+"wallet", "network" and "asset" are optional filters on every rule.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from database_service import EXACT_CONTEXT
+
+logger = logging.getLogger(__name__)
+
+
+RULE_TYPES = ('balance_below', 'large_transfer')
+TRANSFER_DIRECTIONS = ('incoming', 'outgoing', 'any')
+
+
+def _decimal(value, field: str) -> Decimal:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid {field}: {value!r}")
+
+
+class AlertRule:
+    """One alert condition, optionally restricted to a wallet, network and asset"""
+    
+    def __init__(self, rule_type: str, name: Optional[str] = None, wallet: Optional[str] = None,
+                 network: Optional[str] = None, asset: Optional[str] = None, threshold=None,
+                 min_amount=None, min_usd=None, direction: str = 'outgoing'):
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type '{rule_type}'. Use one of: {', '.join(RULE_TYPES)}")
+        if direction not in TRANSFER_DIRECTIONS:
+            raise ValueError(f"Invalid direction '{direction}'. Use one of: {', '.join(TRANSFER_DIRECTIONS)}")
+        
+        self.type = rule_type
+        self.wallet = wallet.lower() if wallet else None
+        self.network = network
+        self.asset = asset.upper() if asset else None
+        self.direction = direction
+        self.threshold = self.min_amount = self.min_usd = None
+        
+        if rule_type == 'balance_below':
+            if threshold is None or not self.asset:
+                raise ValueError("balance_below rules need an asset and a threshold")
+            self.threshold = _decimal(threshold, 'threshold')
+        else:
+            if min_amount is None and min_usd is None:
+                raise ValueError("large_transfer rules need min_amount or min_usd")
+            if min_amount is not None:
+                self.min_amount = _decimal(min_amount, 'min_amount')
+            if min_usd is not None:
+                self.min_usd = _decimal(min_usd, 'min_usd')
+        
+        self.name = name or '_'.join(
+            part for part in (rule_type, self.wallet, self.network, self.asset) if part
+        )
+    
+    @classmethod
+    def from_dict(cls, config: Dict) -> 'AlertRule':
+        config = dict(config)
+        return cls(config.pop('type', None), **config)
+    
+    def applies_to(self, wallet_address: str, network: str, asset: str) -> bool:
+        if self.wallet and self.wallet != (wallet_address or '').lower():
+            return False
+        if self.network and self.network != network:
+            return False
+        if self.asset and self.asset != (asset or '').upper():
+            return False
+        return True
+    
+    def is_large_transfer(self, row: Dict) -> bool:
+        if self.direction != 'any' and row['direction'] != self.direction:
+            return False
+        if self.min_amount is not None and Decimal(str(row['value'])) >= self.min_amount:
+            return True
+        if self.min_usd is not None and row.get('usdValue') is not None:
+            try:
+                return Decimal(str(row['usdValue'])) >= self.min_usd
+            except InvalidOperation:
+                return False
+        return False
+
+
+class LogSink:
+    """Writes alerts to the application log"""
+    
+    def send(self, alerts: List[Dict]):
+        for alert in alerts:
+            logger.warning(f"🚨 {alert['message']}")
+
+
+class WebhookSink:
+    """POSTs each batch as {"alerts": [...]} to a webhook URL, giving up after timeout seconds"""
+    
+    def __init__(self, url: str, timeout: float = 5, headers: Optional[Dict] = None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+    
+    def send(self, alerts: List[Dict]):
+        response = requests.post(self.url, json={'alerts': alerts}, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class FileSink:
+    """Appends alerts to a local file, one JSON object per line"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def send(self, alerts: List[Dict]):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            for alert in alerts:
+                handle.write(json.dumps(alert) + '\n')
+
+
+SINK_TYPES = {
+    'log': LogSink,
+    'webhook': WebhookSink,
+    'file': FileSink,
+}
+
+
+def sink_from_dict(config: Dict):
+    config = dict(config)
+    sink_type = config.pop('type', None)
+    if sink_type not in SINK_TYPES:
+        raise ValueError(f"Unknown sink type '{sink_type}'. Use one of: {', '.join(SINK_TYPES)}")
+    return SINK_TYPES[sink_type](**config)
+
+
+class AlertEngine:
+    """
+    Incremental rule evaluation over newly stored transactions
+    
+    Running balances are kept per (walletId, network, asset). The first time
+    a (wallet, network) pair is observed its balances are seeded with one
+    aggregate query, which already includes the rows just stored; after
+    that each new row only adjusts the balance in memory. Balances are
+    re-seeded after resync_interval seconds so rows stored by another
+    process are picked up.
+    
+    balance_below rules fire when a balance crosses under the threshold and
+    re-arm once it is back at or above it. Alerts with the same key (rule,
+    wallet, network, asset and, for transfers, hash) are suppressed for
+    dedup_window seconds. Pending alerts are delivered to every sink by the
+    flusher thread once batch_size accumulate or batch_interval seconds
+    pass; observe only queues them, so a slow webhook never holds up
+    ingestion. At most max_pending alerts wait for delivery; beyond that
+    the oldest are dropped.
+    """
+    
+    def __init__(self, database_service, rules: List[AlertRule], sinks: Optional[List] = None,
+                 dedup_window: int = 3600, batch_size: int = 50, batch_interval: float = 30,
+                 resync_interval: int = 3600, max_pending: int = 10000):
+        self.db = database_service
+        self.rules = rules
+        self.sinks = sinks or [LogSink()]
+        self.dedup_window = dedup_window
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.resync_interval = resync_interval
+        self.max_pending = max_pending
+        self._balances: Dict[Tuple[str, str], Dict] = {}
+        self._below: Dict[Tuple[str, str, str, str], bool] = {}
+        self._sent: Dict[tuple, float] = {}
+        self._pending: List[Dict] = []
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+    
+    def _seed(self, wallet_id: str, network: str) -> Dict[str, Decimal]:
+        return self.db.get_wallet_balances(wallet_id, network=network)
+    
+    def _running_balances(self, wallet_id: str, network: str, rows: List[Dict]) -> Dict[str, Decimal]:
+        """Balances of a (wallet, network) pair after rows, which are already stored"""
+        key = (wallet_id, network)
+        state = self._balances.get(key)
+        
+        if state is None or time.time() - state['seeded_at'] > self.resync_interval:
+            state = {'balances': self._seed(wallet_id, network), 'seeded_at': time.time()}
+            self._balances[key] = state
+            return state['balances']
+        
+        balances = state['balances']
+        for row in rows:
+            value = Decimal(str(row['value']))
+            balance = balances.get(row['asset'], Decimal('0'))
+            if row['direction'] == 'incoming':
+                balances[row['asset']] = EXACT_CONTEXT.add(balance, value)
+            else:
+                balances[row['asset']] = EXACT_CONTEXT.subtract(balance, value)
+        return balances
+    
+    def _queue(self, alerts: List[Dict], dedup_key: tuple, alert: Dict):
+        now = time.time()
+        last_sent = self._sent.get(dedup_key)
+        if last_sent is not None and now - last_sent < self.dedup_window:
+            return
+        self._sent[dedup_key] = now
+        alerts.append(alert)
+    
+    def observe(self, wallet_id: str, wallet_address: str, rows: List[Dict]):
+        """
+        Evaluate the rules against transaction_history rows that were just stored
+        
+        Args:
+            wallet_id: Wallet ID (UUID) the rows belong to
+            wallet_address: Wallet address, used by rule wallet filters and messages
+            rows: Row dicts with network, asset, value, direction, usdValue, hash and timestamp
+        """
+        if not rows or not self.rules:
+            return
+        
+        by_network: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_network.setdefault(row['network'], []).append(row)
+        
+        alerts = []
+        with self._lock:
+            for network, network_rows in by_network.items():
+                for row in network_rows:
+                    for rule in self.rules:
+                        if rule.type != 'large_transfer' or not rule.applies_to(wallet_address, network, row['asset']):
+                            continue
+                        if rule.is_large_transfer(row):
+                            self._queue(alerts, (rule.name, wallet_id, network, row['asset'], row['hash']), {
+                                'rule': rule.name,
+                                'type': rule.type,
+                                'wallet_address': wallet_address,
+                                'network': network,
+                                'asset': row['asset'],
+                                'direction': row['direction'],
+                                'amount': str(row['value']),
+                                'usd_value': str(row['usdValue']) if row.get('usdValue') is not None else None,
+                                'hash': row['hash'],
+                                'timestamp': str(row['timestamp']),
+                                'observed_at': datetime.utcnow().isoformat() + 'Z',
+                                'message': (
+                                    f"Large {row['direction']} transfer of {row['value']} {row['asset']} "
+                                    f"on {network} for {wallet_address} ({row['hash']})"
+                                )
+                            })
+                
+                threshold_rules = [
+                    rule for rule in self.rules
+                    if rule.type == 'balance_below' and rule.applies_to(wallet_address, network, rule.asset)
+                ]
+                if not threshold_rules:
+                    continue
+                
+                balances = self._running_balances(wallet_id, network, network_rows)
+                touched = {row['asset'].upper() for row in network_rows}
+                for rule in threshold_rules:
+                    if rule.asset not in touched:
+                        continue
+                    balance = sum(
+                        (amount for asset, amount in balances.items() if asset.upper() == rule.asset),
+                        Decimal('0')
+                    )
+                    state_key = (rule.name, wallet_id, network, rule.asset)
+                    was_below = self._below.get(state_key, False)
+                    is_below = balance < rule.threshold
+                    self._below[state_key] = is_below
+                    if is_below and not was_below:
+                        self._queue(alerts, state_key, {
+                            'rule': rule.name,
+                            'type': rule.type,
+                            'wallet_address': wallet_address,
+                            'network': network,
+                            'asset': rule.asset,
+                            'balance': str(balance),
+                            'threshold': str(rule.threshold),
+                            'observed_at': datetime.utcnow().isoformat() + 'Z',
+                            'message': (
+                                f"{rule.asset} balance of {wallet_address} on {network} is {balance}, "
+                                f"below {rule.threshold}"
+                            )
+                        })
+            
+            self._pending.extend(alerts)
+            dropped = len(self._pending) - self.max_pending
+            if dropped > 0:
+                del self._pending[:dropped]
+            full = len(self._pending) >= self.batch_size
+        
+        if dropped > 0:
+            logger.warning(f"Alert queue is full, dropped the {dropped} oldest alerts")
+        if full:
+            self.start()
+            self._wake.set()
+    
+    def flush(self) -> int:
+        """
+        Deliver pending alerts to every sink
+        
+        Returns:
+            int: Alerts delivered
+        """
+        with self._deliver_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                cutoff = time.time() - self.dedup_window
+                self._sent = {key: sent_at for key, sent_at in self._sent.items() if sent_at >= cutoff}
+            if not batch:
+                return 0
+            
+            for sink in self.sinks:
+                try:
+                    sink.send(batch)
+                except Exception as e:
+                    logger.warning(f"Alert sink {type(sink).__name__} failed for {len(batch)} alerts: {str(e)}")
+            return len(batch)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.batch_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+    
+    def start(self):
+        """Deliver pending alerts every batch_interval seconds, or as soon as a batch is full, in a daemon thread"""
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-flusher', daemon=True)
+                self._thread.start()
+    
+    def close(self, timeout: float = 30):
+        """Stop the flusher thread and deliver whatever is pending, waiting at most timeout seconds"""
+        self._stop.set()
+        self._wake.set()
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=timeout)
+        else:
+            self.flush()
+
+
+def load_alert_config(path: str) -> Tuple[List[AlertRule], List]:
+    """Rules and sinks from an alert config file"""
+    with open(path, 'r', encoding='utf-8') as handle:
+        config = json.load(handle)
+    rules = [AlertRule.from_dict(rule) for rule in config.get('rules', [])]
+    sinks = [sink_from_dict(sink) for sink in config.get('sinks', [])]
+    return rules, sinks
+
+
+def alert_engine_from_env(database_service) -> Optional[AlertEngine]:
+    """AlertEngine from ALERT_RULES_FILE and the ALERT_* settings, or None when alerts are not configured"""
+    path = os.getenv('ALERT_RULES_FILE')
+    if not path:
+        return None
+    
+    try:
+        rules, sinks = load_alert_config(path)
+    except Exception as e:
+        logger.error(f"❌ Could not load alert rules from {path}: {str(e)}")
+        return None
+    
+    if os.getenv('ALERT_WEBHOOK_URL'):
+        sinks.append(WebhookSink(os.getenv('ALERT_WEBHOOK_URL'), timeout=float(os.getenv('ALERT_WEBHOOK_TIMEOUT', '5'))))
+    
+    logger.info(f"🚨 Loaded {len(rules)} alert rules from {path}")
+    return AlertEngine(
+        database_service,
+        rules,
+        sinks,
+        dedup_window=int(os.getenv('ALERT_DEDUP_WINDOW', '3600')),
+        batch_interval=float(os.getenv('ALERT_BATCH_INTERVAL', '30'))
+    )
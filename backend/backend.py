@@ -1,14 +1,27 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from blockchain_service import BlockchainService
 from database_service import DatabaseService
+from daily_balances import DailyBalanceService
+from wallet_registry import WalletRegistry
+from statement_cache import StatementCache
+from mirror_service import MirrorService, DEFAULT_MIRROR_PATH
+from ingestion_service import TransactionIngestor
+from monitor import AccountMonitor, monitor_settings_from_env
+from alerts import alert_engine_from_env
 from currency_service import CurrencyExchangeService
+from price_history import PriceHistoryStore, DEFAULT_PRICE_HISTORY_PATH
+from price_cache import PriceCache, DEFAULT_PRICE_CACHE_PATH
 # from pdf_generator import PDFReportGenerator  # Old RPC-based generator
 from csv_generator import CSVGenerator
+from arrow_exporter import ArrowStatementExporter, EXPORT_FORMATS
+from xlsx_generator import XLSXGenerator, XLSX_MIMETYPE
 import os
 from dotenv import load_dotenv
 import logging
-import io
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal
 
 load_dotenv()
 
@@ -30,6 +43,18 @@ DB_PORT = int(os.getenv('DB_PORT', '3306'))
 DB_USER = os.getenv('DB_USER', 'root')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'nobicuan888')
 DB_NAME = os.getenv('DB_NAME', 'nobi_wallet_tracker')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+DB_PING_AFTER_IDLE = float(os.getenv('DB_PING_AFTER_IDLE', '60'))
+DB_DAILY_BALANCES = os.getenv('DB_DAILY_BALANCES', 'False').lower() == 'true'
+WALLET_REGISTRY_REFRESH = int(os.getenv('WALLET_REGISTRY_REFRESH', '300'))
+STATEMENT_CACHE_SIZE = int(os.getenv('STATEMENT_CACHE_SIZE', '256'))
+STATEMENT_CACHE_TTL = int(os.getenv('STATEMENT_CACHE_TTL', '900'))
+DB_READ_MODE = os.getenv('DB_READ_MODE', 'remote').lower()
+DB_MIRROR_PATH = os.getenv('DB_MIRROR_PATH', DEFAULT_MIRROR_PATH)
+LIVE_INGESTION = os.getenv('LIVE_INGESTION', 'False').lower() == 'true'
+MONITOR_IN_PROCESS = os.getenv('MONITOR_IN_PROCESS', 'False').lower() == 'true'
 
 if not ETHERSCAN_API_KEY:
     logger.warning("ETHERSCAN_API_KEY not found in environment variables!")
@@ -47,9 +72,17 @@ blockchain_service = BlockchainService(
     tronscan_api_key=TRONSCAN_API_KEY,
     cardanoscan_api_key=CARDANOSCAN_API_KEY
 )
-currency_service = CurrencyExchangeService()
+currency_service = CurrencyExchangeService(
+    price_history=PriceHistoryStore(
+        os.getenv('PRICE_HISTORY_PATH', DEFAULT_PRICE_HISTORY_PATH),
+        api_key=os.getenv('COINGECKO_API_KEY')
+    ),
+    price_cache=PriceCache(os.getenv('PRICE_CACHE_PATH', DEFAULT_PRICE_CACHE_PATH))
+)
 # pdf_generator = PDFReportGenerator()  # Old generator - now using database-based generation
 csv_generator = CSVGenerator()
+arrow_exporter = ArrowStatementExporter()
+xlsx_generator = XLSXGenerator()
 
 # Initialize database service
 database_service = DatabaseService(
@@ -57,14 +90,72 @@ database_service = DatabaseService(
     port=DB_PORT,
     username=DB_USER,
     password=DB_PASSWORD,
-    database=DB_NAME
+    database=DB_NAME,
+    pool_size=DB_POOL_SIZE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+    ping_after_idle=DB_PING_AFTER_IDLE
 )
 
 # Connect to database on startup
 if not database_service.connect():
     logger.error("Failed to connect to database on startup!")
 else:
-    logger.info("✅ Database service connected successfully")
+    logger.info(f"✅ Database service connected successfully (pool size {DB_POOL_SIZE})")
+    
+    # Resolve wallet addresses from memory instead of querying wallets per request
+    database_service.wallet_registry = WalletRegistry(database_service, refresh_interval=WALLET_REGISTRY_REFRESH)
+    try:
+        database_service.wallet_registry.load()
+    except Exception as e:
+        logger.warning(f"Wallet registry will load on first use: {str(e)}")
+
+# Reuse computed statements until the wallet's history watermark moves
+if STATEMENT_CACHE_SIZE > 0:
+    database_service.statement_cache = StatementCache(max_entries=STATEMENT_CACHE_SIZE, ttl=STATEMENT_CACHE_TTL)
+
+# Answer opening balances from the daily_balances rollup (maintained by daily_balances.py)
+if DB_DAILY_BALANCES:
+    database_service.daily_balances = DailyBalanceService(database_service)
+    logger.info("📅 Daily balance rollup enabled for opening balances")
+
+# Serve statements from the local Parquet mirror (synced by mirror_service.py)
+if DB_READ_MODE == 'mirror':
+    database_service.mirror = MirrorService(DB_MIRROR_PATH)
+    database_service.read_mode = 'mirror'
+    if database_service.mirror.is_available():
+        logger.info(f"🪞 Reading statements from local mirror at {DB_MIRROR_PATH}")
+    else:
+        logger.warning(f"DB_READ_MODE=mirror but no mirror at {DB_MIRROR_PATH} - run: python mirror_service.py sync")
+
+# Balance-threshold and large-transfer alerts on newly stored transactions (ALERT_RULES_FILE)
+alert_engine = alert_engine_from_env(database_service) if database_service.is_connected() else None
+if alert_engine:
+    alert_engine.start()
+
+# Persist live-fetched transactions of tracked wallets into transaction_history
+transaction_ingestor = TransactionIngestor(database_service) if LIVE_INGESTION else None
+if transaction_ingestor:
+    logger.info("📥 Live fetches of tracked wallets will be stored in transaction_history")
+    if alert_engine:
+        transaction_ingestor.add_listener(alert_engine.observe)
+    if database_service.daily_balances:
+        transaction_ingestor.add_listener(database_service.daily_balances.observe)
+
+# Optionally run the account monitor inside the API process, so requests can
+# refresh a wallet on the monitor's reserved interactive budget. Every worker
+# gets one for refreshes, but only the holder of the monitor lock polls in the
+# background. The debug reloader's parent process only watches files.
+RELOADER_PARENT = (
+    __name__ == '__main__' and os.getenv('DEBUG', 'True').lower() == 'true'
+    and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+)
+account_monitor = None
+if MONITOR_IN_PROCESS and not RELOADER_PARENT and database_service.is_connected():
+    account_monitor = AccountMonitor(
+        database_service, blockchain_service, alert_engine=alert_engine, **monitor_settings_from_env()
+    )
+    threading.Thread(target=account_monitor.run, name='account-monitor', daemon=True).start()
 
 CHAIN_IDS = {
     'ethereum': 1,
@@ -81,6 +172,16 @@ CHAIN_IDS = {
 }
 
 
+def _ingest_live_transactions(blockchain, address, data):
+    """Store a successful live fetch for later DB statements; never fails the request"""
+    if not transaction_ingestor or not data.get('success') or not database_service.is_connected():
+        return
+    try:
+        transaction_ingestor.ingest(blockchain, address, data.get('transactions', []))
+    except Exception as e:
+        logger.warning(f"Could not ingest {blockchain} transactions for {address}: {str(e)}")
+
+
 # Static file serving is handled by Vercel's routing in vercel.json
 # No need for these routes in serverless deployment
 
@@ -88,11 +189,54 @@ CHAIN_IDS = {
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'service': 'Blockchain Monitoring API',
         'version': '1.0.0'
-    })
+    }
+    if database_service.statement_cache:
+        health['statement_cache'] = database_service.statement_cache.stats()
+    return jsonify(health)
+
+
+def _json_balances(statement):
+    """
+    Statement balances for JSON responses
+    
+    The database layer keeps balances as exact Decimals (used by the exports),
+    which jsonify would turn into strings; API responses keep them as numbers.
+    """
+    return {
+        key: {asset: float(balance) for asset, balance in statement[field].items()}
+        for key, field in (
+            ('opening_balance', 'opening_balance'),
+            ('current_balance', 'closing_balance'),
+            ('period_change', 'period_change'),
+        )
+    }
+
+
+def _json_flow_statistics(statistics):
+    """get_flow_statistics result for JSON responses, with the Decimal amounts as numbers like _json_balances"""
+    def numeric(entry):
+        return {
+            field: float(value) if isinstance(value, Decimal) else value
+            for field, value in entry.items()
+        }
+    
+    return dict(
+        statistics,
+        buckets=[numeric(bucket) for bucket in statistics['buckets']],
+        totals={asset: numeric(totals) for asset, totals in statistics['totals'].items()}
+    )
+
+
+def _json_series(series):
+    """get_balance_series points for JSON responses, with the Decimal balances as numbers"""
+    return {
+        asset: [{'date': point['date'], 'balance': float(point['balance'])} for point in points]
+        for asset, points in series.items()
+    }
 
 
 @app.route('/api/analyze-db/<address>', methods=['GET'])
@@ -104,6 +248,16 @@ def analyze_wallet_from_database(address):
         - start_date: Opening balance date (YYYY-MM-DD)
         - end_date: Current balance date (YYYY-MM-DD)
         - network: Optional network filter (eth-mainnet, sol-mainnet, etc.)
+        - format: 'json' (default) or 'ndjson' to stream one JSON object per line:
+                  a "statement" line with the balances, one "transaction" line
+                  per row, then a "summary" line. Memory stays constant.
+        - limit: Optional page size; returns one keyset page of transactions
+                 with "next_cursor" and "has_more"
+        - after: Cursor from the previous page's "next_cursor". Balances are
+                 only computed for the first page (no cursor).
+        - stats_interval: Bucket size of the "statistics" block: 'day', 'week'
+                          or 'month' (default), or 'none' to omit it
+        - refresh: 'true' to poll the wallet's chains first (needs MONITOR_IN_PROCESS)
     
     Returns:
         {
@@ -114,16 +268,36 @@ def analyze_wallet_from_database(address):
             "network": "eth-mainnet",
             "opening_balance": {"ETH": 10.5, "USDC": 1000},
             "current_balance": {"ETH": 15.2, "USDC": 1200},
+            "period_change": {"ETH": 4.7, "USDC": 200},
             "transactions": [...],
             "transactions_counted_for_opening": 150,
-            "total_transactions_in_period": 25
+            "total_transactions_in_period": 25,
+            "statistics": {
+                "interval": "month",
+                "buckets": [{"period": "2025-04-01", "network": "eth-mainnet", "asset": "ETH",
+                             "inflow": 5, "outflow": 1.2, "net": 3.8,
+                             "incoming_count": 3, "outgoing_count": 1,
+                             "usd_inflow": 15000, "usd_outflow": 3600,
+                             "transaction_types": {"external": 4}}, ...],
+                "totals": {"ETH": {...}},
+                "transaction_types": {"external": 20, "erc20": 5},
+                "total_transactions": 25
+            }
         }
+        
+        Balances and statistics amounts are JSON numbers; the CSV/XLSX/Parquet
+        exports carry the exact decimal values.
     """
     try:
         # Get query parameters
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         network = request.args.get('network')
+        response_format = request.args.get('format', 'json').lower()
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after')
+        stats_interval = request.args.get('stats_interval', 'month').lower()
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
         
         if not start_date:
             return jsonify({
@@ -131,47 +305,54 @@ def analyze_wallet_from_database(address):
                 'error': 'start_date parameter is required (format: YYYY-MM-DD)'
             }), 400
         
+        if stats_interval != 'none' and stats_interval not in STATISTICS_INTERVALS:
+            return jsonify({
+                'success': False,
+                'error': "stats_interval must be 'day', 'week', 'month' or 'none'"
+            }), 400
+        
         logger.info(f"Analyzing wallet {address} from database")
         logger.info(f"  Opening date: {start_date}")
         logger.info(f"  End date: {end_date or 'current'}")
         logger.info(f"  Network: {network or 'all'}")
         
-        # Calculate opening balance
-        opening_balance_result = database_service.calculate_opening_balance(
-            address, 
-            start_date, 
-            network
-        )
+        if refresh and account_monitor:
+            account_monitor.poll_wallet_now(address)
         
-        # Calculate current balance
-        current_balance_result = database_service.get_current_balance(
-            address, 
-            end_date, 
-            network
-        )
+        if response_format == 'ndjson':
+            statement = database_service.get_statement(
+                address, start_date, end_date, network, include_transactions=False
+            )
+            return Response(
+                stream_with_context(_stream_statement_ndjson(address, start_date, network, statement)),
+                mimetype='application/x-ndjson'
+            )
         
-        # Get transactions in period
-        transactions = database_service.get_transactions_in_period(
-            address, 
-            start_date, 
-            end_date or current_balance_result['current_date'],
-            network
-        )
+        if limit is not None or after:
+            return _analyze_db_page(address, start_date, end_date, network, limit or 100, after)
+        
+        # Opening balance, closing balance and period rows in one pass
+        statement = database_service.get_statement(address, start_date, end_date, network)
+        transactions = statement['transactions']
         
         # Format response
         response = {
             'success': True,
             'wallet_address': address,
-            'opening_date': opening_balance_result['opening_date'],
-            'end_date': current_balance_result['current_date'],
+            'opening_date': statement['opening_date'],
+            'end_date': statement['end_date'],
             'network': network or 'all',
-            'opening_balance': opening_balance_result['balances'],
-            'current_balance': current_balance_result['balances'],
+            **_json_balances(statement),
             'transactions': transactions,
-            'transactions_counted_for_opening': opening_balance_result['transactions_counted'],
+            'transactions_counted_for_opening': statement['transactions_counted_for_opening'],
             'total_transactions_in_period': len(transactions)
         }
         
+        if stats_interval != 'none':
+            response['statistics'] = _json_flow_statistics(database_service.get_flow_statistics(
+                address, start_date, statement['end_date'], network, stats_interval
+            ))
+        
         return jsonify(response)
         
     except Exception as e:
@@ -182,6 +363,243 @@ def analyze_wallet_from_database(address):
         }), 500
 
 
+MAX_PAGE_SIZE = 1000
+STATISTICS_INTERVALS = ('day', 'week', 'month')
+STATEMENT_FORMATS = ('csv', 'xlsx', 'parquet', 'arrow')
+MAX_BATCH_WALLETS = int(os.getenv('MAX_BATCH_WALLETS', '1000'))
+
+
+def _analyze_db_page(address, start_date, end_date, network, limit, after):
+    """Paginated /api/analyze-db response; balances are included on the first page only"""
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'
+        }), 400
+    
+    response = {
+        'success': True,
+        'wallet_address': address,
+        'opening_date': start_date,
+        'network': network or 'all'
+    }
+    
+    if not after:
+        statement = database_service.get_statement(address, start_date, end_date, network, include_transactions=False)
+        end_date = statement['end_date']
+        response.update({
+            **_json_balances(statement),
+            'transactions_counted_for_opening': statement['transactions_counted_for_opening']
+        })
+    end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+    
+    try:
+        page = database_service.get_transactions_page(address, start_date, end_date, network, limit, after)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    response.update({
+        'end_date': end_date,
+        'transactions': page['transactions'],
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more']
+    })
+    return jsonify(response)
+
+
+def _ndjson_line(obj):
+    """Serialize one NDJSON line with Flask's JSON provider (handles dates and Decimals)"""
+    return app.json.dumps(obj) + '\n'
+
+
+def _stream_statement_ndjson(address, start_date, network, statement, lines_per_chunk=500):
+    """Yield a DB statement as NDJSON, streaming transactions straight from the cursor"""
+    yield _ndjson_line({
+        'type': 'statement',
+        'success': True,
+        'wallet_address': address,
+        'opening_date': statement['opening_date'],
+        'end_date': statement['end_date'],
+        'network': network or 'all',
+        **_json_balances(statement),
+        'transactions_counted_for_opening': statement['transactions_counted_for_opening']
+    })
+    
+    total = 0
+    lines = []
+    try:
+        for tx in database_service.iter_transactions_in_period(address, start_date, statement['end_date'], network):
+            lines.append(_ndjson_line({'type': 'transaction', **tx}))
+            total += 1
+            if len(lines) >= lines_per_chunk:
+                yield ''.join(lines)
+                lines = []
+    except Exception as e:
+        logger.error(f"Error streaming transactions: {str(e)}")
+        yield ''.join(lines) + _ndjson_line({'type': 'error', 'success': False, 'error': str(e)})
+        return
+    
+    yield ''.join(lines) + _ndjson_line({'type': 'summary', 'total_transactions_in_period': total})
+
+
+@app.route('/api/analyze-db/batch', methods=['POST'])
+def analyze_wallets_batch_from_database():
+    """
+    Opening and closing balances for many wallets from the database
+    
+    Request Body:
+        {
+            "addresses": ["0x...", "9qa5..."],
+            "start_date": "2025-03-31",
+            "end_date": "2025-11-15",      (optional)
+            "network": "eth-mainnet"       (optional)
+        }
+    
+    Returns:
+        {
+            "success": true,
+            "opening_date": "2025-03-31",
+            "end_date": "2025-11-15",
+            "network": "all",
+            "wallets": {
+                "0x...": {
+                    "opening_balance": {...},
+                    "period_change": {...},
+                    "current_balance": {...},
+                    "transactions_counted_for_opening": 150
+                }
+            },
+            "not_found": []
+        }
+    """
+    try:
+        data = request.json or {}
+        addresses = data.get('addresses') or []
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        network = data.get('network')
+        
+        if not start_date:
+            return jsonify({
+                'success': False,
+                'error': 'start_date is required (format: YYYY-MM-DD)'
+            }), 400
+        
+        if not isinstance(addresses, list) or not addresses:
+            return jsonify({
+                'success': False,
+                'error': 'addresses must be a non-empty list'
+            }), 400
+        
+        if len(addresses) > MAX_BATCH_WALLETS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_WALLETS} addresses per batch'
+            }), 400
+        
+        logger.info(f"Batch analyzing {len(addresses)} wallets from database ({start_date} to {end_date or 'current'})")
+        
+        batch = database_service.get_statements_batch(addresses, start_date, end_date, network)
+        
+        return jsonify({
+            'success': True,
+            'opening_date': batch['opening_date'],
+            'end_date': batch['end_date'],
+            'network': network or 'all',
+            'wallets': {
+                address: {
+                    **_json_balances(statement),
+                    'transactions_counted_for_opening': statement['transactions_counted_for_opening']
+                }
+                for address, statement in batch['wallets'].items()
+            },
+            'not_found': batch['not_found']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error batch analyzing wallets from database: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+MAX_SERIES_POINTS = 5000
+
+
+@app.route('/api/balance-series-db/<address>', methods=['GET'])
+def balance_series_from_database(address):
+    """
+    Running balance per asset over time, for charts
+    
+    Query Parameters:
+        - start_date: First date of the series (YYYY-MM-DD)
+        - end_date: Optional last date (YYYY-MM-DD), defaults to today
+        - network: Optional network filter
+        - interval: 'day' (default), 'week' or 'month'
+        - points: Maximum points per asset (default 500), reduced with LTTB
+    
+    Returns:
+        {
+            "success": true,
+            "wallet_address": "0x...",
+            "start_date": "2025-01-01",
+            "end_date": "2025-11-15",
+            "interval": "day",
+            "network": "all",
+            "series": {"ETH": [{"date": "2025-01-01", "balance": "10.5"}, ...]},
+            "points_before_downsampling": {"ETH": 312}
+        }
+    """
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        network = request.args.get('network')
+        interval = request.args.get('interval', 'day').lower()
+        points = request.args.get('points', 500, type=int)
+        
+        if not start_date:
+            return jsonify({
+                'success': False,
+                'error': 'start_date parameter is required (format: YYYY-MM-DD)'
+            }), 400
+        
+        if interval not in STATISTICS_INTERVALS:
+            return jsonify({
+                'success': False,
+                'error': "interval must be 'day', 'week' or 'month'"
+            }), 400
+        
+        if points < 3 or points > MAX_SERIES_POINTS:
+            return jsonify({
+                'success': False,
+                'error': f'points must be between 3 and {MAX_SERIES_POINTS}'
+            }), 400
+        
+        series = database_service.get_balance_series(address, start_date, end_date, network, interval, points)
+        
+        return jsonify({
+            'success': True,
+            'wallet_address': address,
+            'start_date': series['start_date'],
+            'end_date': series['end_date'],
+            'interval': series['interval'],
+            'network': network or 'all',
+            'series': _json_series(series['series']),
+            'points_before_downsampling': series['points_before_downsampling']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error building balance series from database: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/api/export-pdf-db/<address>', methods=['GET'])
 def export_pdf_db(address):
     """Export wallet statement as PDF using database data"""
@@ -203,23 +621,16 @@ def export_pdf_db(address):
         logger.info(f"Generating PDF for wallet {address}")
         
         # Get data from database
-        opening_balance_result = database_service.calculate_opening_balance(address, start_date, network)
-        current_balance_result = database_service.get_current_balance(address, end_date, network)
-        transactions = database_service.get_transactions_in_period(
-            address, 
-            start_date, 
-            end_date or current_balance_result['current_date'],
-            network
-        )
+        statement = database_service.get_statement(address, start_date, end_date, network)
         
         # Generate PDF
         pdf_bytes = generate_pdf_statement(
             wallet_address=address,
             opening_date=start_date,
-            end_date=end_date or current_balance_result['current_date'],
-            opening_balance=opening_balance_result['balances'],
-            current_balance=current_balance_result['balances'],
-            transactions=transactions,
+            end_date=statement['end_date'],
+            opening_balance=statement['opening_balance'],
+            current_balance=statement['closing_balance'],
+            transactions=statement['transactions'],
             network=network
         )
         
@@ -260,6 +671,8 @@ def get_balance(blockchain, address):
                 'error': f'Unsupported blockchain: {blockchain}'
             }), 400
         
+        _ingest_live_transactions(blockchain, address, result)
+        
         return jsonify(result)
         
     except Exception as e:
@@ -296,6 +709,8 @@ def get_transactions(blockchain, address):
                 'error': f'Unsupported blockchain: {blockchain}'
             }), 400
         
+        _ingest_live_transactions(blockchain, address, result)
+        
         return jsonify(result)
         
     except Exception as e:
@@ -335,6 +750,8 @@ def analyze_address(blockchain, address):
         if not data.get('success'):
             return jsonify(data), 500
         
+        _ingest_live_transactions(blockchain, address, data)
+        
         # Calculate statistics
         transactions = data.get('transactions', [])
         
@@ -387,11 +804,54 @@ def analyze_address(blockchain, address):
 
 
 
+def _statement_download(chunks, filename, export_format='csv', compress=False):
+    """
+    Streamed attachment response for statement file chunks
+    
+    filename has no extension; it is added for the format. compress only
+    applies to CSV (XLSX, Parquet and Arrow files are compressed internally).
+    """
+    if export_format == 'csv':
+        filename += '.csv.gz' if compress else '.csv'
+        mimetype = 'application/gzip' if compress else 'text/csv'
+    elif export_format == 'xlsx':
+        filename += '.xlsx'
+        mimetype = XLSX_MIMETYPE
+    else:
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename += extension
+    
+    if export_format == 'xlsx':
+        # A workbook only exists once every sheet is written; the headers go out
+        # first, so a failure while writing it aborts the download
+        body = chunks
+    else:
+        # The header is produced before responding, so bad input still fails with a JSON error
+        first_chunk = next(chunks)
+        
+        def body_chunks():
+            yield first_chunk
+            yield from chunks
+        body = body_chunks()
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @app.route('/api/export-csv', methods=['POST'])
 def export_csv():
     """
     Generate CSV export with opening balance and transactions
     Simple format: Opening Balance at START date + All Transactions
+    
+    The CSV is streamed as it is written; "gzip": true in the body returns
+    it as a .csv.gz download instead. "format": "xlsx" returns an Excel
+    workbook with opening balance, transactions and closing balance sheets;
+    "parquet" or "arrow" a typed columnar file with the balances in its
+    metadata.
     """
     try:
         data = request.json
@@ -399,6 +859,8 @@ def export_csv():
         address = data.get('address', '')
         start_date = data.get('startDate', '')
         end_date = data.get('endDate', '')
+        compress = bool(data.get('gzip', False))
+        export_format = data.get('format', 'csv').lower()
         
         logger.info(f"CSV export request - Chain: {blockchain}, Address: {address}, Period: {start_date} to {end_date}")
         
@@ -408,6 +870,12 @@ def export_csv():
                 'error': 'Missing required fields'
             }), 400
         
+        if export_format not in STATEMENT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': "format must be 'csv', 'xlsx', 'parquet' or 'arrow'"
+            }), 400
+        
         # Get crypto symbol
         if blockchain == 'bitcoin':
             data = blockchain_service.get_bitcoin_transactions(address, start_date, end_date)
@@ -441,6 +909,8 @@ def export_csv():
         if not data.get('success'):
             return jsonify(data), 500
         
+        _ingest_live_transactions(blockchain, address, data)
+        
         # Convert balances
         balance_raw = float(data.get('balance', 0))
         opening_balance_raw = data.get('opening_balance')
@@ -464,10 +934,33 @@ def export_csv():
             current_balance = balance_raw
             opening_balance = float(opening_balance_raw) if opening_balance_raw else current_balance
         
-        transactions = data.get('transactions', [])
+        # Valued at each transaction's day from the stored price history
+        transactions = currency_service.with_usd_values(data.get('transactions', []), crypto_symbol)
+        
+        filename = f"{blockchain}_{address[:8]}_transactions_{start_date}_to_{end_date}"
+        
+        if export_format != 'csv':
+            opening_balances = {crypto_symbol: opening_balance}
+            closing_balances = {crypto_symbol: current_balance}
+            for symbol, token_data in (data.get('opening_token_balances') or {}).items():
+                opening_balances[symbol] = token_data['balance']
+            for symbol, token_data in (data.get('token_balances') or {}).items():
+                closing_balances[symbol] = token_data['balance']
+            
+            if export_format == 'xlsx':
+                file_chunks = xlsx_generator.stream_statement(
+                    address, blockchain, transactions, opening_balances, closing_balances,
+                    crypto_symbol=crypto_symbol, start_date=start_date, end_date=end_date
+                )
+            else:
+                file_chunks = arrow_exporter.stream_statement(
+                    export_format, address, blockchain, transactions, opening_balances, closing_balances,
+                    crypto_symbol=crypto_symbol, start_date=start_date, end_date=end_date
+                )
+            return _statement_download(file_chunks, filename, export_format)
         
-        # Generate CSV
-        csv_content = csv_generator.generate_transaction_csv(
+        # Generate CSV, encoded chunk by chunk while it is sent
+        csv_chunks = csv_generator.stream_transaction_csv(
             address=address,
             blockchain=blockchain,
             transactions=transactions,  # Use the transactions variable (might be manual override)
@@ -477,24 +970,145 @@ def export_csv():
             opening_token_balances=data.get('opening_token_balances'),
             current_token_balances=data.get('token_balances'),
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            compress=compress
         )
+        return _statement_download(csv_chunks, filename, 'csv', compress)
         
-        # Create file buffer
-        csv_buffer = io.BytesIO(csv_content.encode('utf-8'))
-        csv_buffer.seek(0)
+    except Exception as e:
+        logger.error(f"Error generating CSV: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _csv_rows_from_db(rows):
+    """Map transaction_history period rows onto the transaction shape CSVGenerator writes"""
+    for row in rows:
+        transaction_date = row['transaction_date']
+        yield {
+            'timestamp': transaction_date.replace(tzinfo=timezone.utc).timestamp() if transaction_date else 0,
+            'hash': row['transaction_hash'] or 'Unknown',
+            'type': row['transaction_type'] or 'Transfer',
+            'direction': 'in' if row['direction'] == 'incoming' else 'out',
+            'from': row['from_address'] or 'Unknown',
+            'to': row['to_address'] or 'Unknown',
+            # MySQL may hand back DECIMAL as str (and mirror rows as float); the writers format Decimals
+            'amount': Decimal(str(row['amount'])) if row['amount'] is not None else Decimal(0),
+            'tokenSymbol': row['token_symbol'],
+            'blockNumber': '',
+            'usdValue': row.get('usd_value')
+        }
+
+
+@app.route('/api/export-csv-db/<address>', methods=['GET'])
+def export_csv_from_database(address):
+    """
+    CSV statement of a tracked wallet from the database
+    
+    Opening and closing balances come from one SQL aggregate; the
+    transactions are streamed oldest first from an unbuffered cursor into
+    the CSV writer, so the first bytes go out before the period is read.
+    Each row's USD value is the stored usdValue, or else its day's price
+    from the price history (left empty while that price is still loading).
+    
+    Query Parameters:
+        - start_date: Opening balance date (YYYY-MM-DD)
+        - end_date: Closing date (YYYY-MM-DD), defaults to today
+        - network: Optional network filter (eth-mainnet, sol-mainnet, etc.)
+        - gzip: 'true' to download a .csv.gz
+        - format: 'csv' (default), 'xlsx' (Excel workbook), or 'parquet' /
+                  'arrow' (typed columnar file, balances in its metadata)
+    """
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        network = request.args.get('network')
+        compress = request.args.get('gzip', 'false').lower() == 'true'
+        export_format = request.args.get('format', 'csv').lower()
         
-        filename = f"{blockchain}_{address[:8]}_transactions_{start_date}_to_{end_date}.csv"
+        if export_format not in STATEMENT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': "format must be 'csv', 'xlsx', 'parquet' or 'arrow'"
+            }), 400
+        
+        if not start_date:
+            return jsonify({
+                'success': False,
+                'error': 'start_date parameter is required (format: YYYY-MM-DD)'
+            }), 400
+        
+        if not database_service.is_connected():
+            return jsonify({
+                'success': False,
+                'error': 'Database is not available'
+            }), 503
+        
+        try:
+            wallet_id = database_service.get_wallet_id(address, strict=True)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': f'Database is not available: {str(e)}'
+            }), 503
+        
+        if not wallet_id:
+            return jsonify({
+                'success': False,
+                'error': f'Wallet not found: {address}'
+            }), 404
+        
+        logger.info(f"DB CSV export request - Address: {address}, Period: {start_date} to {end_date or 'current'}")
+        
+        statement = database_service.get_statement(
+            address, start_date, end_date, network, include_transactions=False, wallet_id=wallet_id
+        )
+        rows = database_service.iter_transactions_in_period(
+            address, start_date, statement['end_date'], network, oldest_first=True, wallet_id=wallet_id
+        )
+        transactions = currency_service.with_usd_values(_csv_rows_from_db(rows))
+        
+        filename = f"{(network or 'all').split('-')[0]}_{address[:8]}_transactions_{start_date}_to_{statement['end_date']}"
         
-        return send_file(
-            csv_buffer,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
+        if export_format != 'csv':
+            if export_format == 'xlsx':
+                file_chunks = xlsx_generator.stream_statement(
+                    address, network or 'all networks', transactions,
+                    statement['opening_balance'], statement['closing_balance'],
+                    start_date=start_date, end_date=statement['end_date'], presorted=True
+                )
+            else:
+                file_chunks = arrow_exporter.stream_statement(
+                    export_format, address, network or 'all networks', transactions,
+                    statement['opening_balance'], statement['closing_balance'],
+                    start_date=start_date, end_date=statement['end_date'], presorted=True
+                )
+            return _statement_download(file_chunks, filename, export_format)
+        
+        csv_chunks = csv_generator.stream_transaction_csv(
+            address=address,
+            blockchain=network or 'all networks',
+            transactions=transactions,
+            opening_balance=0,
+            current_balance=0,
+            crypto_symbol=None,
+            opening_token_balances={
+                asset: {'balance': balance} for asset, balance in statement['opening_balance'].items()
+            },
+            current_token_balances={
+                asset: {'balance': balance} for asset, balance in statement['closing_balance'].items()
+            },
+            start_date=start_date,
+            end_date=statement['end_date'],
+            presorted=True,
+            compress=compress
         )
+        return _statement_download(csv_chunks, filename, 'csv', compress)
         
     except Exception as e:
-        logger.error(f"Error generating CSV: {str(e)}")
+        logger.error(f"Error generating DB CSV: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -440,6 +440,98 @@ class BlockchainService:
             'count': len(display_transactions)
         }
     
+    # Etherscan returns at most this many rows per account query
+    ETHERSCAN_MAX_RESULTS = 10000
+    
+    def get_evm_block_number(self, chain_id: int) -> Optional[int]:
+        """Current block number of an EVM chain, or None if Etherscan could not be reached"""
+        url = f"https://api.etherscan.io/v2/api?chainid={chain_id}&module=proxy&action=eth_blockNumber&apikey={self.api_key}"
+        result = self.fetch_with_retry(url).get('result')
+        try:
+            return int(result, 16)
+        except (TypeError, ValueError):
+            return None
+    
+    def get_evm_block_by_time(self, chain_id: int, timestamp: int) -> Optional[int]:
+        """First block at or after a Unix timestamp, or None if Etherscan could not be reached"""
+        url = (
+            f"https://api.etherscan.io/v2/api?chainid={chain_id}&module=block&action=getblocknobytime"
+            f"&timestamp={int(timestamp)}&closest=after&apikey={self.api_key}"
+        )
+        data = self.fetch_with_retry(url)
+        if data.get('status') != '1':
+            return None
+        try:
+            return int(data.get('result'))
+        except (TypeError, ValueError):
+            return None
+    
+    def get_evm_transactions_since(self, address: str, chain_id: int, start_block: int = 0) -> Dict:
+        """
+        Incremental EVM fetch for monitoring: transactions from start_block on
+        
+        Unlike get_ethereum_transactions this skips balances and opening
+        balance reconstruction, so a poll costs four API calls: the current
+        block, then txlist, txlistinternal and tokentx up to that block.
+        start_block is inclusive; re-reading that block is harmless because
+        stored rows are deduplicated.
+        
+        latest_block is the block every action is complete up to: the current
+        block, or the last block of an action Etherscan truncated at
+        ETHERSCAN_MAX_RESULTS rows, so the next poll resumes there. Any
+        answer other than "No transactions found" (including exhausted
+        retries) fails the whole poll instead of being read as empty.
+        
+        Args:
+            address: Wallet address
+            chain_id: EVM chain ID
+            start_block: First block to include (the previous poll's latest block)
+        
+        Returns:
+            Dict with success, transactions (oldest first) and latest_block
+        """
+        head = self.get_evm_block_number(chain_id)
+        if head is None:
+            return {'success': False, 'error': 'Could not read the current block number', 'transactions': []}
+        
+        base_url = "https://api.etherscan.io/v2/api"
+        params = {
+            'chainid': chain_id,
+            'apikey': self.api_key,
+            'address': address,
+            'startblock': start_block,
+            'endblock': head,
+            'sort': 'asc'
+        }
+        
+        transactions = []
+        latest_block = max(head, start_block)
+        for action, parser in (('txlist', self._parse_normal_tx),
+                               ('txlistinternal', self._parse_internal_tx),
+                               ('tokentx', self._parse_token_tx)):
+            action_params = {**params, 'module': 'account', 'action': action}
+            url = f"{base_url}?" + "&".join([f"{k}={v}" for k, v in action_params.items()])
+            data = self.fetch_with_retry(url)
+            
+            result = data.get('result')
+            if data.get('status') != '1' or not isinstance(result, list):
+                # Etherscan answers "No transactions found" with status 0 and an empty list
+                if 'No transactions found' in str(data.get('message', '')):
+                    continue
+                return {'success': False, 'error': f"{action}: {data.get('message') or result}", 'transactions': []}
+            
+            for tx in result:
+                parsed_tx = parser(tx, address)
+                if parsed_tx:
+                    transactions.append(parsed_tx)
+            
+            if len(result) >= self.ETHERSCAN_MAX_RESULTS:
+                # Truncated: this action is only complete before its last (possibly partial) block
+                latest_block = min(latest_block, int(result[-1].get('blockNumber', start_block)))
+        
+        transactions.sort(key=lambda x: x['timestamp'])
+        return {'success': True, 'transactions': transactions, 'latest_block': latest_block}
+    
     def _parse_normal_tx(self, tx: Dict, user_address: str) -> Dict:
         """Parse normal transaction"""
         is_incoming = tx.get('to', '').lower() == user_address.lower()
@@ -824,6 +916,126 @@ class BlockchainService:
                 'count': 0
             }
     
+    def get_solana_transactions_since(self, address: str, until_signature: str = None,
+                                      max_signatures: int = 1000, since_timestamp: int = None,
+                                      max_signature_pages: int = 100) -> Dict:
+        """
+        Incremental Solana fetch for monitoring: transactions newer than until_signature
+        
+        Pages through getSignaturesForAddress backwards until it reaches
+        until_signature or, without a watermark, signatures older than
+        since_timestamp (without either, only the newest max_signatures are
+        taken). The oldest max_signatures of those are parsed and
+        latest_signature is the newest of them, so a backlog larger than one
+        call is worked off by the following calls without leaving a gap. A
+        transaction the node cannot return yet ends the batch just before it.
+        Balances are not fetched.
+        
+        Args:
+            address: Wallet address
+            until_signature: Newest signature already processed, or None
+            max_signatures: Upper bound on transactions fetched in one call
+            since_timestamp: Unix time to look back to when there is no until_signature
+            max_signature_pages: Safety bound on getSignaturesForAddress pages
+        
+        Returns:
+            Dict with success, transactions (oldest first), latest_signature,
+            has_more (signatures left for the next call) and rpc_calls
+        """
+        rpc_url = "https://api.mainnet-beta.solana.com"
+        try:
+            signatures = []
+            before = None
+            pages = 0
+            while True:
+                options = {"limit": 1000}
+                if until_signature:
+                    options["until"] = until_signature
+                if before:
+                    options["before"] = before
+                
+                self.rate_limiter.wait_if_needed()
+                sig_response = requests.post(rpc_url, json={
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "getSignaturesForAddress",
+                    "params": [address, options]
+                }, timeout=30)
+                sig_response.raise_for_status()
+                pages += 1
+                page = sig_response.json().get('result') or []
+                
+                if since_timestamp and not until_signature:
+                    recent = [sig for sig in page if (sig.get('blockTime') or since_timestamp) >= since_timestamp]
+                    signatures.extend(recent)
+                    if len(recent) < len(page):
+                        break
+                else:
+                    signatures.extend(page)
+                
+                if len(page) < options["limit"]:
+                    break
+                if not until_signature and not since_timestamp and len(signatures) >= max_signatures:
+                    break
+                if pages >= max_signature_pages:
+                    logger.warning(
+                        f"Stopped paging Solana signatures for {address} after {pages} pages "
+                        f"without reaching the watermark"
+                    )
+                    break
+                before = page[-1]['signature']
+            
+            # getSignaturesForAddress returns newest first; work through the backlog oldest first
+            pending = signatures[::-1]
+            if not until_signature and not since_timestamp:
+                pending = pending[-max_signatures:]
+            batch = pending[:max_signatures]
+            
+            transactions = []
+            latest_signature = until_signature
+            calls = pages
+            for sig_info in batch:
+                if sig_info.get('err') or not sig_info.get('blockTime'):
+                    latest_signature = sig_info['signature']
+                    continue
+                
+                self.rate_limiter.wait_if_needed()
+                tx_response = requests.post(rpc_url, json={
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "getTransaction",
+                    "params": [
+                        sig_info['signature'],
+                        {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}
+                    ]
+                }, timeout=30)
+                # Fail the whole window so the watermark does not skip this signature
+                tx_response.raise_for_status()
+                calls += 1
+                tx_data = tx_response.json()
+                if not tx_data.get('result'):
+                    # Not available at the node's commitment yet (or an RPC error):
+                    # stop here so the next call starts again at this signature
+                    logger.info(f"Solana transaction {sig_info['signature']} not available yet, resuming there next poll")
+                    break
+                parsed_tx = self._parse_solana_tx(tx_data['result'], address, sig_info['signature'])
+                if parsed_tx:
+                    transactions.append(parsed_tx)
+                latest_signature = sig_info['signature']
+            
+            transactions.sort(key=lambda x: x['timestamp'])
+            return {
+                'success': True,
+                'transactions': transactions,
+                'latest_signature': latest_signature,
+                'has_more': len(pending) > len(batch) or (bool(batch) and latest_signature != batch[-1]['signature']),
+                'rpc_calls': calls
+            }
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Solana RPC error: {str(e)}")
+            return {'success': False, 'error': f'Solana RPC error: {str(e)}', 'transactions': []}
+    
     def get_solana_token_balances(self, address: str) -> Dict[str, Dict]:
         """
         Get SPL token balances for a Solana address (including Token-2022 tokens like PYUSD)
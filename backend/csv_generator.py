@@ -5,8 +5,9 @@ Generates simple CSV files with transactions and opening balance
 
 import csv
 import io
-from typing import List, Dict
-from datetime import datetime
+import zlib
+from typing import Dict, Iterable, Iterator, List
+from datetime import datetime, timezone
 
 
 class CSVGenerator:
@@ -43,8 +44,55 @@ class CSVGenerator:
         Returns:
             CSV content as string
         """
+        return b''.join(self.stream_transaction_csv(
+            address, blockchain, transactions, opening_balance, current_balance, crypto_symbol,
+            opening_token_balances, current_token_balances, start_date, end_date
+        )).decode('utf-8')
+    
+    def stream_transaction_csv(
+        self,
+        address: str,
+        blockchain: str,
+        transactions: Iterable[Dict],
+        opening_balance: float,
+        current_balance: float,
+        crypto_symbol: str,
+        opening_token_balances: Dict[str, Dict] = None,
+        current_token_balances: Dict[str, Dict] = None,
+        start_date: str = None,
+        end_date: str = None,
+        presorted: bool = False,
+        compress: bool = False,
+        rows_per_chunk: int = 500
+    ) -> Iterator[bytes]:
+        """
+        Same CSV as generate_transaction_csv, yielded as UTF-8 chunks
+        
+        Rows are encoded as they are written and the summary is counted in
+        the same pass, so memory is bounded by rows_per_chunk when the
+        transactions come from an iterator. With crypto_symbol=None there is
+        no native balance row and every asset comes from the token balances
+        (as for database statements).
+        
+        Args:
+            transactions: Transactions; an iterator must already be in timestamp order (presorted=True)
+            presorted: Skip sorting (required to stay streaming for iterators)
+            compress: Yield a gzip stream instead of plain CSV
+            rows_per_chunk: Transaction rows per yielded chunk
+            (other arguments as for generate_transaction_csv)
+            
+        Yields:
+            bytes: CSV (or gzip) chunks
+        """
         output = io.StringIO()
         writer = csv.writer(output)
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        
+        def drain() -> bytes:
+            data = output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate(0)
+            return compressor.compress(data) if compressor else data
         
         # Header section
         writer.writerow(['BLOCKCHAIN ACCOUNT STATEMENT'])
@@ -58,7 +106,8 @@ class CSVGenerator:
         # Opening Balance Section
         writer.writerow(['OPENING BALANCE', f'(as of {start_date})'])
         writer.writerow(['Asset', 'Balance'])
-        writer.writerow([crypto_symbol, f'{opening_balance:.8f}'])
+        if crypto_symbol:
+            writer.writerow([crypto_symbol, f'{opening_balance:.8f}'])
         
         if opening_token_balances:
             for symbol, token_data in opening_token_balances.items():
@@ -69,7 +118,8 @@ class CSVGenerator:
         # Current Balance Section
         writer.writerow(['CURRENT BALANCE', f'(as of {end_date})'])
         writer.writerow(['Asset', 'Balance'])
-        writer.writerow([crypto_symbol, f'{current_balance:.8f}'])
+        if crypto_symbol:
+            writer.writerow([crypto_symbol, f'{current_balance:.8f}'])
         
         if current_token_balances:
             for symbol, token_data in current_token_balances.items():
@@ -92,58 +142,79 @@ class CSVGenerator:
             'Token',
             'Status',
             'Block',
-            'Fee'
+            'Fee',
+            'Value (USD)'
         ])
         
+        chunk = drain()
+        if chunk:
+            yield chunk
+        
         # Sort transactions by timestamp (oldest first for CSV)
-        sorted_transactions = sorted(transactions, key=lambda x: x.get('timestamp', 0))
-        
-        for tx in sorted_transactions:
-            timestamp = tx.get('timestamp', 0)
-            if timestamp:
-                dt = datetime.fromtimestamp(timestamp)
-                date = dt.strftime('%Y-%m-%d')
-                time = dt.strftime('%H:%M:%S')
-            else:
-                date = 'Unknown'
-                time = 'Unknown'
+        if not presorted:
+            transactions = sorted(transactions, key=lambda x: x.get('timestamp', 0))
+        
+        # Summary stats, counted while writing
+        total = incoming = outgoing = 0
+        
+        for tx in transactions:
+            writer.writerow(self._transaction_row(tx, crypto_symbol))
             
-            # Get fee
-            fee = tx.get('fee', 0)
-            if fee == 0:
-                # Calculate fee from gas if available
-                gas_used = tx.get('gasUsed', 0)
-                gas_price = tx.get('gasPrice', 0)
-                if gas_used and gas_price:
-                    fee = (gas_used * gas_price) / 1e9  # Convert to token units
+            total += 1
+            if tx.get('direction') == 'in':
+                incoming += 1
+            elif tx.get('direction') == 'out':
+                outgoing += 1
             
-            writer.writerow([
-                date,
-                time,
-                tx.get('hash', 'Unknown'),
-                tx.get('type', 'Transfer'),
-                tx.get('direction', 'unknown'),
-                tx.get('from', 'Unknown')[:42],  # Truncate long addresses
-                tx.get('to', 'Unknown')[:42],
-                f'{tx.get("amount", 0):.8f}',
-                tx.get('tokenSymbol', crypto_symbol),
-                tx.get('status', 'Success'),
-                tx.get('blockNumber', 0),
-                f'{fee:.8f}'
-            ])
+            if total % rows_per_chunk == 0:
+                chunk = drain()
+                if chunk:
+                    yield chunk
         
         writer.writerow([''])
         writer.writerow(['SUMMARY'])
-        writer.writerow(['Total Transactions', len(transactions)])
-        
-        # Calculate summary stats
-        incoming = sum(1 for tx in transactions if tx.get('direction') == 'in')
-        outgoing = sum(1 for tx in transactions if tx.get('direction') == 'out')
-        
+        writer.writerow(['Total Transactions', total])
         writer.writerow(['Incoming Transactions', incoming])
         writer.writerow(['Outgoing Transactions', outgoing])
         
-        csv_content = output.getvalue()
+        chunk = drain() + (compressor.flush() if compressor else b'')
+        yield chunk
         output.close()
-        
-        return csv_content
+    
+    def _transaction_row(self, tx: Dict, crypto_symbol: str) -> List:
+        """CSV columns of one transaction"""
+        timestamp = tx.get('timestamp', 0)
+        if timestamp:
+            dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+            date = dt.strftime('%Y-%m-%d')
+            time = dt.strftime('%H:%M:%S')
+        else:
+            date = 'Unknown'
+            time = 'Unknown'
+        
+        # Get fee
+        fee = tx.get('fee', 0)
+        if fee == 0:
+            # Calculate fee from gas if available
+            gas_used = tx.get('gasUsed', 0)
+            gas_price = tx.get('gasPrice', 0)
+            if gas_used and gas_price:
+                fee = (gas_used * gas_price) / 1e9  # Convert to token units
+        
+        usd_value = tx.get('usdValue')
+        
+        return [
+            date,
+            time,
+            tx.get('hash', 'Unknown'),
+            tx.get('type', 'Transfer'),
+            tx.get('direction', 'unknown'),
+            tx.get('from', 'Unknown')[:42],  # Truncate long addresses
+            tx.get('to', 'Unknown')[:42],
+            f'{tx.get("amount", 0):.8f}',
+            tx.get('tokenSymbol', crypto_symbol),
+            tx.get('status', 'Success'),
+            tx.get('blockNumber', 0),
+            f'{fee:.8f}',
+            f'{float(usd_value):.2f}' if usd_value is not None else ''
+        ]
@@ -4,22 +4,62 @@ Fetches real-time cryptocurrency prices in USD and AED
 """
 
 import requests
+import threading
 import time
-from typing import Dict
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Sequence
 import logging
 
+import numpy as np
+
+from price_cache import PriceCache
+from price_history import PriceHistoryStore, coin_id_for, to_epoch_days
+
 logger = logging.getLogger(__name__)
 
+# Single-flight key of the USD/AED rate refresh
+AED_RATE_KEY = 'USD/AED'
+
 
 class CurrencyExchangeService:
-    """Service for fetching cryptocurrency exchange rates"""
+    """
+    Service for fetching cryptocurrency exchange rates
+    
+    Cached prices are served stale-while-revalidate: an expired entry is
+    returned immediately and refreshed by a background thread, which also
+    keeps the most requested symbols and the USD/AED rate warm ahead of
+    expiry. Concurrent fetches of the same symbol collapse into one upstream
+    call, so only a symbol that has never been priced makes a request wait.
+    
+    Prices and the rate are also kept in a PriceCache shared by every
+    process on the host. Construction makes no network calls: a cold
+    instance starts from the shared cache, adopts values other processes
+    refreshed recently instead of fetching them again, and only the holder
+    of a key's refresh lease calls the upstream API.
+    """
     
-    def __init__(self):
+    def __init__(self, price_history: PriceHistoryStore = None, price_cache: PriceCache = None,
+                 refresh_interval: int = 240, hot_symbols: int = 25):
         self.cache = {}
+        self.history = price_history or PriceHistoryStore()
+        self.store = price_cache or PriceCache()
         self.cache_duration = 300  # 5 minutes cache
         self.usd_to_aed_rate = 3.67  # Fallback rate if API fails
-        self._fetch_live_usd_aed_rate()  # Fetch real rate on initialization
+        self.refresh_interval = refresh_interval
+        self.hot_symbols = hot_symbols
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._requested = Counter()
+        self._stale = set()
+        self._refresh_wanted = threading.Event()
+        self._refresher = None
         
+        # Start from the shared cache; an expired or missing rate is refreshed on first use
+        stored_rate = self.store.get(AED_RATE_KEY)
+        if stored_rate:
+            self.usd_to_aed_rate = float(stored_rate[0])
+            self.cache['usd_aed_rate_timestamp'] = stored_rate[1]
+    
     def get_crypto_prices(self, symbols: list) -> Dict[str, Dict[str, float]]:
         """
         Get cryptocurrency prices in USD and AED
@@ -27,50 +67,122 @@ class CurrencyExchangeService:
         
         Args:
             symbols: List of crypto symbols (e.g., ['ETH', 'BTC', 'MATIC'])
-            
+        
         Returns:
             Dict with prices: {'ETH': {'usd': 2000.0, 'aed': 7340.0}, ...}
         """
         prices = {}
         symbols_to_fetch = []
+        stale = []
+        
+        with self._lock:
+            self._requested.update(symbols)
         
-        # Check cache first for all symbols
+        # Serve cached prices, expired or not; expired ones are refreshed in the background
         for symbol in symbols:
-            cache_key = f"{symbol}_price"
-            if cache_key in self.cache:
-                cached_data = self.cache[cache_key]
-                if time.time() - cached_data['timestamp'] < self.cache_duration:
+            cached_data = self.cache.get(f"{symbol}_price")
+            if cached_data:
+                prices[symbol] = cached_data['prices']
+                if time.time() - cached_data['timestamp'] >= self.cache_duration:
+                    stale.append(symbol)
+            else:
+                symbols_to_fetch.append(symbol)
+        
+        # Then the shared cache, which other processes may have filled
+        if symbols_to_fetch:
+            self._load_from_store(symbols_to_fetch)
+            for symbol in list(symbols_to_fetch):
+                cached_data = self.cache.get(f"{symbol}_price")
+                if cached_data:
                     prices[symbol] = cached_data['prices']
-                    continue
-            symbols_to_fetch.append(symbol)
-        
-        if not symbols_to_fetch:
-            return prices
-        
-        # Map symbols to CoinGecko IDs
-        symbol_map = {
-            'ETH': 'ethereum', 'BTC': 'bitcoin', 'BNB': 'binancecoin',
-            'AVAX': 'avalanche-2', 'SOL': 'solana', 'ADA': 'cardano', 'TRX': 'tron',
-            'MATIC': 'polygon-ecosystem-token', 'POL': 'polygon-ecosystem-token',
-            'WPOL': 'polygon-ecosystem-token', 'WMATIC': 'polygon-ecosystem-token',
-            'USDT': 'tether', 'USDC': 'usd-coin', 'DAI': 'dai',
-            'WBTC': 'wrapped-bitcoin', 'WETH': 'weth', 'WBNB': 'wbnb',
-            'LINK': 'chainlink', 'UNI': 'uniswap', 'AAVE': 'aave',
-            'ARB': 'arbitrum', 
-            'AUSDT': 'tether',  # Aave USDT uses same price as USDT
-            'AUSDC': 'usd-coin',  # Aave USDC uses same price as USDC
-            'HNST': 'honest-mining', 'PYTH': 'pyth-network',
-            # Solana SPL tokens
-            'PYUSD': 'paypal-usd', 'WSOL': 'wrapped-solana', 
-            'JLP': 'jupiter-perpetuals-liquidity-provider-token', 'INF': 'infinity-2',
-            'USDCet': 'usd-coin',  # Wormhole USDC uses same price as USDC
-        }
+                    symbols_to_fetch.remove(symbol)
+                    if time.time() - cached_data['timestamp'] >= self.cache_duration:
+                        stale.append(symbol)
+        
+        if stale:
+            self._refresh_in_background(stale)
+        
+        if symbols_to_fetch:
+            self._fetch_prices(symbols_to_fetch)
+            for symbol in symbols_to_fetch:
+                cached_data = self.cache.get(f"{symbol}_price")
+                prices[symbol] = cached_data['prices'] if cached_data else {'usd': 0, 'aed': 0}
+        
+        return prices
+    
+    def _fetch_prices(self, symbols: Iterable[str], wait: bool = True):
+        """
+        Fetch symbols from CoinGecko unless a fetch of them is already running
+        
+        Symbols already in flight are not requested again; with wait=True the
+        call blocks until those other fetches finish as well.
+        """
+        done = threading.Event()
+        with self._lock:
+            mine = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._inflight]
+            pending = {self._inflight[symbol] for symbol in symbols if symbol in self._inflight}
+            for symbol in mine:
+                self._inflight[symbol] = done
+        
+        leased_elsewhere = []
+        try:
+            if mine:
+                # Skip what another process refreshed recently, and what it is refreshing right now
+                fresh = self._load_from_store(mine, self.refresh_interval)
+                to_fetch = [symbol for symbol in mine if symbol not in fresh]
+                leased = self.store.acquire_leases(f"{symbol}_price" for symbol in to_fetch)
+                leased_elsewhere = [symbol for symbol in to_fetch if f"{symbol}_price" not in leased]
+                fetch = [symbol for symbol in to_fetch if f"{symbol}_price" in leased]
+                if fetch:
+                    try:
+                        self._fetch_from_coingecko(fetch)
+                    finally:
+                        self.store.release_leases(f"{symbol}_price" for symbol in fetch)
+        finally:
+            with self._lock:
+                for symbol in mine:
+                    self._inflight.pop(symbol, None)
+            done.set()
+        
+        if wait:
+            for event in pending:
+                event.wait(30)
+            # Wait for the other process's result rather than fetching the same symbols again
+            deadline = time.time() + self.store.lease_seconds
+            while leased_elsewhere and time.time() < deadline:
+                time.sleep(0.2)
+                fresh = self._load_from_store(leased_elsewhere, self.cache_duration)
+                leased_elsewhere = [symbol for symbol in leased_elsewhere if symbol not in fresh]
+    
+    def _load_from_store(self, symbols: Iterable[str], max_age: float = None) -> set:
+        """
+        Copy shared-cache prices newer than the in-process ones into self.cache
         
+        Returns:
+            set: Symbols whose shared price is younger than max_age (when given)
+        """
+        fresh = set()
+        stored = self.store.get_many(f"{symbol}_price" for symbol in symbols)
+        now = time.time()
+        for symbol in symbols:
+            cache_key = f"{symbol}_price"
+            if cache_key not in stored:
+                continue
+            value, fetched_at = stored[cache_key]
+            cached_data = self.cache.get(cache_key)
+            if not cached_data or cached_data['timestamp'] < fetched_at:
+                self.cache[cache_key] = {'prices': value, 'timestamp': fetched_at}
+            if max_age is not None and now - fetched_at < max_age:
+                fresh.add(symbol)
+        return fresh
+    
+    def _fetch_from_coingecko(self, symbols_to_fetch: list):
+        """Batch fetch current prices and store them in the cache"""
         # Build list of unique CoinGecko IDs
         coin_ids = []
         symbol_to_id = {}
         for symbol in symbols_to_fetch:
-            coin_id = symbol_map.get(symbol.upper(), symbol.lower())
+            coin_id = coin_id_for(symbol)
             if coin_id not in coin_ids:
                 coin_ids.append(coin_id)
             symbol_to_id[symbol] = coin_id
@@ -87,34 +199,174 @@ class CurrencyExchangeService:
             usd_to_aed = self.get_usd_to_aed_rate()
             
             # Map back to symbols
+            fetched = {}
             for symbol in symbols_to_fetch:
                 coin_id = symbol_to_id[symbol]
                 if coin_id in data and 'usd' in data[coin_id]:
                     price_usd = float(data[coin_id]['usd'])
                     price_aed = price_usd * usd_to_aed
-                    prices[symbol] = {'usd': price_usd, 'aed': price_aed}
                     
                     # Cache the result
                     cache_key = f"{symbol}_price"
                     self.cache[cache_key] = {
-                        'prices': prices[symbol],
+                        'prices': {'usd': price_usd, 'aed': price_aed},
                         'timestamp': time.time()
                     }
+                    fetched[cache_key] = self.cache[cache_key]['prices']
                 else:
                     logger.warning(f"Price not found for {symbol} (coin_id: {coin_id})")
-                    prices[symbol] = {'usd': 0, 'aed': 0}
-                    
+            
+            self.store.put_many(fetched)
+        
         except Exception as e:
             logger.error(f"Error batch fetching prices: {str(e)}")
-            # Fallback: set remaining to 0
-            for symbol in symbols_to_fetch:
-                if symbol not in prices:
-                    prices[symbol] = {'usd': 0, 'aed': 0}
+    
+    def _refresh_in_background(self, symbols: Iterable[str] = ()):
+        """Queue symbols (and the AED rate) for the refresher thread, starting it if needed"""
+        with self._lock:
+            self._stale.update(symbols)
         
-        return prices
+        if self._refresher is None or not self._refresher.is_alive():
+            with self._lock:
+                if self._refresher is None or not self._refresher.is_alive():
+                    self._refresher = threading.Thread(target=self._refresh_loop, name='price-refresher', daemon=True)
+                    self._refresher.start()
+        self._refresh_wanted.set()
+    
+    def _refresh_due(self):
+        """Refresh stale symbols, hot symbols close to expiry, and the AED rate when expired"""
+        now = time.time()
+        with self._lock:
+            due = set(self._stale)
+            self._stale.clear()
+            for symbol, _ in self._requested.most_common(self.hot_symbols):
+                cached_data = self.cache.get(f"{symbol}_price")
+                if cached_data and now - cached_data['timestamp'] >= self.refresh_interval:
+                    due.add(symbol)
+        
+        if now - self.cache.get('usd_aed_rate_timestamp', 0) >= self.refresh_interval:
+            self._refresh_aed_rate()
+        if due:
+            self._fetch_prices(sorted(due), wait=False)
+    
+    def _refresh_loop(self):
+        while True:
+            self._refresh_wanted.wait(self.refresh_interval)
+            self._refresh_wanted.clear()
+            try:
+                self._refresh_due()
+            except Exception as e:
+                logger.warning(f"Background price refresh failed: {str(e)}")
+    
+    def get_historical_prices(self, symbols: Sequence[str], timestamps, fetch_missing: bool = False) -> np.ndarray:
+        """
+        USD price of each transaction's token on the transaction's own day
+        
+        Args:
+            symbols: Token symbol per transaction
+            timestamps: Timestamp per transaction (unix seconds, datetimes or date strings)
+            fetch_missing: Wait for CoinGecko to load missing days instead of queueing them
+        
+        Returns:
+            numpy.ndarray: float64 USD prices aligned with the input, NaN where unknown
+        """
+        return self.history.lookup_symbols(symbols, timestamps, fetch_missing)
     
-    def _fetch_live_usd_aed_rate(self):
-        """Fetch live USD to AED exchange rate from API"""
+    def with_usd_values(self, transactions: Iterable[Dict], crypto_symbol: str = None,
+                        batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Fill in 'usdValue' of statement transactions at their own day's price
+        
+        Transactions in CSVGenerator's shape are valued batch by batch from
+        the stored price history, so an iterator stays streaming. Rows that
+        already carry a usdValue keep it; rows without a known price get
+        None. Missing prices are never fetched while the caller waits.
+        
+        Args:
+            transactions: Transactions with timestamp, amount and tokenSymbol
+            crypto_symbol: Token of rows without a tokenSymbol
+            batch_size: Rows valued per price lookup
+        
+        Yields:
+            dict: The transactions, in order
+        """
+        batch = []
+        for tx in transactions:
+            batch.append(tx)
+            if len(batch) >= batch_size:
+                yield from self._value_batch(batch, crypto_symbol)
+                batch = []
+        if batch:
+            yield from self._value_batch(batch, crypto_symbol)
+    
+    def _value_batch(self, batch: List[Dict], crypto_symbol: str) -> List[Dict]:
+        unvalued = [
+            tx for tx in batch
+            if tx.get('usdValue') is None and tx.get('timestamp') and (tx.get('tokenSymbol') or crypto_symbol)
+        ]
+        if unvalued:
+            values = self.value_transactions(
+                [tx.get('tokenSymbol') or crypto_symbol for tx in unvalued],
+                [float(tx.get('amount') or 0) for tx in unvalued],
+                [float(tx['timestamp']) for tx in unvalued]
+            )['usd']
+            for tx, usd in zip(unvalued, values.tolist()):
+                tx['usdValue'] = None if np.isnan(usd) else usd
+        return batch
+    
+    def value_transactions(self, symbols: Sequence[str], amounts, timestamps=None,
+                           fetch_missing: bool = False) -> Dict[str, np.ndarray]:
+        """
+        USD and AED values of a whole transaction list in one pass
+        
+        Prices are resolved once per unique symbol (spot) or unique
+        (symbol, day) pair (historical) and broadcast back to the rows, so
+        the cost is one lookup per distinct price instead of one per row.
+        
+        Args:
+            symbols: Token symbol per transaction
+            amounts: Token amount per transaction
+            timestamps: Optional timestamp per transaction; when given each row is
+                valued at its own day's price, otherwise at the current spot price
+            fetch_missing: Wait for CoinGecko to load missing historical prices
+                instead of queueing them (leaving those rows NaN for now)
+        
+        Returns:
+            dict: {'unit_price_usd': array, 'usd': array, 'aed': array} of float64,
+                aligned with the input, NaN where no price is known
+        """
+        symbols = np.asarray(symbols).astype(str)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        unique_symbols, symbol_index = np.unique(symbols, return_inverse=True)
+        symbol_index = symbol_index.reshape(-1)
+        
+        if timestamps is None:
+            spot = self.get_crypto_prices(unique_symbols.tolist())
+            symbol_prices = np.array([spot[symbol]['usd'] or np.nan for symbol in unique_symbols.tolist()],
+                                     dtype=np.float64)
+            unit_price_usd = symbol_prices[symbol_index] if len(symbols) else np.empty(0)
+        else:
+            days = to_epoch_days(timestamps)
+            first_day = int(days.min()) if len(days) else 0
+            # One int64 key per (symbol, day): far cheaper to deduplicate than row pairs
+            keys = (symbol_index.astype(np.int64) << 32) | (days - first_day)
+            unique_keys, key_index = np.unique(keys, return_inverse=True)
+            pair_prices = self.history.lookup_symbols(
+                unique_symbols[unique_keys >> 32].tolist(),
+                ((unique_keys & 0xFFFFFFFF) + first_day).astype('datetime64[D]'),
+                fetch_missing
+            )
+            unit_price_usd = pair_prices[key_index.reshape(-1)]
+        
+        usd = amounts * unit_price_usd
+        return {
+            'unit_price_usd': unit_price_usd,
+            'usd': usd,
+            'aed': usd * self.get_usd_to_aed_rate()
+        }
+    
+    def _fetch_live_usd_aed_rate(self) -> bool:
+        """Fetch live USD to AED exchange rate from API; returns whether it succeeded"""
         try:
             # Use exchangerate-api.com (free, no key needed for basic usage)
             url = "https://api.exchangerate-api.com/v4/latest/USD"
@@ -125,18 +377,44 @@ class CurrencyExchangeService:
             if 'rates' in data and 'AED' in data['rates']:
                 self.usd_to_aed_rate = float(data['rates']['AED'])
                 logger.info(f"Fetched live USD/AED rate: {self.usd_to_aed_rate}")
+                return True
             else:
                 logger.warning("AED rate not found in API response, using fallback rate")
         except Exception as e:
             logger.warning(f"Failed to fetch live USD/AED rate: {str(e)}, using fallback rate {self.usd_to_aed_rate}")
+        return False
+    
+    def _refresh_aed_rate(self):
+        """Single-flight refresh of the USD/AED rate"""
+        with self._lock:
+            if AED_RATE_KEY in self._inflight:
+                return
+            done = self._inflight[AED_RATE_KEY] = threading.Event()
+        try:
+            stored_rate = self.store.get(AED_RATE_KEY)
+            if stored_rate and time.time() - stored_rate[1] < self.refresh_interval:
+                self.usd_to_aed_rate = float(stored_rate[0])
+                self.cache['usd_aed_rate_timestamp'] = stored_rate[1]
+                return
+            if AED_RATE_KEY not in self.store.acquire_leases([AED_RATE_KEY]):
+                return
+            
+            if self._fetch_live_usd_aed_rate():
+                self.store.put(AED_RATE_KEY, self.usd_to_aed_rate)
+            else:
+                self.store.release_leases([AED_RATE_KEY])
+            # Stamped even after a failure, so a down API is retried once per interval
+            self.cache['usd_aed_rate_timestamp'] = time.time()
+        finally:
+            with self._lock:
+                self._inflight.pop(AED_RATE_KEY, None)
+            done.set()
     
     def get_usd_to_aed_rate(self) -> float:
-        """Get current USD to AED exchange rate (fetches live rate if cache expired)"""
-        # Refresh rate if cache is old (every 5 minutes)
+        """Get current USD to AED exchange rate (an expired rate is refreshed in the background)"""
         cache_key = 'usd_aed_rate_timestamp'
         if cache_key not in self.cache or time.time() - self.cache[cache_key] > self.cache_duration:
-            self._fetch_live_usd_aed_rate()
-            self.cache[cache_key] = time.time()
+            self._refresh_in_background()
         
         return self.usd_to_aed_rate
     
@@ -0,0 +1,418 @@
+"""
+Daily Balance Rollup
+Maintains a materialized daily_balances table so balance-at-date questions
+are answered with an indexed lookup instead of re-aggregating history
+"""
+
+import logging
+import os
+from datetime import datetime, time
+from typing import Dict, List, Optional, Tuple
+
+from database_service import NET_VALUE_SUM, _exact_decimal, _exact_sum
+
+logger = logging.getLogger(__name__)
+
+
+DAILY_BALANCES_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_balances (
+        walletId VARCHAR(191) NOT NULL,
+        network VARCHAR(64) NOT NULL,
+        asset VARCHAR(191) NOT NULL,
+        day DATE NOT NULL,
+        delta DECIMAL(65, 30) NOT NULL,
+        tx_count INT NOT NULL,
+        running_balance DECIMAL(65, 30) NOT NULL,
+        running_count BIGINT NOT NULL,
+        PRIMARY KEY (walletId, network, asset, day)
+    )
+"""
+
+WATERMARK_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_balances_watermark (
+        walletId VARCHAR(191) NOT NULL,
+        network VARCHAR(64) NOT NULL,
+        last_timestamp DATETIME NULL,
+        rows_processed BIGINT NOT NULL,
+        updatedAt DATETIME NOT NULL,
+        PRIMARY KEY (walletId, network)
+    )
+"""
+
+
+class DailyBalanceService:
+    """
+    Incrementally maintained per-day running balances
+    
+    Each (walletId, network) pair has a watermark holding the newest
+    transaction timestamp folded into the rollup and how many history rows
+    existed up to it. A refresh only aggregates rows newer than the
+    watermark; if the row count up to the watermark changed (a late
+    backfill), that pair is rebuilt from scratch. Writers that know where
+    their late rows are (the ingestor, through observe()) rewind the pair to
+    the day of the oldest row instead.
+    
+    Rows without a network are never folded in; lookups covering them fall
+    back to the full history scan.
+    
+    Lookups only compare each network's watermark with its latest history
+    timestamp (an index dive per network), so they stay independent of the
+    history size. Rows another writer backfills behind a watermark are
+    caught by the next refresh, which rebuilds that pair; run the
+    maintenance job on a schedule when something besides the ingestor
+    writes transaction_history.
+    """
+    
+    def __init__(self, database_service):
+        self.db = database_service
+    
+    def ensure_schema(self):
+        """Create the rollup and watermark tables if they do not exist"""
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(DAILY_BALANCES_DDL)
+            cursor.execute(WATERMARK_DDL)
+            cursor.close()
+            connection.commit()
+        logger.info("✅ daily_balances tables ready")
+    
+    def refresh(self, wallet_id: str = None) -> Dict[str, int]:
+        """
+        Fold new transaction_history rows into daily_balances
+        
+        Args:
+            wallet_id: Optional wallet ID to limit the refresh to
+        
+        Returns:
+            dict: {'pairs_checked': 12, 'pairs_updated': 3, 'pairs_rebuilt': 0, 'rows_processed': 140}
+        """
+        stats = {'pairs_checked': 0, 'pairs_updated': 0, 'pairs_rebuilt': 0, 'rows_processed': 0}
+        
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            
+            query = "SELECT DISTINCT walletId, network FROM transaction_history WHERE network IS NOT NULL"
+            params = []
+            if wallet_id:
+                query += " AND walletId = %s"
+                params.append(wallet_id)
+            cursor.execute(query, params)
+            pairs = [(row['walletId'], row['network']) for row in cursor.fetchall()]
+            
+            cursor.execute("SELECT walletId, network, last_timestamp, rows_processed FROM daily_balances_watermark")
+            watermarks = {(row['walletId'], row['network']): row for row in cursor.fetchall()}
+            cursor.close()
+            
+            for pair in pairs:
+                stats['pairs_checked'] += 1
+                processed, rebuilt = self._refresh_pair(connection, pair[0], pair[1], watermarks.get(pair))
+                if processed:
+                    stats['pairs_updated'] += 1
+                    stats['rows_processed'] += processed
+                if rebuilt:
+                    stats['pairs_rebuilt'] += 1
+        
+        logger.info(
+            f"📅 Daily balances refreshed: {stats['pairs_updated']}/{stats['pairs_checked']} pairs updated, "
+            f"{stats['rows_processed']} new rows, {stats['pairs_rebuilt']} rebuilt"
+        )
+        return stats
+    
+    def _refresh_pair(self, connection, wallet_id, network, watermark) -> Tuple[int, bool]:
+        """Process rows newer than the pair's watermark; returns (rows processed, rebuilt)"""
+        cursor = connection.cursor(dictionary=True)
+        last_timestamp = watermark['last_timestamp'] if watermark else None
+        rows_processed = int(watermark['rows_processed']) if watermark else 0
+        rebuilt = False
+        
+        # Detect rows that arrived behind the watermark since the last run
+        if last_timestamp is not None:
+            cursor.execute(
+                "SELECT COUNT(*) AS n FROM transaction_history "
+                "WHERE walletId = %s AND network = %s AND timestamp <= %s",
+                (wallet_id, network, last_timestamp)
+            )
+            if int(cursor.fetchone()['n']) != rows_processed:
+                logger.info(f"♻️  Rebuilding daily balances for {wallet_id} on {network} (late rows detected)")
+                cursor.execute(
+                    "DELETE FROM daily_balances WHERE walletId = %s AND network = %s",
+                    (wallet_id, network)
+                )
+                last_timestamp = None
+                rows_processed = 0
+                rebuilt = True
+        
+        newer = " AND timestamp > %s" if last_timestamp is not None else ""
+        base_params = [wallet_id, network] + ([last_timestamp] if last_timestamp is not None else [])
+        
+        # Pin the upper bound first so rows inserted mid-refresh are left for the next run
+        cursor.execute(
+            "SELECT COUNT(*) AS n, MAX(timestamp) AS max_ts FROM transaction_history "
+            f"WHERE walletId = %s AND network = %s{newer}",
+            base_params
+        )
+        probe = cursor.fetchone()
+        new_rows = int(probe['n'])
+        if not new_rows:
+            if rebuilt:
+                cursor.execute(
+                    "DELETE FROM daily_balances_watermark WHERE walletId = %s AND network = %s",
+                    (wallet_id, network)
+                )
+                connection.commit()
+            cursor.close()
+            return 0, rebuilt
+        max_timestamp = probe['max_ts']
+        
+        cursor.execute(
+            f"""
+            SELECT asset, DATE(timestamp) AS day, {NET_VALUE_SUM} AS delta, COUNT(*) AS tx_count
+            FROM transaction_history
+            WHERE walletId = %s AND network = %s{newer}
+            AND timestamp <= %s
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+            GROUP BY asset, DATE(timestamp)
+            ORDER BY asset, day
+            """,
+            base_params + [max_timestamp]
+        )
+        new_days = cursor.fetchall()
+        
+        # Latest existing rollup row per asset, to continue its running totals
+        cursor.execute(
+            """
+            SELECT d.asset, d.day, d.delta, d.tx_count, d.running_balance, d.running_count
+            FROM daily_balances d
+            JOIN (
+                SELECT asset, MAX(day) AS day
+                FROM daily_balances
+                WHERE walletId = %s AND network = %s
+                GROUP BY asset
+            ) latest ON latest.asset = d.asset AND latest.day = d.day
+            WHERE d.walletId = %s AND d.network = %s
+            """,
+            (wallet_id, network, wallet_id, network)
+        )
+        latest = {row['asset']: row for row in cursor.fetchall()}
+        
+        upserts = []
+        for row in new_days:
+            asset = row['asset']
+            delta = _exact_decimal(row['delta'])
+            tx_count = int(row['tx_count'])
+            previous = latest.get(asset)
+            
+            if previous and previous['day'] == row['day']:
+                # The watermark fell inside this day: extend the existing bucket
+                day_delta = _exact_sum(previous['delta'], delta)
+                day_count = int(previous['tx_count']) + tx_count
+            else:
+                day_delta = delta
+                day_count = tx_count
+            running_balance = _exact_sum(previous['running_balance'] if previous else 0, delta)
+            running_count = (int(previous['running_count']) if previous else 0) + tx_count
+            
+            latest[asset] = {
+                'day': row['day'],
+                'delta': day_delta,
+                'tx_count': day_count,
+                'running_balance': running_balance,
+                'running_count': running_count
+            }
+            upserts.append((wallet_id, network, asset, row['day'], day_delta, day_count, running_balance, running_count))
+        
+        if upserts:
+            cursor.executemany(
+                """
+                INSERT INTO daily_balances
+                    (walletId, network, asset, day, delta, tx_count, running_balance, running_count)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    delta = VALUES(delta),
+                    tx_count = VALUES(tx_count),
+                    running_balance = VALUES(running_balance),
+                    running_count = VALUES(running_count)
+                """,
+                upserts
+            )
+        
+        cursor.execute(
+            """
+            INSERT INTO daily_balances_watermark (walletId, network, last_timestamp, rows_processed, updatedAt)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE
+                last_timestamp = VALUES(last_timestamp),
+                rows_processed = VALUES(rows_processed),
+                updatedAt = VALUES(updatedAt)
+            """,
+            (wallet_id, network, max_timestamp, rows_processed + new_rows)
+        )
+        connection.commit()
+        cursor.close()
+        return new_rows, rebuilt
+    
+    def observe(self, wallet_id: str, address: str, rows: List[Dict]):
+        """Ingestion listener: fold newly inserted rows into the rollup of their networks"""
+        oldest = {}
+        for row in rows:
+            if row.get('network') and row.get('timestamp'):
+                network = row['network']
+                oldest[network] = min(oldest.get(network, row['timestamp']), row['timestamp'])
+        
+        for network, timestamp in oldest.items():
+            try:
+                self.refresh_from(wallet_id, network, timestamp)
+            except Exception as e:
+                logger.warning(f"Daily balances not refreshed for {wallet_id} on {network}: {str(e)}")
+    
+    def refresh_from(self, wallet_id: str, network: str, since: datetime) -> int:
+        """
+        Refresh one pair after rows at or after since were written
+        
+        If since is behind the pair's watermark, the rollup days from since's
+        day onwards are dropped and the watermark is moved back to the last
+        row before that day, so only those days are recomputed.
+        
+        Returns:
+            int: Rows folded into the rollup
+        """
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT last_timestamp, rows_processed FROM daily_balances_watermark "
+                "WHERE walletId = %s AND network = %s",
+                (wallet_id, network)
+            )
+            watermark = cursor.fetchone()
+            
+            if watermark and watermark['last_timestamp'] is not None and since <= watermark['last_timestamp']:
+                day_start = datetime.combine(since.date(), time.min)
+                logger.info(f"⏪ Rewinding daily balances for {wallet_id} on {network} to {day_start.date()}")
+                cursor.execute(
+                    "DELETE FROM daily_balances WHERE walletId = %s AND network = %s AND day >= %s",
+                    (wallet_id, network, day_start.date())
+                )
+                cursor.execute(
+                    "SELECT COUNT(*) AS n, MAX(timestamp) AS max_ts FROM transaction_history "
+                    "WHERE walletId = %s AND network = %s AND timestamp < %s",
+                    (wallet_id, network, day_start)
+                )
+                kept = cursor.fetchone()
+                if int(kept['n']):
+                    watermark = {'last_timestamp': kept['max_ts'], 'rows_processed': int(kept['n'])}
+                    cursor.execute(
+                        "UPDATE daily_balances_watermark SET last_timestamp = %s, rows_processed = %s, "
+                        "updatedAt = NOW() WHERE walletId = %s AND network = %s",
+                        (watermark['last_timestamp'], watermark['rows_processed'], wallet_id, network)
+                    )
+                else:
+                    watermark = None
+                    cursor.execute(
+                        "DELETE FROM daily_balances_watermark WHERE walletId = %s AND network = %s",
+                        (wallet_id, network)
+                    )
+                connection.commit()
+            cursor.close()
+            
+            processed, _ = self._refresh_pair(connection, wallet_id, network, watermark)
+        return processed
+    
+    def get_balances_at(self, wallet_id: str, day: str, network: str = None) -> Optional[Tuple[Dict, int]]:
+        """
+        Balance per asset at the close of a day, read from the rollup
+        
+        Args:
+            wallet_id: Wallet ID (UUID)
+            day: Date string (YYYY-MM-DD)
+            network: Optional network filter
+        
+        Returns:
+            tuple: ({asset: Decimal balance}, transactions counted), or None when
+            the rollup does not cover every history row up to that day
+        """
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            
+            # Latest row per network of the wallet (NULL included): a loose index
+            # scan of idx_th_wallet_network_keyset, one dive per network
+            network_filter = " AND network = %s" if network else ""
+            network_params = [network] if network else []
+            cursor.execute(
+                "SELECT network, MAX(timestamp) AS latest FROM transaction_history "
+                f"WHERE walletId = %s{network_filter} GROUP BY network",
+                [wallet_id] + network_params
+            )
+            latest = cursor.fetchall()
+            cursor.execute(
+                "SELECT network, last_timestamp FROM daily_balances_watermark "
+                f"WHERE walletId = %s{network_filter}",
+                [wallet_id] + network_params
+            )
+            watermarks = {row['network']: row['last_timestamp'] for row in cursor.fetchall()}
+            
+            if not latest or not all(
+                self._covers(row['network'], row['latest'], watermarks.get(row['network']), day) for row in latest
+            ):
+                cursor.close()
+                return None
+            
+            query = f"""
+                SELECT d.asset, d.running_balance, d.running_count
+                FROM daily_balances d
+                JOIN (
+                    SELECT network, asset, MAX(day) AS day
+                    FROM daily_balances
+                    WHERE walletId = %s{network_filter}
+                    AND day <= %s
+                    GROUP BY network, asset
+                ) latest ON latest.network = d.network AND latest.asset = d.asset AND latest.day = d.day
+                WHERE d.walletId = %s
+            """
+            params = [wallet_id] + network_params + [day, wallet_id]
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        
+        balances = {}
+        transactions_counted = 0
+        for row in rows:
+            balances[row['asset']] = _exact_sum(balances.get(row['asset'], 0), row['running_balance'])
+            transactions_counted += int(row['running_count'])
+        return balances, transactions_counted
+    
+    @staticmethod
+    def _covers(network: Optional[str], latest: Optional[datetime], last_timestamp: Optional[datetime],
+                day: str) -> bool:
+        """Whether one network's watermark accounts for all of its rows up to the end of day"""
+        if network is None or last_timestamp is None:
+            return False
+        # Rows beyond the watermark are fine as long as they are after the day
+        return latest is None or latest <= last_timestamp or last_timestamp.strftime('%Y-%m-%d') > day
+
+
+if __name__ == '__main__':
+    # Maintenance job: python daily_balances.py [walletId]
+    import sys
+    from dotenv import load_dotenv
+    from database_service import DatabaseService
+    
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    db = DatabaseService(
+        host=os.getenv('DB_HOST', '217.216.110.33'),
+        port=int(os.getenv('DB_PORT', '3306')),
+        username=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'nobicuan888'),
+        database=os.getenv('DB_NAME', 'nobi_wallet_tracker')
+    )
+    if not db.connect():
+        sys.exit(1)
+    
+    try:
+        rollup = DailyBalanceService(db)
+        rollup.ensure_schema()
+        rollup.refresh(sys.argv[1] if len(sys.argv) > 1 else None)
+    finally:
+        db.disconnect()
@@ -3,54 +3,390 @@ Database Service for Blockchain Transaction History
 Connects to MySQL database and calculates opening balances
 """
 
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime, timedelta
+from mysql.connector import Error, pooling
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Context, Decimal
+import base64
+import json
 import logging
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from wallet_registry import wallet_ids_by_address
 
 logger = logging.getLogger(__name__)
 
+# Signed movement of one row: incoming adds, outgoing subtracts.
+# The CAST keeps the arithmetic in exact DECIMAL regardless of column type.
+SIGNED_VALUE = (
+    "CASE WHEN direction = 'incoming' THEN CAST(value AS DECIMAL(65, 30)) "
+    "ELSE -CAST(value AS DECIMAL(65, 30)) END"
+)
+NET_VALUE_SUM = f"SUM({SIGNED_VALUE})"
+
+# Columns returned for statement transaction listings
+PERIOD_TRANSACTION_COLUMNS = """
+    hash as transaction_hash,
+    timestamp as transaction_date,
+    asset as token_symbol,
+    value as amount,
+    direction,
+    usdValue as usd_value,
+    network,
+    fromAddress as from_address,
+    toAddress as to_address,
+    category as transaction_type
+"""
+
+
+# Context of every exact balance computation in Python. DECIMAL(65, 30) values
+# and their sums need far more than the default context's 28 digits
+EXACT_CONTEXT = Context(prec=80)
+
+
+def _exact_decimal(value) -> Decimal:
+    """Convert an aggregated SQL value to a Decimal without trailing zeros"""
+    if value is None:
+        return Decimal(0)
+    value = Decimal(str(value)).normalize(EXACT_CONTEXT)
+    # normalize() turns e.g. 1000 into 1E+3; keep a plain integer exponent instead
+    if value.as_tuple().exponent > 0:
+        value = value.quantize(Decimal(1), context=EXACT_CONTEXT)
+    return value
+
+
+def _exact_sum(*values) -> Decimal:
+    """Sum of SQL values in EXACT_CONTEXT, as _exact_decimal"""
+    total = Decimal(0)
+    for value in values:
+        total = EXACT_CONTEXT.add(total, _exact_decimal(value))
+    return _exact_decimal(total)
+
+
+# Keyset ordering for paginated listings; (timestamp, hash) with asset and
+# direction as tie-breakers so rows of one multi-asset transaction stay stable
+KEYSET_COLUMNS = ('timestamp', 'hash', 'asset', 'direction')
+KEYSET_ALIASES = ('transaction_date', 'transaction_hash', 'token_symbol', 'direction')
+
+
+def encode_page_cursor(row: Dict) -> str:
+    """Opaque cursor pointing just past a listed transaction row (NULL key columns stay null)"""
+    key = [str(row[alias]) if row[alias] is not None else None for alias in KEYSET_ALIASES]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_page_cursor(cursor: str) -> List[str]:
+    """Decode a cursor from encode_page_cursor, raising ValueError if it is malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if (not isinstance(key, list) or len(key) != len(KEYSET_COLUMNS) or not isinstance(key[0], str)
+            or not all(value is None or isinstance(value, str) for value in key)):
+        raise ValueError("Invalid pagination cursor")
+    return key
+
+
+def keyset_after_condition(after: List, placeholder: str = '%s', timestamp_placeholder: str = None) -> Tuple[str, List]:
+    """
+    (condition, params) for the rows after a decoded cursor key in KEYSET_COLUMNS DESC order
+    
+    NULLs sort last in descending order (as in MySQL, and DuckDB with NULLS
+    LAST), so a NULL hash, asset or direction is the smallest value: rows
+    with a NULL come after any value, and a NULL in the cursor only matches
+    IS NULL. Plain < and = never match NULL and would skip those rows. The
+    expanded form keeps timestamp first so the range optimizer can seek on it.
+    """
+    condition, params = None, []
+    for position in reversed(range(len(KEYSET_COLUMNS))):
+        column, value = KEYSET_COLUMNS[position], after[position]
+        marker = timestamp_placeholder if position == 0 and timestamp_placeholder else placeholder
+        if value is None:
+            before, before_params = None, []
+            equal, equal_params = f"{column} IS NULL", []
+        else:
+            # timestamp is bounded by the period range, so it is never NULL here
+            before = f"{column} < {marker}" + (f" OR {column} IS NULL" if position else "")
+            before_params = [value]
+            equal, equal_params = f"{column} = {marker}", [value]
+        
+        if condition is None:
+            condition, params = (f"({before})", before_params) if before else ("FALSE", [])
+        elif before:
+            condition, params = (
+                f"({before} OR ({equal} AND {condition}))", before_params + equal_params + params
+            )
+        else:
+            condition, params = f"({equal} AND {condition})", equal_params + params
+    return condition, params
+
+
+# Bucket expressions for time series and flow statistics (weeks start on Monday)
+TIME_BUCKETS = {
+    'day': "DATE(timestamp)",
+    'week': "DATE_SUB(DATE(timestamp), INTERVAL WEEKDAY(timestamp) DAY)",
+    'month': "DATE_SUB(DATE(timestamp), INTERVAL DAYOFMONTH(timestamp) - 1 DAY)",
+}
+
+
+def downsample_lttb(points: List[tuple], threshold: int) -> List[tuple]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y) points
+    
+    Keeps the first and last points and, for every bucket in between, the
+    point forming the largest triangle with its neighbours, so peaks and
+    troughs survive. x and y must be float-convertible; the original point
+    objects are returned unchanged.
+    
+    Args:
+        points: Points sorted by x
+        threshold: Maximum number of points to keep (>= 3 to have any effect)
+    
+    Returns:
+        list: At most threshold of the input points, in order
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    
+    xs = [float(x) for x, _ in points]
+    ys = [float(y) for _, y in points]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    sampled = [points[0]]
+    selected = 0
+    
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        
+        # Average of the next bucket is the third triangle vertex
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+        
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(
+                (xs[selected] - avg_x) * (ys[j] - ys[selected])
+                - (xs[selected] - xs[j]) * (avg_y - ys[selected])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        selected = best
+    
+    sampled.append(points[-1])
+    return sampled
+
+
+def fill_balance_series(result: Dict, rows: List[Dict], max_points: int):
+    """
+    Fill a get_balance_series result from (asset, bucket, balance) rows
+    ordered by asset and bucket, downsampling each asset with LTTB
+    """
+    points = {}
+    for row in rows:
+        points.setdefault(row['asset'], []).append((row['bucket'], _exact_decimal(row['balance'])))
+    
+    for asset, asset_points in points.items():
+        result['points_before_downsampling'][asset] = len(asset_points)
+        # LTTB needs a numeric x; the day ordinal keeps uneven gaps proportional
+        numeric = [(bucket.toordinal(), balance) for bucket, balance in asset_points]
+        keep = {x for x, _ in downsample_lttb(numeric, max_points)}
+        result['series'][asset] = [
+            {'date': bucket.strftime('%Y-%m-%d'), 'balance': balance}
+            for bucket, balance in asset_points
+            if bucket.toordinal() in keep
+        ]
+
+
+FLOW_AMOUNT_FIELDS = ('inflow', 'outflow', 'usd_inflow', 'usd_outflow')
+FLOW_COUNT_FIELDS = ('incoming_count', 'outgoing_count')
+
+
+def fill_flow_statistics(statistics: Dict, rows: List[Dict]):
+    """Fold (bucket, network, asset, category) flow rows into a get_flow_statistics result"""
+    buckets = {}
+    for row in rows:
+        period = row['bucket'].strftime('%Y-%m-%d')
+        category = row['category'] or 'unknown'
+        count = int(row['incoming_count']) + int(row['outgoing_count'])
+        
+        key = (period, row['network'], row['asset'])
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = {'period': period, 'network': row['network'], 'asset': row['asset']}
+            bucket.update({field: Decimal(0) for field in FLOW_AMOUNT_FIELDS})
+            bucket.update({field: 0 for field in FLOW_COUNT_FIELDS})
+            bucket['transaction_types'] = {}
+            buckets[key] = bucket
+        
+        totals = statistics['totals'].setdefault(
+            row['asset'],
+            dict({field: Decimal(0) for field in FLOW_AMOUNT_FIELDS}, **{field: 0 for field in FLOW_COUNT_FIELDS})
+        )
+        for target in (bucket, totals):
+            for field in FLOW_AMOUNT_FIELDS:
+                target[field] = _exact_sum(target[field], row[field])
+            for field in FLOW_COUNT_FIELDS:
+                target[field] += int(row[field])
+        
+        bucket['transaction_types'][category] = bucket['transaction_types'].get(category, 0) + count
+        statistics['transaction_types'][category] = statistics['transaction_types'].get(category, 0) + count
+        statistics['total_transactions'] += count
+    
+    for target in list(buckets.values()) + list(statistics['totals'].values()):
+        target['net'] = _exact_decimal(EXACT_CONTEXT.subtract(target['inflow'], target['outflow']))
+    statistics['buckets'] = list(buckets.values())
+
+
 class DatabaseService:
-    def __init__(self, host: str, port: int, username: str, password: str, database: str):
+    def __init__(self, host: str, port: int, username: str, password: str, database: str,
+                 pool_size: int = 5, pool_timeout: float = 10.0, statement_timeout_ms: int = 30000,
+                 ping_after_idle: float = 60.0):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.database = database
-        self.connection = None
+        self.pool_size = min(pool_size, pooling.CNX_POOL_MAXSIZE)
+        self.pool_timeout = pool_timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self.ping_after_idle = ping_after_idle
+        self.pool = None
+        # When each physical connection (by server connection ID) was last returned to the pool
+        self._returned_at: Dict[int, float] = {}
+        # mysql.connector raises PoolError immediately when the pool is exhausted,
+        # so callers queue on this semaphore instead of failing under load
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+        # Optional DailyBalanceService answering balance-at-date lookups from the rollup
+        self.daily_balances = None
+        # Optional WalletRegistry resolving addresses from memory
+        self.wallet_registry = None
+        # Optional StatementCache reusing statements while a wallet's history is unchanged
+        self.statement_cache = None
+        # Optional MirrorService; with read_mode 'mirror' statements are read from the local copy
+        self.mirror = None
+        self.read_mode = 'remote'
         self.logger = logging.getLogger(__name__)
     
     def connect(self):
-        """Establish database connection"""
+        """Create the connection pool and verify it with one checkout"""
         try:
-            self.connection = mysql.connector.connect(
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"nobi_{self.database}_{id(self)}",
+                pool_size=self.pool_size,
+                pool_reset_session=True,
                 host=self.host,
                 port=self.port,
                 user=self.username,
                 password=self.password,
-                database=self.database
+                database=self.database,
+                # MAX_EXECUTION_TIME bounds read-only SELECT statements (milliseconds). The
+                # connector re-runs this after every session reset and reconnect.
+                init_command=f"SET SESSION MAX_EXECUTION_TIME = {int(self.statement_timeout_ms)}"
             )
-            if self.connection.is_connected():
-                logger.info(f"✅ Connected to MySQL database: {self.database}")
-                return True
+            with self.get_connection() as connection:
+                if connection.is_connected():
+                    logger.info(f"✅ Connected to MySQL database: {self.database} (pool size {self.pool_size})")
+                    return True
+            return False
         except Error as e:
             logger.error(f"❌ Database connection error: {e}")
+            self.pool = None
             return False
     
     def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("🔌 Database connection closed")
+        """Drop the connection pool"""
+        if self.pool:
+            # Idle connections close once the pool is garbage collected; connections
+            # still checked out finish their with-block and are closed along with it
+            self.pool = None
+            logger.info("🔌 Database connection pool closed")
+    
+    def is_connected(self) -> bool:
+        """Whether the connection pool has been created"""
+        return self.pool is not None
+    
+    def _reads_from_mirror(self) -> bool:
+        """Whether reads should go to the local analytics mirror"""
+        return self.read_mode == 'mirror' and self.mirror is not None and self.mirror.is_available()
+    
+    def _from_mirror(self, method: str, *args, **kwargs):
+        """
+        Answer a read from the local mirror's method of the same name
+        
+        Every statement, listing, series and statistics read goes through
+        here, so one response never mixes mirrored and live data. Returns
+        None when the mirror is not in use, does not know the wallet(s) yet
+        (added after the last sync) or fails (e.g. a partition file is
+        missing), in which case the caller reads the remote database.
+        """
+        if not self._reads_from_mirror():
+            return None
+        try:
+            addresses = [args[0]] if isinstance(args[0], str) else list(args[0])
+            missing = [address for address in addresses if self.mirror.get_wallet_id(address) is None]
+            if missing:
+                self.logger.info(f"Mirror has not synced {len(missing)} wallet(s) yet, reading the remote database instead")
+                return None
+            return getattr(self.mirror, method)(*args, **kwargs)
+        except Exception as e:
+            self.logger.warning(f"Mirror {method} failed, reading the remote database instead: {str(e)}")
+            return None
+    
+    @contextmanager
+    def get_connection(self, statement_timeout_ms: int = None):
+        """
+        Check out a pooled connection for the duration of a with-block
+        
+        The pool's init_command sets the default statement timeout once per
+        physical session; only an override costs a SET here, and the session
+        reset on return restores the default. A connection idle for more than
+        ping_after_idle seconds is pinged (and transparently re-established,
+        with retries, if the server dropped it) before use. Leaving the block
+        returns the connection to the pool.
+        
+        Args:
+            statement_timeout_ms: Override the default SELECT timeout (0 disables it)
+        """
+        if not self.pool:
+            raise Error("Database connection pool is not initialized")
+        
+        if not self._pool_slots.acquire(timeout=self.pool_timeout):
+            raise Error(f"Timed out after {self.pool_timeout}s waiting for a database connection")
+        
+        connection = None
+        try:
+            connection = self.pool.get_connection()
+            returned_at = self._returned_at.get(connection.connection_id)
+            if returned_at is not None and time.monotonic() - returned_at > self.ping_after_idle:
+                connection.ping(reconnect=True, attempts=3, delay=1)
+            if statement_timeout_ms is not None and statement_timeout_ms != self.statement_timeout_ms:
+                cursor = connection.cursor()
+                cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (int(statement_timeout_ms),))
+                cursor.close()
+            yield connection
+        finally:
+            if connection is not None:
+                # An abandoned unbuffered result would break the session reset on return
+                if connection.unread_result:
+                    connection.consume_results()
+                self._returned_at[connection.connection_id] = time.monotonic()
+                connection.close()  # returns the connection to the pool
+            self._pool_slots.release()
     
     def get_tables(self) -> List[str]:
         """Get list of all tables in database"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SHOW TABLES")
-            tables = [table[0] for table in cursor.fetchall()]
-            cursor.close()
+            with self.get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute("SHOW TABLES")
+                tables = [table[0] for table in cursor.fetchall()]
+                cursor.close()
             return tables
         except Error as e:
             logger.error(f"Error getting tables: {e}")
@@ -59,19 +395,20 @@ class DatabaseService:
     def get_table_structure(self, table_name: str) -> List[Dict]:
         """Get structure of a specific table"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"DESCRIBE {table_name}")
-            columns = []
-            for row in cursor.fetchall():
-                columns.append({
-                    'field': row[0],
-                    'type': row[1],
-                    'null': row[2],
-                    'key': row[3],
-                    'default': row[4],
-                    'extra': row[5]
-                })
-            cursor.close()
+            with self.get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(f"DESCRIBE {table_name}")
+                columns = []
+                for row in cursor.fetchall():
+                    columns.append({
+                        'field': row[0],
+                        'type': row[1],
+                        'null': row[2],
+                        'key': row[3],
+                        'default': row[4],
+                        'extra': row[5]
+                    })
+                cursor.close()
             return columns
         except Error as e:
             logger.error(f"Error getting table structure: {e}")
@@ -90,8 +427,6 @@ class DatabaseService:
             List of transaction records
         """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            
             # Build query
             query = """
                 SELECT * FROM transactions 
@@ -109,9 +444,11 @@ class DatabaseService:
             
             query += " ORDER BY transaction_date ASC"
             
-            cursor.execute(query, params)
-            transactions = cursor.fetchall()
-            cursor.close()
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                transactions = cursor.fetchall()
+                cursor.close()
             
             logger.info(f"📊 Found {len(transactions)} transactions for {address}")
             return transactions
@@ -120,43 +457,248 @@ class DatabaseService:
             logger.error(f"Error getting transaction history: {e}")
             return []
     
-    def get_wallet_id(self, wallet_address):
+    def get_wallet_id(self, wallet_address, strict: bool = False):
         """
         Get wallet ID from address (handles case-insensitive lookup)
         
         Args:
             wallet_address: Wallet address to look up
+            strict: Raise database errors instead of treating them as not found
             
         Returns:
             str: Wallet ID (UUID) or None if not found
         """
-        if not self.connection:
+        if not self.pool:
             return None
         
+        if self.wallet_registry:
+            try:
+                return self.wallet_registry.get_wallet_id(wallet_address)
+            except Exception as e:
+                self.logger.warning(f"Wallet registry lookup failed, querying wallets table: {str(e)}")
+        
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                
+                # Query wallets table with case-insensitive address match
+                query = "SELECT id FROM wallets WHERE LOWER(address) = LOWER(%s)"
+                cursor.execute(query, (wallet_address,))
+                result = cursor.fetchone()
+                
+                # Important: Consume any remaining results before closing cursor
+                try:
+                    cursor.fetchall()
+                except:
+                    pass
+                
+                cursor.close()
+            
+            if result:
+                return result['id']
+            return None
             
-            # Query wallets table with case-insensitive address match
-            query = "SELECT id FROM wallets WHERE LOWER(address) = LOWER(%s)"
-            cursor.execute(query, (wallet_address,))
-            result = cursor.fetchone()
+        except Exception as e:
+            self.logger.error(f"Error looking up wallet ID: {str(e)}")
+            if strict:
+                raise
+            return None
+    
+    def get_wallet_ids(self, wallet_addresses: List[str]) -> Dict[str, str]:
+        """
+        Resolve many wallet addresses at once
+        
+        Args:
+            wallet_addresses: Wallet addresses to look up
             
-            # Important: Consume any remaining results before closing cursor
+        Returns:
+            dict: {address as given: wallet ID} for the addresses that exist
+        """
+        if not self.pool or not wallet_addresses:
+            return {}
+        
+        if self.wallet_registry:
             try:
-                cursor.fetchall()
-            except:
-                pass
+                return self.wallet_registry.get_wallet_ids(wallet_addresses)
+            except Exception as e:
+                self.logger.warning(f"Wallet registry lookup failed, querying wallets table: {str(e)}")
+        
+        try:
+            keys = sorted({address.strip().lower() for address in wallet_addresses})
+            placeholders = ', '.join(['%s'] * len(keys))
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(f"SELECT id, address FROM wallets WHERE LOWER(address) IN ({placeholders})", keys)
+                found = wallet_ids_by_address(cursor.fetchall())
+                cursor.close()
             
-            cursor.close()
+            return {
+                address: found[address.strip().lower()]
+                for address in wallet_addresses
+                if address.strip().lower() in found
+            }
             
-            if result:
-                return result['id']
+        except Exception as e:
+            self.logger.error(f"Error looking up wallet IDs: {str(e)}")
+            return {}
+    
+    def get_wallet_id_for_network(self, wallet_address, network: str):
+        """
+        Wallet ID an address's transactions on one network belong to
+        
+        The same address can be registered more than once (an EVM address
+        tracked as separate wallets per chain). Then the wallet that already
+        has history on the network wins; without any, the first row is used
+        like get_wallet_id.
+        
+        Args:
+            wallet_address: Wallet address to look up
+            network: transaction_history.network value ('eth-mainnet', ...)
+        
+        Returns:
+            str: Wallet ID (UUID) or None if not found
+        """
+        if not self.pool:
             return None
-            
+        
+        try:
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute("SELECT id FROM wallets WHERE LOWER(address) = LOWER(%s)", (wallet_address,))
+                wallet_ids = [row['id'] for row in cursor.fetchall()]
+                if len(wallet_ids) > 1:
+                    # One (walletId, network) probe per candidate on idx_th_wallet_network_keyset
+                    cursor.execute(
+                        f"SELECT walletId FROM transaction_history WHERE walletId IN "
+                        f"({', '.join(['%s'] * len(wallet_ids))}) AND network = %s LIMIT 1",
+                        wallet_ids + [network]
+                    )
+                    owner = cursor.fetchone()
+                    cursor.fetchall()
+                    if owner:
+                        wallet_ids = [owner['walletId']]
+                    else:
+                        self.logger.warning(
+                            f"⚠️ {len(wallet_ids)} wallets share {wallet_address} and none has {network} "
+                            f"history yet, using {wallet_ids[0]}"
+                        )
+                cursor.close()
+            return wallet_ids[0] if wallet_ids else None
+        
         except Exception as e:
             self.logger.error(f"Error looking up wallet ID: {str(e)}")
             return None
     
+    def get_history_watermark(self, wallet_id, network=None) -> tuple:
+        """
+        Cheap fingerprint of a wallet's history: (row count, latest timestamp, checksum)
+        
+        The checksum sums a CRC32 of every column a statement aggregates, so
+        in-place updates and delete+insert pairs move the watermark as well
+        as new rows. Everything is read from the covering
+        idx_th_wallet_ts_cover index, so it can be probed on every request.
+        """
+        query, params = self._history_watermark_query(wallet_id, network)
+        with self.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            cursor.close()
+        return (
+            int(row['row_count']),
+            str(row['latest']) if row['latest'] else None,
+            str(row['checksum']) if row['checksum'] is not None else None
+        )
+    
+    def _history_watermark_query(self, wallet_id, network=None):
+        """Build the (query, params) pair of get_history_watermark"""
+        query = """
+            SELECT COUNT(*) AS row_count,
+                   MAX(timestamp) AS latest,
+                   SUM(CRC32(CONCAT_WS('|', timestamp, network, asset, direction, value))) AS checksum
+            FROM transaction_history
+            WHERE walletId = %s
+        """
+        params = [wallet_id]
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        return query, params
+    
+    def _balance_aggregate_query(self, wallet_id, upper_bound, inclusive=False, network=None):
+        """Build the (query, params) pair summing net movement per asset"""
+        # Use walletId since walletAddress may be empty for EVM chains
+        query = f"""
+            SELECT asset,
+                   {NET_VALUE_SUM} AS balance,
+                   COUNT(*) AS tx_count
+            FROM transaction_history
+            WHERE walletId = %s
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [wallet_id]
+        
+        if upper_bound:
+            query += " AND timestamp <= %s" if inclusive else " AND timestamp < %s"
+            params.append(upper_bound)
+        
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        
+        query += " GROUP BY asset"
+        return query, params
+    
+    def _aggregate_balances(self, wallet_id, upper_bound, inclusive=False, network=None):
+        """
+        Net balance per asset computed by MySQL in a single GROUP BY query
+        
+        Args:
+            wallet_id: Wallet ID (UUID)
+            upper_bound: Timestamp string bounding the history, or None for all history
+            inclusive: Whether rows exactly at upper_bound are included
+            network: Optional network filter
+            
+        Returns:
+            tuple: ({asset: Decimal balance}, number of transactions aggregated)
+        """
+        query, params = self._balance_aggregate_query(wallet_id, upper_bound, inclusive, network)
+        
+        with self.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        
+        balances = {row['asset']: _exact_decimal(row['balance']) for row in rows}
+        transactions_counted = sum(int(row['tx_count']) for row in rows)
+        return balances, transactions_counted
+    
+    def get_wallet_balances(self, wallet_id, network=None) -> Dict[str, Decimal]:
+        """
+        Current net balance per asset of a wallet ID over all of its history
+        
+        Args:
+            wallet_id: Wallet ID (UUID)
+            network: Optional network filter
+            
+        Returns:
+            dict: {asset: Decimal balance}
+        """
+        balances, _ = self._aggregate_balances(wallet_id, None, network=network)
+        return balances
+    
+    def _rollup_balances_at(self, wallet_id, day, network=None):
+        """Balances at the close of a day from the daily rollup, or None if unavailable"""
+        if not self.daily_balances:
+            return None
+        try:
+            return self.daily_balances.get_balances_at(wallet_id, day, network)
+        except Exception as e:
+            self.logger.warning(f"Daily balance rollup unavailable, falling back to history scan: {str(e)}")
+            return None
+    
     def calculate_opening_balance(self, wallet_address, cutoff_date, network=None):
         """
         Calculate opening balance as of a specific cutoff date
@@ -169,11 +711,15 @@ class DatabaseService:
         Returns:
             dict: {
                 'opening_date': cutoff_date,
-                'balances': {'ETH': 10.5, 'USDC': 1000.0, ...},
+                'balances': {'ETH': Decimal('10.5'), 'USDC': Decimal('1000'), ...},
                 'transactions_counted': 15
             }
         """
-        if not self.connection:
+        mirrored = self._from_mirror('calculate_opening_balance', wallet_address, cutoff_date, network)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
             self.logger.error("Not connected to database")
             return {'opening_date': cutoff_date, 'balances': {}, 'transactions_counted': 0}
         
@@ -184,50 +730,16 @@ class DatabaseService:
                 self.logger.warning(f"Wallet not found: {wallet_address}")
                 return {'opening_date': cutoff_date, 'balances': {}, 'transactions_counted': 0}
             
-            cursor = self.connection.cursor(dictionary=True)
-            
-            # Query transactions BEFORE the cutoff date with non-null values
-            # Use walletId since walletAddress may be empty for EVM chains
-            query = """
-                SELECT asset, value, direction
-                FROM transaction_history
-                WHERE walletId = %s
-                AND timestamp < %s
-                AND value IS NOT NULL
-                AND asset IS NOT NULL
-            """
-            
-            params = [wallet_id, f"{cutoff_date} 23:59:59"]
-            
-            # Add network filter if provided
-            if network:
-                query += " AND network = %s"
-                params.append(network)
-            
-            query += " ORDER BY timestamp ASC"
-            
-            cursor.execute(query, params)
-            transactions = cursor.fetchall()
-            
-            # Calculate balance per token
-            balances = {}
-            for tx in transactions:
-                token = tx['asset']
-                value = float(tx['value'])
-                direction = tx['direction']
-                
-                if token not in balances:
-                    balances[token] = 0.0
-                
-                # Add for incoming, subtract for outgoing
-                if direction == 'incoming':
-                    balances[token] += value
-                else:  # outgoing
-                    balances[token] -= value
+            # Prefer the daily rollup; aggregate transactions BEFORE the cutoff otherwise
+            rollup = self._rollup_balances_at(wallet_id, cutoff_date, network)
+            if rollup is not None:
+                balances, transactions_counted = rollup
+            else:
+                balances, transactions_counted = self._aggregate_balances(
+                    wallet_id, f"{cutoff_date} 23:59:59", inclusive=False, network=network
+                )
             
-            cursor.close()
-            
-            self.logger.info(f"💰 Opening balance as of {cutoff_date}: {len(balances)} tokens, {len(transactions)} transactions")
+            self.logger.info(f"💰 Opening balance as of {cutoff_date}: {len(balances)} tokens, {transactions_counted} transactions")
             for token, balance in balances.items():
                 if balance > 0:
                     self.logger.info(f"   {token}: {balance}")
@@ -235,7 +747,7 @@ class DatabaseService:
             return {
                 'opening_date': cutoff_date,
                 'balances': balances,
-                'transactions_counted': len(transactions)
+                'transactions_counted': transactions_counted
             }
             
         except Exception as e:
@@ -255,10 +767,14 @@ class DatabaseService:
         Returns:
             dict: {
                 'current_date': end_date or current datetime,
-                'balances': {'ETH': 15.2, 'USDC': 1200.0, ...}
+                'balances': {'ETH': Decimal('15.2'), 'USDC': Decimal('1200'), ...}
             }
         """
-        if not self.connection:
+        mirrored = self._from_mirror('get_current_balance', wallet_address, end_date, network)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
             self.logger.error("Not connected to database")
             return {'current_date': end_date, 'balances': {}}
         
@@ -269,51 +785,10 @@ class DatabaseService:
                 self.logger.warning(f"Wallet not found: {wallet_address}")
                 return {'current_date': end_date, 'balances': {}}
             
-            cursor = self.connection.cursor(dictionary=True)
-            
-            # Query all transactions up to end_date with non-null values
-            query = """
-                SELECT asset, value, direction
-                FROM transaction_history
-                WHERE walletId = %s
-                AND value IS NOT NULL
-                AND asset IS NOT NULL
-            """
-            
-            params = [wallet_id]
-            
-            # Add date filter if provided
-            if end_date:
-                query += " AND timestamp <= %s"
-                params.append(f"{end_date} 23:59:59")
-            
-            # Add network filter if provided
-            if network:
-                query += " AND network = %s"
-                params.append(network)
-            
-            query += " ORDER BY timestamp ASC"
-            
-            cursor.execute(query, params)
-            transactions = cursor.fetchall()
-            
-            # Calculate balance per token
-            balances = {}
-            for tx in transactions:
-                token = tx['asset']
-                value = float(tx['value'])
-                direction = tx['direction']
-                
-                if token not in balances:
-                    balances[token] = 0.0
-                
-                # Add for incoming, subtract for outgoing
-                if direction == 'incoming':
-                    balances[token] += value
-                else:  # outgoing
-                    balances[token] -= value
-            
-            cursor.close()
+            # Aggregate all transactions up to end_date with non-null values
+            balances, _ = self._aggregate_balances(
+                wallet_id, f"{end_date} 23:59:59" if end_date else None, inclusive=True, network=network
+            )
             
             self.logger.info(f"📊 Current balance as of {end_date or 'now'}: {len(balances)} tokens")
             
@@ -326,6 +801,26 @@ class DatabaseService:
             self.logger.error(f"Error calculating current balance: {str(e)}")
             return {'current_date': end_date, 'balances': {}}
     
+    def _period_transactions_query(self, wallet_id, start_date, end_date, network=None, oldest_first=False):
+        """Build the (query, params) pair listing a wallet's transactions in a period (newest first by default)"""
+        query = f"""
+            SELECT {PERIOD_TRANSACTION_COLUMNS}
+            FROM transaction_history
+            WHERE walletId = %s
+            AND timestamp >= %s
+            AND timestamp <= %s
+        """
+        
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+        
+        # Add network filter if provided
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        
+        query += " ORDER BY timestamp ASC" if oldest_first else " ORDER BY timestamp DESC"
+        return query, params
+    
     def get_transactions_in_period(self, wallet_address, start_date, end_date, network=None):
         """
         Get all transactions in a specific period for display
@@ -339,7 +834,11 @@ class DatabaseService:
         Returns:
             list: List of transaction dicts with formatted data for frontend display
         """
-        if not self.connection:
+        mirrored = self._from_mirror('get_transactions_in_period', wallet_address, start_date, end_date, network)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
             self.logger.error("Not connected to database")
             return []
         
@@ -350,45 +849,680 @@ class DatabaseService:
                 self.logger.warning(f"Wallet not found: {wallet_address}")
                 return []
             
-            cursor = self.connection.cursor(dictionary=True)
+            query, params = self._period_transactions_query(wallet_id, start_date, end_date, network)
             
-            # Query transactions in the period
-            query = """
-                SELECT 
-                    hash as transaction_hash,
-                    timestamp as transaction_date,
-                    asset as token_symbol,
-                    value as amount,
-                    direction,
-                    usdValue as usd_value,
-                    network,
-                    fromAddress as from_address,
-                    toAddress as to_address,
-                    category as transaction_type
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                transactions = cursor.fetchall()
+                cursor.close()
+            
+            self.logger.info(f"📋 Found {len(transactions)} transactions between {start_date} and {end_date}")
+            
+            return transactions
+            
+        except Exception as e:
+            self.logger.error(f"Error getting transactions: {str(e)}")
+            return []
+    
+    def _transactions_page_query(self, wallet_id, start_date, end_date, network=None, limit=100, after=None):
+        """
+        Build the (query, params) pair for one keyset page of a period listing
+        
+        Rows are ordered newest first by (timestamp, hash, asset, direction) and
+        the page starts strictly after the `after` key, so every page is an
+        index seek plus `limit` rows no matter how deep it is.
+        """
+        query = f"""
+            SELECT {PERIOD_TRANSACTION_COLUMNS}
+            FROM transaction_history
+            WHERE walletId = %s
+            AND timestamp >= %s
+            AND timestamp <= %s
+        """
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+        
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        
+        if after:
+            condition, condition_params = keyset_after_condition(after)
+            query += f" AND {condition}"
+            params.extend(condition_params)
+        
+        # MySQL sorts NULLs last in DESC order, as keyset_after_condition expects
+        query += " ORDER BY " + ", ".join(f"{column} DESC" for column in KEYSET_COLUMNS)
+        query += " LIMIT %s"
+        # One extra row tells whether another page exists
+        params.append(int(limit) + 1)
+        return query, params
+    
+    def get_transactions_page(self, wallet_address, start_date, end_date, network=None, limit=100, after=None):
+        """
+        Get one page of a period's transactions using keyset pagination
+        
+        Args:
+            wallet_address: Wallet address to get transactions for
+            start_date: Start date string (YYYY-MM-DD)
+            end_date: End date string (YYYY-MM-DD)
+            network: Optional network filter
+            limit: Maximum rows in the page
+            after: Cursor returned as next_cursor by the previous page
+            
+        Returns:
+            dict: {
+                'transactions': [...],
+                'next_cursor': 'WyIyMDI1LTA...' or None,
+                'has_more': True
+            }
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after_key = decode_page_cursor(after) if after else None
+        page = {'transactions': [], 'next_cursor': None, 'has_more': False}
+        
+        mirrored = self._from_mirror('get_transactions_page', wallet_address, start_date, end_date, network, limit, after)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
+            self.logger.error("Not connected to database")
+            return page
+        
+        try:
+            wallet_id = self.get_wallet_id(wallet_address)
+            if not wallet_id:
+                self.logger.warning(f"Wallet not found: {wallet_address}")
+                return page
+            
+            query, params = self._transactions_page_query(wallet_id, start_date, end_date, network, limit, after_key)
+            
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                cursor.close()
+            
+            page['has_more'] = len(rows) > limit
+            page['transactions'] = rows[:limit]
+            if page['has_more']:
+                page['next_cursor'] = encode_page_cursor(page['transactions'][-1])
+            return page
+            
+        except Exception as e:
+            self.logger.error(f"Error getting transactions page: {str(e)}")
+            return page
+    
+    def iter_transactions_in_period(self, wallet_address, start_date, end_date, network=None, chunk_size=1000,
+                                    oldest_first=False, wallet_id=None):
+        """
+        Stream the transactions of a period without materializing them
+        
+        Rows come from an unbuffered server-side cursor in fetchmany chunks, so
+        memory stays bounded by chunk_size however many rows the period holds.
+        The pooled connection is held until the generator is exhausted or closed.
+        
+        Args:
+            wallet_address: Wallet address to get transactions for
+            start_date: Start date string (YYYY-MM-DD)
+            end_date: End date string (YYYY-MM-DD)
+            network: Optional network filter
+            chunk_size: Rows fetched from the server per round trip
+            oldest_first: Stream in ascending timestamp order instead of newest first
+            wallet_id: Wallet ID if the caller already resolved it
+            
+        Yields:
+            dict: Transaction rows in the same shape as get_transactions_in_period
+        """
+        mirrored = self._from_mirror(
+            'iter_transactions_in_period', wallet_address, start_date, end_date, network, chunk_size, oldest_first,
+            wallet_id=wallet_id
+        )
+        if mirrored is not None:
+            yield from mirrored
+            return
+        
+        if not self.pool:
+            self.logger.error("Not connected to database")
+            return
+        
+        wallet_id = wallet_id or self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found: {wallet_address}")
+            return
+        
+        query, params = self._period_transactions_query(wallet_id, start_date, end_date, network, oldest_first)
+        streamed = 0
+        
+        # Streaming is paced by the consumer, so the SELECT timeout is lifted
+        with self.get_connection(statement_timeout_ms=0) as connection:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    streamed += len(rows)
+                    yield from rows
+            finally:
+                # Drain what the consumer did not read (e.g. client disconnected)
+                if connection.unread_result:
+                    connection.consume_results()
+                cursor.close()
+        
+        self.logger.info(f"📋 Streamed {streamed} transactions between {start_date} and {end_date}")
+    
+    def _statement_aggregate_query(self, wallet_id, start_date, end_date, network=None, after_cutoff_only=False):
+        """
+        Build the (query, params) pair splitting each asset's history into
+        opening balance and period change with conditional aggregation
+        
+        When after_cutoff_only is set (opening balance taken from the daily
+        rollup) only rows after the opening day are aggregated.
+        """
+        cutoff = f"{start_date} 23:59:59"
+        query = f"""
+            SELECT asset,
+                   SUM(CASE WHEN timestamp < %s THEN {SIGNED_VALUE} ELSE 0 END) AS opening,
+                   SUM(CASE WHEN timestamp >= %s THEN {SIGNED_VALUE} ELSE 0 END) AS period_change,
+                   SUM(CASE WHEN timestamp < %s THEN 1 ELSE 0 END) AS opening_count
+            FROM transaction_history
+            WHERE walletId = %s
+            AND timestamp <= %s
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [cutoff, cutoff, cutoff, wallet_id, f"{end_date} 23:59:59"]
+        
+        if after_cutoff_only:
+            query += " AND timestamp > %s"
+            params.append(cutoff)
+        
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        
+        query += " GROUP BY asset"
+        return query, params
+    
+    def _batch_statement_aggregate_query(self, wallet_ids, start_date, end_date, network=None):
+        """Build the (query, params) pair for _statement_aggregate_query over many wallets at once"""
+        cutoff = f"{start_date} 23:59:59"
+        placeholders = ', '.join(['%s'] * len(wallet_ids))
+        query = f"""
+            SELECT walletId, asset,
+                   SUM(CASE WHEN timestamp < %s THEN {SIGNED_VALUE} ELSE 0 END) AS opening,
+                   SUM(CASE WHEN timestamp >= %s THEN {SIGNED_VALUE} ELSE 0 END) AS period_change,
+                   SUM(CASE WHEN timestamp < %s THEN 1 ELSE 0 END) AS opening_count
+            FROM transaction_history
+            WHERE walletId IN ({placeholders})
+            AND timestamp <= %s
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [cutoff, cutoff, cutoff] + list(wallet_ids) + [f"{end_date} 23:59:59"]
+        
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        
+        query += " GROUP BY walletId, asset"
+        return query, params
+    
+    def get_statements_batch(self, wallet_addresses, start_date, end_date=None, network=None, wallets_per_query=200):
+        """
+        Opening and closing balances for many wallets in a few grouped queries
+        
+        Wallets are resolved in one lookup and aggregated wallets_per_query at a
+        time with GROUP BY walletId, asset, so a month-end close over hundreds of
+        wallets takes a handful of round trips. Period transactions are not listed.
+        
+        Args:
+            wallet_addresses: Wallet addresses to build statements for
+            start_date: Opening balance date (YYYY-MM-DD)
+            end_date: Optional closing date (YYYY-MM-DD), defaults to today
+            network: Optional network filter
+            wallets_per_query: Wallet IDs per IN-list
+            
+        Returns:
+            dict: {
+                'opening_date': '2025-03-31',
+                'end_date': '2025-11-15',
+                'wallets': {
+                    '0x...': {
+                        'opening_balance': {...},
+                        'period_change': {...},
+                        'closing_balance': {...},
+                        'transactions_counted_for_opening': 150
+                    }
+                },
+                'not_found': ['0x...']
+            }
+        """
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        result = {'opening_date': start_date, 'end_date': end_date, 'wallets': {}, 'not_found': []}
+        
+        mirrored = self._from_mirror('get_statements_batch', wallet_addresses, start_date, end_date, network)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
+            self.logger.error("Not connected to database")
+            result['not_found'] = list(wallet_addresses)
+            return result
+        
+        try:
+            wallet_ids = self.get_wallet_ids(wallet_addresses)
+            result['not_found'] = [address for address in wallet_addresses if address not in wallet_ids]
+            
+            statements = {}
+            addresses_by_id = {}
+            for address, wallet_id in wallet_ids.items():
+                addresses_by_id.setdefault(wallet_id, []).append(address)
+                statements[wallet_id] = {
+                    'opening_balance': {},
+                    'period_change': {},
+                    'closing_balance': {},
+                    'transactions_counted_for_opening': 0
+                }
+            
+            ids = list(statements)
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                for i in range(0, len(ids), wallets_per_query):
+                    query, params = self._batch_statement_aggregate_query(
+                        ids[i:i + wallets_per_query], start_date, end_date, network
+                    )
+                    cursor.execute(query, params)
+                    for row in cursor.fetchall():
+                        statement = statements[row['walletId']]
+                        asset = row['asset']
+                        opening = _exact_decimal(row['opening'])
+                        change = _exact_decimal(row['period_change'])
+                        opening_count = int(row['opening_count'] or 0)
+                        if opening_count:
+                            statement['opening_balance'][asset] = opening
+                        statement['period_change'][asset] = change
+                        statement['closing_balance'][asset] = _exact_sum(opening, change)
+                        statement['transactions_counted_for_opening'] += opening_count
+                cursor.close()
+            
+            for wallet_id, addresses in addresses_by_id.items():
+                for address in addresses:
+                    result['wallets'][address] = statements[wallet_id]
+            
+            self.logger.info(
+                f"🧾 Batch statements {start_date} → {end_date}: {len(result['wallets'])} wallets, "
+                f"{len(result['not_found'])} not found"
+            )
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Error building batch statements: {str(e)}")
+            return result
+    
+    def _balance_series_query(self, wallet_id, start_date, end_date, network=None, interval='day'):
+        """Build the (query, params) pair for per-asset running balances per bucket"""
+        bucket = TIME_BUCKETS[interval]
+        # History before the start date is folded into the first bucket, so the
+        # window sum starts from the opening balance instead of zero
+        network_filter = " AND network = %s" if network else ""
+        query = f"""
+            SELECT asset, bucket,
+                   SUM(delta) OVER (PARTITION BY asset ORDER BY bucket) AS balance
+            FROM (
+                SELECT asset,
+                       CAST(GREATEST({bucket}, CAST(%s AS DATE)) AS DATE) AS bucket,
+                       {NET_VALUE_SUM} AS delta
                 FROM transaction_history
                 WHERE walletId = %s
-                AND timestamp >= %s
-                AND timestamp <= %s
-            """
+                AND timestamp <= %s{network_filter}
+                AND value IS NOT NULL
+                AND asset IS NOT NULL
+                GROUP BY asset, bucket
+            ) buckets
+            ORDER BY asset, bucket
+        """
+        params = [start_date, wallet_id, f"{end_date} 23:59:59"] + ([network] if network else [])
+        return query, params
+    
+    def get_balance_series(self, wallet_address, start_date, end_date=None, network=None,
+                           interval='day', max_points=500):
+        """
+        Running balance per asset over time, computed in SQL and downsampled
+        
+        Each asset gets one point per day (or week, or month) with
+        activity; the first point is the start date and includes all earlier
+        history. Balances hold between points, so charts should draw steps.
+        Series longer than max_points are reduced with LTTB.
+        
+        Args:
+            wallet_address: Wallet address
+            start_date: First date of the series (YYYY-MM-DD)
+            end_date: Optional last date (YYYY-MM-DD), defaults to today
+            network: Optional network filter
+            interval: 'day', 'week' or 'month'
+            max_points: Maximum points per asset after downsampling
+        
+        Returns:
+            dict: {
+                'start_date': '2025-01-01',
+                'end_date': '2025-11-15',
+                'interval': 'day',
+                'series': {'ETH': [{'date': '2025-01-01', 'balance': Decimal('10.5')}, ...]},
+                'points_before_downsampling': {'ETH': 312}
+            }
+        """
+        if interval not in TIME_BUCKETS:
+            raise ValueError(f"interval must be one of: {', '.join(TIME_BUCKETS)}")
+        
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        result = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'interval': interval,
+            'series': {},
+            'points_before_downsampling': {}
+        }
+        
+        mirrored = self._from_mirror(
+            'get_balance_series', wallet_address, start_date, end_date, network, interval, max_points
+        )
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
+            self.logger.error("Not connected to database")
+            return result
+        
+        try:
+            wallet_id = self.get_wallet_id(wallet_address)
+            if not wallet_id:
+                self.logger.warning(f"Wallet not found: {wallet_address}")
+                return result
             
-            params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+            cache_key = None
+            if self.statement_cache:
+                watermark = self.get_history_watermark(wallet_id, network)
+                cache_key = ('balance_series', wallet_id, network, start_date, end_date, interval, max_points)
+                cached = self.statement_cache.get(cache_key, watermark)
+                if cached is not None:
+                    return cached
             
-            # Add network filter if provided
-            if network:
-                query += " AND network = %s"
-                params.append(network)
+            query, params = self._balance_series_query(wallet_id, start_date, end_date, network, interval)
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                cursor.close()
             
-            query += " ORDER BY timestamp DESC"
+            fill_balance_series(result, rows, max_points)
             
-            cursor.execute(query, params)
-            transactions = cursor.fetchall()
+            self.logger.info(
+                f"📈 Balance series {start_date} → {end_date} ({interval}): "
+                f"{len(result['series'])} assets, {len(rows)} buckets"
+            )
             
-            cursor.close()
+            if cache_key:
+                self.statement_cache.put(cache_key, watermark, result, row_count=len(rows))
+            return result
             
-            self.logger.info(f"📋 Found {len(transactions)} transactions between {start_date} and {end_date}")
+        except Exception as e:
+            self.logger.error(f"Error building balance series: {str(e)}")
+            return result
+    
+    def _flow_statistics_query(self, wallet_id, start_date, end_date, network=None, interval='month'):
+        """Build the (query, params) pair for in/out flows per bucket, network, asset and category"""
+        amount = "CAST(value AS DECIMAL(65, 30))"
+        usd = "CAST(usdValue AS DECIMAL(65, 30))"
+        query = f"""
+            SELECT {TIME_BUCKETS[interval]} AS bucket,
+                   network,
+                   asset,
+                   category,
+                   SUM(CASE WHEN direction = 'incoming' THEN {amount} ELSE 0 END) AS inflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE {amount} END) AS outflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 1 ELSE 0 END) AS incoming_count,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE 1 END) AS outgoing_count,
+                   SUM(CASE WHEN direction = 'incoming' THEN {usd} ELSE 0 END) AS usd_inflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE {usd} END) AS usd_outflow
+            FROM transaction_history
+            WHERE walletId = %s
+            AND timestamp >= %s
+            AND timestamp <= %s
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59"]
+        if network:
+            query += " AND network = %s"
+            params.append(network)
+        query += " GROUP BY bucket, network, asset, category ORDER BY bucket, network, asset"
+        return query, params
+    
+    def get_flow_statistics(self, wallet_address, start_date, end_date=None, network=None, interval='month'):
+        """
+        Inflow/outflow statistics for the statement period, bucketed by time
+        
+        One GROUP BY over (bucket, network, asset, category) provides both the
+        flow totals and the category breakdowns; everything else is folded
+        from its result rows. Uses the same period boundaries as
+        get_transactions_in_period.
+        
+        Args:
+            wallet_address: Wallet address
+            start_date: Period start date (YYYY-MM-DD)
+            end_date: Optional period end date (YYYY-MM-DD), defaults to today
+            network: Optional network filter
+            interval: 'day', 'week' or 'month'
+        
+        Returns:
+            dict: {
+                'interval': 'month',
+                'buckets': [{
+                    'period': '2025-03-01', 'network': 'eth-mainnet', 'asset': 'ETH',
+                    'inflow': Decimal('5'), 'outflow': Decimal('1.2'), 'net': Decimal('3.8'),
+                    'incoming_count': 3, 'outgoing_count': 1,
+                    'usd_inflow': Decimal('15000'), 'usd_outflow': Decimal('3600'),
+                    'transaction_types': {'external': 4}
+                }, ...],
+                'totals': {'ETH': {same amounts and counts, summed over buckets and networks}},
+                'transaction_types': {'external': 20, 'erc20': 5},
+                'total_transactions': 25
+            }
+        """
+        if interval not in TIME_BUCKETS:
+            raise ValueError(f"interval must be one of: {', '.join(TIME_BUCKETS)}")
+        
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        statistics = {
+            'interval': interval,
+            'buckets': [],
+            'totals': {},
+            'transaction_types': {},
+            'total_transactions': 0
+        }
+        
+        mirrored = self._from_mirror('get_flow_statistics', wallet_address, start_date, end_date, network, interval)
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
+            self.logger.error("Not connected to database")
+            return statistics
+        
+        try:
+            wallet_id = self.get_wallet_id(wallet_address)
+            if not wallet_id:
+                self.logger.warning(f"Wallet not found: {wallet_address}")
+                return statistics
             
-            return transactions
+            cache_key = None
+            if self.statement_cache:
+                watermark = self.get_history_watermark(wallet_id, network)
+                cache_key = ('flow_statistics', wallet_id, network, start_date, end_date, interval)
+                cached = self.statement_cache.get(cache_key, watermark)
+                if cached is not None:
+                    return cached
+            
+            query, params = self._flow_statistics_query(wallet_id, start_date, end_date, network, interval)
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                cursor.close()
+            
+            fill_flow_statistics(statistics, rows)
+            
+            if cache_key:
+                self.statement_cache.put(cache_key, watermark, statistics, row_count=len(rows))
+            return statistics
             
         except Exception as e:
-            self.logger.error(f"Error getting transactions: {str(e)}")
-            return []
+            self.logger.error(f"Error building flow statistics: {str(e)}")
+            return statistics
+    
+    def statement_queries(self, wallet_id, start_date, end_date, network=None) -> Dict[str, tuple]:
+        """
+        Every transaction_history query this service issues for a statement,
+        as (query, params) pairs keyed by name, for EXPLAIN-based plan checks
+        """
+        return {
+            'history_watermark': self._history_watermark_query(wallet_id, network),
+            'opening_balance': self._balance_aggregate_query(wallet_id, f"{start_date} 23:59:59", False, network),
+            'current_balance': self._balance_aggregate_query(wallet_id, f"{end_date} 23:59:59", True, network),
+            'statement_aggregate': self._statement_aggregate_query(wallet_id, start_date, end_date, network),
+            'statement_aggregate_after_rollup': self._statement_aggregate_query(
+                wallet_id, start_date, end_date, network, after_cutoff_only=True
+            ),
+            'batch_statement_aggregate': self._batch_statement_aggregate_query([wallet_id], start_date, end_date, network),
+            'period_transactions': self._period_transactions_query(wallet_id, start_date, end_date, network),
+            'balance_series': self._balance_series_query(wallet_id, start_date, end_date, network),
+            'flow_statistics': self._flow_statistics_query(wallet_id, start_date, end_date, network),
+            'transactions_page': self._transactions_page_query(
+                wallet_id, start_date, end_date, network,
+                after=(f"{end_date} 12:00:00", '', '', '')
+            ),
+        }
+    
+    def get_statement(self, wallet_address, start_date, end_date=None, network=None, include_transactions=True,
+                      wallet_id=None):
+        """
+        Get opening balance, closing balance and period transactions in one pass
+        
+        The wallet is resolved once. A single conditional-aggregation query
+        splits each asset's history into the opening balance (before the
+        cutoff) and the movement up to the end date, and the closing balance
+        is derived as opening + period change instead of a second full scan.
+        Uses the same date boundaries as calculate_opening_balance,
+        get_current_balance and get_transactions_in_period.
+        
+        Args:
+            wallet_address: Wallet address to build the statement for
+            start_date: Opening balance date (YYYY-MM-DD)
+            end_date: Optional closing date (YYYY-MM-DD), defaults to today
+            network: Optional network filter
+            include_transactions: Also fetch the period rows (skip when streaming them)
+            wallet_id: Wallet ID if the caller already resolved it
+            
+        Returns:
+            dict: {
+                'opening_date': '2025-03-31',
+                'end_date': '2025-11-15',
+                'opening_balance': {'ETH': Decimal('10.5'), ...},
+                'period_change': {'ETH': Decimal('4.7'), ...},
+                'closing_balance': {'ETH': Decimal('15.2'), ...},
+                'transactions': [...],
+                'transactions_counted_for_opening': 150
+            }
+            An unknown wallet yields empty balances.
+        
+        Raises:
+            Error: The database is not connected or a query failed, so callers
+                never present empty balances for a failed read
+        """
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        statement = {
+            'opening_date': start_date,
+            'end_date': end_date,
+            'opening_balance': {},
+            'period_change': {},
+            'closing_balance': {},
+            'transactions': [],
+            'transactions_counted_for_opening': 0
+        }
+        
+        mirrored = self._from_mirror(
+            'get_statement', wallet_address, start_date, end_date, network, include_transactions, wallet_id=wallet_id
+        )
+        if mirrored is not None:
+            return mirrored
+        
+        if not self.pool:
+            raise Error("Not connected to database")
+        
+        try:
+            wallet_id = wallet_id or self.get_wallet_id(wallet_address)
+            if not wallet_id:
+                self.logger.warning(f"Wallet not found: {wallet_address}")
+                return statement
+            
+            cache_key = None
+            if self.statement_cache:
+                watermark = self.get_history_watermark(wallet_id, network)
+                cache_key = (wallet_id, network, start_date, end_date, include_transactions)
+                cached = self.statement_cache.get(cache_key, watermark)
+                if cached is not None:
+                    self.logger.info(f"🧾 Statement {start_date} → {end_date} served from cache")
+                    return cached
+            
+            # With a current rollup the opening balance is a point lookup and
+            # only rows after the opening day need to be aggregated
+            rollup = self._rollup_balances_at(wallet_id, start_date, network)
+            
+            query, params = self._statement_aggregate_query(
+                wallet_id, start_date, end_date, network, after_cutoff_only=rollup is not None
+            )
+            
+            with self.get_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                if include_transactions:
+                    period_query, period_params = self._period_transactions_query(wallet_id, start_date, end_date, network)
+                    cursor.execute(period_query, period_params)
+                    statement['transactions'] = cursor.fetchall()
+                cursor.close()
+            
+            if rollup is not None:
+                statement['opening_balance'], statement['transactions_counted_for_opening'] = rollup
+            
+            for row in rows:
+                asset = row['asset']
+                change = _exact_decimal(row['period_change'])
+                if rollup is None:
+                    if int(row['opening_count'] or 0):
+                        statement['opening_balance'][asset] = _exact_decimal(row['opening'])
+                    statement['transactions_counted_for_opening'] += int(row['opening_count'] or 0)
+                statement['period_change'][asset] = change
+            
+            for asset in set(statement['opening_balance']) | set(statement['period_change']):
+                opening = statement['opening_balance'].get(asset, Decimal(0))
+                statement['period_change'].setdefault(asset, Decimal(0))
+                statement['closing_balance'][asset] = _exact_sum(opening, statement['period_change'][asset])
+            
+            self.logger.info(
+                f"🧾 Statement {start_date} → {end_date}: {len(statement['closing_balance'])} tokens, "
+                f"{len(statement['transactions'])} transactions in period"
+            )
+            
+            if cache_key:
+                self.statement_cache.put(cache_key, watermark, statement, row_count=len(statement['transactions']))
+            return statement
+            
+        except Exception as e:
+            self.logger.error(f"Error building statement: {str(e)}")
+            raise
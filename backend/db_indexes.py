@@ -0,0 +1,241 @@
+"""
+Index Migrations and Query Plan Verification
+Creates the transaction_history indexes the statement queries rely on and
+checks with EXPLAIN that none of those queries falls back to a full scan
+"""
+
+import logging
+import os
+import sys
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+# (table, index name, columns) required by DatabaseService access paths
+REQUIRED_INDEXES = [
+    # Per-network statements: walletId + network equality, timestamp range,
+    # extended with the keyset tie-breakers so paginated listings avoid a filesort
+    ('transaction_history', 'idx_th_wallet_network_keyset',
+     ('walletId', 'network', 'timestamp', 'hash', 'asset', 'direction')),
+    # All-network paginated listings in (timestamp, hash, asset, direction) order
+    ('transaction_history', 'idx_th_wallet_keyset', ('walletId', 'timestamp', 'hash', 'asset', 'direction')),
+    # All-network statements and balance aggregates, covering every column they read
+    ('transaction_history', 'idx_th_wallet_ts_cover',
+     ('walletId', 'timestamp', 'network', 'asset', 'direction', 'value')),
+]
+
+# (table, index name, columns) that must be unique. Ingestion relies on this
+# key to skip rows another writer stored concurrently; walletId leads so the
+# ingestor's per-wallet hash lookup can use it as well
+REQUIRED_UNIQUE_KEYS = [
+    ('transaction_history', 'uq_th_wallet_hash_asset_direction', ('walletId', 'hash', 'asset', 'direction')),
+]
+
+# EXPLAIN access types that read the whole table or the whole index
+FULL_SCAN_TYPES = {'ALL', 'index'}
+
+
+def get_existing_indexes(database_service, table: str) -> Dict[str, tuple]:
+    """Map index name to its ordered column tuple for a table"""
+    with database_service.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+            """,
+            (table,)
+        )
+        indexes = {}
+        for row in cursor.fetchall():
+            indexes.setdefault(row['index_name'], []).append(row['column_name'])
+        cursor.close()
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def get_unique_keys(database_service, table: str) -> Dict[str, tuple]:
+    """Map unique index name (PRIMARY included) to its ordered column tuple for a table"""
+    with database_service.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+            """,
+            (table,)
+        )
+        keys = {}
+        for row in cursor.fetchall():
+            keys.setdefault(row['index_name'], []).append(row['column_name'])
+        cursor.close()
+    return {name: tuple(columns) for name, columns in keys.items()}
+
+
+def count_duplicate_keys(database_service, table: str, columns: tuple) -> int:
+    """Number of column-value combinations that occur more than once in a table"""
+    column_list = ', '.join(f"`{column}`" for column in columns)
+    with database_service.get_connection(statement_timeout_ms=0) as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM `{table}` GROUP BY {column_list} HAVING COUNT(*) > 1) duplicates"
+        )
+        (duplicates,) = cursor.fetchone()
+        cursor.close()
+    return int(duplicates)
+
+
+def apply_migrations(database_service) -> List[str]:
+    """
+    Create any missing required index
+    
+    An index is considered present when one with the same name or the same
+    column list already exists; a unique key only when that index is unique.
+    A unique key is not created while the table holds duplicates of it.
+    
+    Returns:
+        list: Names of the indexes created
+    """
+    created = []
+    for table, name, columns in REQUIRED_INDEXES:
+        existing = get_existing_indexes(database_service, table)
+        if name in existing or columns in existing.values():
+            logger.info(f"✓ {table}.{name} already present")
+            continue
+        
+        column_list = ', '.join(f"`{column}`" for column in columns)
+        logger.info(f"🔧 Creating {table}.{name} ({column_list})")
+        with database_service.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({column_list})")
+            cursor.close()
+            connection.commit()
+        created.append(name)
+    
+    for table, name, columns in REQUIRED_UNIQUE_KEYS:
+        if columns in get_unique_keys(database_service, table).values():
+            logger.info(f"✓ {table}.{name} already present")
+            continue
+        
+        duplicates = count_duplicate_keys(database_service, table, columns)
+        if duplicates:
+            logger.error(
+                f"❌ Cannot create unique {table}.{name}: {duplicates} ({', '.join(columns)}) values "
+                f"are stored more than once - remove the extra rows and migrate again"
+            )
+            continue
+        
+        column_list = ', '.join(f"`{column}`" for column in columns)
+        logger.info(f"🔧 Creating unique {table}.{name} ({column_list})")
+        with database_service.get_connection(statement_timeout_ms=0) as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE UNIQUE INDEX `{name}` ON `{table}` ({column_list})")
+            cursor.close()
+            connection.commit()
+        created.append(name)
+    
+    return created
+
+
+def explain_query(database_service, query: str, params) -> List[Dict]:
+    """Run EXPLAIN for a query and return the plan rows"""
+    with database_service.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"EXPLAIN {query}", params)
+        plan = cursor.fetchall()
+        cursor.close()
+    return plan
+
+
+def verify_query_plans(database_service, wallet_id: str, start_date: str, end_date: str,
+                       network: str = None) -> List[str]:
+    """
+    EXPLAIN every statement query and report those that scan transaction_history
+    
+    Args:
+        wallet_id: Wallet ID (UUID) to plan the queries for
+        start_date: Start date (YYYY-MM-DD)
+        end_date: End date (YYYY-MM-DD)
+        network: Optional network filter
+    
+    Returns:
+        list: One message per query that falls back to a full table or index scan
+    """
+    failures = []
+    queries = database_service.statement_queries(wallet_id, start_date, end_date, network)
+    
+    for name, (query, params) in queries.items():
+        for row in explain_query(database_service, query, params):
+            if row.get('table') != 'transaction_history':
+                continue
+            access_type = row.get('type')
+            if access_type in FULL_SCAN_TYPES or not row.get('key'):
+                failures.append(
+                    f"{name}: {access_type} scan on transaction_history "
+                    f"(possible keys: {row.get('possible_keys')}, est. rows: {row.get('rows')})"
+                )
+            else:
+                logger.info(f"✓ {name}: {access_type} via {row.get('key')} (est. rows: {row.get('rows')})")
+    
+    return failures
+
+
+if __name__ == '__main__':
+    # python db_indexes.py migrate [--normalize-wallets]
+    # python db_indexes.py verify <wallet_address> [start_date] [end_date] [network]
+    from datetime import datetime
+    from dotenv import load_dotenv
+    from database_service import DatabaseService
+    from wallet_registry import WalletRegistry
+    
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    if len(sys.argv) < 2 or sys.argv[1] not in ('migrate', 'verify'):
+        print("Usage: python db_indexes.py migrate [--normalize-wallets]")
+        print("       python db_indexes.py verify <wallet_address> [start_date] [end_date] [network]")
+        sys.exit(2)
+    
+    db = DatabaseService(
+        host=os.getenv('DB_HOST', '217.216.110.33'),
+        port=int(os.getenv('DB_PORT', '3306')),
+        username=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'nobicuan888'),
+        database=os.getenv('DB_NAME', 'nobi_wallet_tracker')
+    )
+    if not db.connect():
+        sys.exit(1)
+    
+    try:
+        if sys.argv[1] == 'migrate':
+            created = apply_migrations(db)
+            if '--normalize-wallets' in sys.argv:
+                WalletRegistry(db).ensure_normalized_column()
+            logger.info(f"✅ Migrations complete ({len(created)} indexes created)")
+        else:
+            if len(sys.argv) < 3:
+                print("verify requires a wallet address")
+                sys.exit(2)
+            address = sys.argv[2]
+            start_date = sys.argv[3] if len(sys.argv) > 3 else '2024-01-01'
+            end_date = sys.argv[4] if len(sys.argv) > 4 else datetime.now().strftime('%Y-%m-%d')
+            network = sys.argv[5] if len(sys.argv) > 5 else None
+            
+            wallet_id = db.get_wallet_id(address)
+            if not wallet_id:
+                logger.error(f"❌ Wallet not found: {address}")
+                sys.exit(1)
+            
+            failures = verify_query_plans(db, wallet_id, start_date, end_date, network)
+            if failures:
+                for failure in failures:
+                    logger.error(f"❌ FULL SCAN: {failure}")
+                logger.error(f"❌ {len(failures)} statement queries are not using an index - run: python db_indexes.py migrate")
+                sys.exit(1)
+            logger.info("✅ All statement queries use an index")
+    finally:
+        db.disconnect()
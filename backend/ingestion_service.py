@@ -0,0 +1,335 @@
+"""
+Transaction Ingestion
+Normalizes transactions parsed by BlockchainService into transaction_history
+rows and writes them in batches, skipping rows that are already stored
+"""
+
+import logging
+import queue
+import threading
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# transaction_history.network values for the blockchains BlockchainService supports
+NETWORK_NAMES = {
+    'ethereum': 'eth-mainnet',
+    'polygon': 'polygon-mainnet',
+    'bsc': 'bnb-mainnet',
+    'arbitrum': 'arb-mainnet',
+    'optimism': 'opt-mainnet',
+    'avalanche': 'avax-mainnet',
+    'base': 'base-mainnet',
+    'blast': 'blast-mainnet',
+    'linea': 'linea-mainnet',
+    'scroll': 'scroll-mainnet',
+    'zksync': 'zksync-mainnet',
+    'bitcoin': 'btc-mainnet',
+    'solana': 'sol-mainnet',
+    'tron': 'tron-mainnet',
+    'cardano': 'cardano-mainnet',
+}
+
+# Asset recorded for native-currency transfers (parsed rows have no tokenSymbol)
+NATIVE_ASSETS = {
+    'ethereum': 'ETH',
+    'polygon': 'POL',
+    'bsc': 'BNB',
+    'arbitrum': 'ETH',
+    'optimism': 'ETH',
+    'avalanche': 'AVAX',
+    'base': 'ETH',
+    'blast': 'ETH',
+    'linea': 'ETH',
+    'scroll': 'ETH',
+    'zksync': 'ETH',
+    'bitcoin': 'BTC',
+    'solana': 'SOL',
+    'tron': 'TRX',
+    'cardano': 'ADA',
+}
+
+# EVM chain IDs for Etherscan V2 (same as CHAIN_IDS in backend.py)
+EVM_CHAIN_IDS = {
+    'ethereum': 1,
+    'polygon': 137,
+    'bsc': 56,
+    'arbitrum': 42161,
+    'optimism': 10,
+    'avalanche': 43114,
+    'base': 8453,
+    'blast': 81457,
+    'linea': 59144,
+    'scroll': 534352,
+    'zksync': 324
+}
+
+DIRECTIONS = {'in': 'incoming', 'out': 'outgoing'}
+
+# Columns written for every row; a row is a duplicate when (hash, walletId, asset, direction) exists
+INGESTED_COLUMNS = [
+    'walletId', 'walletAddress', 'network', 'asset', 'value', 'direction',
+    'usdValue', 'fromAddress', 'toAddress', 'category', 'hash', 'timestamp'
+]
+
+
+def network_name(blockchain: str) -> str:
+    """transaction_history.network value for a BlockchainService blockchain name"""
+    return NETWORK_NAMES.get(blockchain, f"{blockchain}-mainnet")
+
+
+class TransactionIngestor:
+    """
+    Persists live-fetched transactions so later statements read them from the DB
+    
+    Only wallets already present in the wallets table are ingested. Rows are
+    deduplicated on (hash, walletId, asset, direction): first within the
+    batch, then against the table with one IN-list lookup per chunk, and the
+    remainder is written with a single executemany per chunk, which the
+    MySQL connector sends as one multi-row upsert. The unique key on those
+    columns (db_indexes.py migrate) makes the upsert skip rows that another
+    ingestor stored after the lookup; when that happens the chunk is redone
+    row by row to learn which rows were ours. Listeners are called with
+    (wallet_id, address, rows) for the rows actually inserted, after they
+    are committed, on a background thread in ingestion order, so a slow
+    rollup refresh or alert webhook never holds up a poll or a request.
+    When more than max_pending batches are waiting, ingest delivers the
+    next one itself rather than dropping it.
+    """
+    
+    def __init__(self, database_service, batch_size: int = 500, background_listeners: bool = True,
+                 max_pending: int = 1000):
+        self.db = database_service
+        self.batch_size = batch_size
+        self.background_listeners = background_listeners
+        self._extra_columns = None
+        self._wallet_ids: Dict[tuple, str] = {}
+        self.listeners: List[Callable[[str, str, List[Dict]], None]] = []
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._notifier = None
+        self._notifier_lock = threading.Lock()
+    
+    def add_listener(self, listener: Callable[[str, str, List[Dict]], None]):
+        """Register a callback for newly inserted rows"""
+        self.listeners.append(listener)
+    
+    def _notify(self, wallet_id: str, address: str, rows: List[Dict]):
+        for listener in self.listeners:
+            try:
+                listener(wallet_id, address, rows)
+            except Exception as e:
+                logger.warning(f"Ingestion listener failed for {address}: {str(e)}")
+    
+    def _dispatch(self, wallet_id: str, address: str, rows: List[Dict]):
+        """Hand inserted rows to the listeners without waiting for them"""
+        if not self.background_listeners:
+            self._notify(wallet_id, address, rows)
+            return
+        with self._notifier_lock:
+            if self._notifier is None:
+                self._notifier = threading.Thread(target=self._notify_loop, name='ingestion-listeners', daemon=True)
+                self._notifier.start()
+        try:
+            self._pending.put_nowait((wallet_id, address, rows))
+        except queue.Full:
+            logger.warning(f"Ingestion listeners are {self._pending.maxsize} batches behind, notifying inline")
+            self._notify(wallet_id, address, rows)
+    
+    def _notify_loop(self):
+        while True:
+            wallet_id, address, rows = self._pending.get()
+            try:
+                self._notify(wallet_id, address, rows)
+            finally:
+                self._pending.task_done()
+    
+    def wait_for_listeners(self):
+        """Block until every queued batch has been delivered (e.g. before a one-shot run exits)"""
+        self._pending.join()
+    
+    def _resolve_wallet_id(self, address: str, network: str) -> Optional[str]:
+        """Wallet ID for (address, network), remembered once found"""
+        key = (address.strip().lower(), network)
+        wallet_id = self._wallet_ids.get(key)
+        if wallet_id is None:
+            wallet_id = self.db.get_wallet_id_for_network(address, network)
+            if wallet_id:
+                self._wallet_ids[key] = wallet_id
+        return wallet_id
+    
+    def _generated_columns(self) -> Dict[str, str]:
+        """
+        NOT NULL columns without a default that the application has to fill
+        (e.g. a UUID id or createdAt/updatedAt), mapped to 'uuid' or 'now'
+        """
+        if self._extra_columns is None:
+            extra = {}
+            for column in self.db.get_table_structure('transaction_history'):
+                field = column['field']
+                if field in INGESTED_COLUMNS or column['null'] == 'YES' or column['default'] is not None:
+                    continue
+                if 'auto_increment' in (column['extra'] or '') or 'GENERATED' in (column['extra'] or '').upper():
+                    continue
+                column_type = str(column['type']).lower()
+                if 'char' in column_type:
+                    extra[field] = 'uuid'
+                elif 'date' in column_type or 'time' in column_type:
+                    extra[field] = 'now'
+            self._extra_columns = extra
+        return self._extra_columns
+    
+    def normalize(self, blockchain: str, address: str, wallet_id: str, transactions: List[Dict]) -> List[Dict]:
+        """
+        Convert parsed BlockchainService transactions into transaction_history rows
+        
+        Transactions without a known direction, a timestamp or a non-zero
+        amount (failed calls, unparsed Solana instructions) are dropped.
+        
+        Args:
+            blockchain: BlockchainService blockchain name ('ethereum', 'solana', ...)
+            address: Wallet address the transactions were fetched for
+            wallet_id: Wallet ID (UUID) of that address
+            transactions: Parsed transaction dicts
+        
+        Returns:
+            list: Row dicts keyed by INGESTED_COLUMNS, unique on (hash, asset, direction)
+        """
+        network = network_name(blockchain)
+        native_asset = NATIVE_ASSETS.get(blockchain)
+        rows = {}
+        
+        for tx in transactions:
+            direction = DIRECTIONS.get(tx.get('direction'))
+            if not direction or not tx.get('hash') or not tx.get('timestamp'):
+                continue
+            if tx.get('status') == 'Failed':
+                continue
+            
+            try:
+                value = Decimal(str(tx.get('amount') or 0))
+            except InvalidOperation:
+                continue
+            if value <= 0:
+                continue
+            
+            asset = tx.get('tokenSymbol') or native_asset
+            if not asset:
+                continue
+            
+            if tx.get('type') == 'Internal Transfer':
+                category = 'internal'
+            elif tx.get('tokenSymbol'):
+                category = 'erc20' if blockchain in EVM_CHAIN_IDS else 'token'
+            else:
+                category = 'external'
+            
+            row = {
+                'walletId': wallet_id,
+                'walletAddress': address,
+                'network': network,
+                'asset': asset,
+                'value': value,
+                'direction': direction,
+                'usdValue': tx.get('usdValue'),
+                'fromAddress': tx.get('from'),
+                'toAddress': tx.get('to'),
+                'category': category,
+                'hash': tx['hash'],
+                'timestamp': datetime.fromtimestamp(int(tx['timestamp']), tz=timezone.utc).replace(tzinfo=None)
+            }
+            rows.setdefault((row['hash'], asset, direction), row)
+        
+        return list(rows.values())
+    
+    def ingest(self, blockchain: str, address: str, transactions: List[Dict],
+               wallet_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Write new transactions for a tracked wallet into transaction_history
+        
+        Args:
+            blockchain: BlockchainService blockchain name
+            address: Wallet address the transactions were fetched for
+            transactions: Parsed transaction dicts from BlockchainService
+            wallet_id: Optional wallet ID, resolved from the address and network when omitted
+        
+        Returns:
+            dict: {'received': 120, 'normalized': 95, 'already_stored': 90, 'inserted': 5}
+        """
+        stats = {'received': len(transactions), 'normalized': 0, 'already_stored': 0, 'inserted': 0}
+        
+        wallet_id = wallet_id or self._resolve_wallet_id(address, network_name(blockchain))
+        if not wallet_id:
+            logger.debug(f"Skipping ingestion for untracked wallet {address}")
+            return stats
+        
+        rows = self.normalize(blockchain, address, wallet_id, transactions)
+        stats['normalized'] = len(rows)
+        if not rows:
+            return stats
+        
+        extra = self._generated_columns()
+        columns = INGESTED_COLUMNS + list(extra)
+        # Duplicates of the unique key are left as stored (0 affected rows each)
+        insert = (
+            f"INSERT INTO transaction_history ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) "
+            "ON DUPLICATE KEY UPDATE hash = hash"
+        )
+        
+        inserted_rows = []
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor()
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                
+                hashes = list({row['hash'] for row in chunk})
+                cursor.execute(
+                    "SELECT hash, asset, direction FROM transaction_history "
+                    f"WHERE walletId = %s AND hash IN ({', '.join(['%s'] * len(hashes))})",
+                    [wallet_id] + hashes
+                )
+                existing = set(cursor.fetchall())
+                
+                new_rows = [row for row in chunk if (row['hash'], row['asset'], row['direction']) not in existing]
+                if not new_rows:
+                    stats['already_stored'] += len(chunk)
+                    continue
+                
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                values = [
+                    [row[column] for column in INGESTED_COLUMNS]
+                    + [str(uuid.uuid4()) if kind == 'uuid' else now for kind in extra.values()]
+                    for row in new_rows
+                ]
+                cursor.executemany(insert, values)
+                if cursor.rowcount == len(new_rows):
+                    inserted = new_rows
+                else:
+                    # A concurrent writer stored some of these rows since the lookup
+                    connection.rollback()
+                    inserted = []
+                    for row, row_values in zip(new_rows, values):
+                        cursor.execute(insert, row_values)
+                        if cursor.rowcount == 1:
+                            inserted.append(row)
+                connection.commit()
+                
+                stats['already_stored'] += len(chunk) - len(inserted)
+                stats['inserted'] += len(inserted)
+                inserted_rows.extend(inserted)
+            
+            cursor.close()
+        
+        if stats['inserted']:
+            logger.info(
+                f"📥 Ingested {stats['inserted']} new {network_name(blockchain)} transactions for {address} "
+                f"({stats['already_stored']} already stored)"
+            )
+        
+        if inserted_rows and self.listeners:
+            self._dispatch(wallet_id, address, inserted_rows)
+        return stats
@@ -0,0 +1,715 @@
+"""
+Local Analytics Mirror
+Incrementally mirrors transaction_history and wallets from MySQL into local
+Parquet files (partitioned by network and month) and answers balance and
+statement queries from them with DuckDB
+
+Requires the optional packages pyarrow and duckdb.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional
+
+from database_service import (
+    EXACT_CONTEXT, KEYSET_COLUMNS, PERIOD_TRANSACTION_COLUMNS, _exact_decimal, _exact_sum, decode_page_cursor, encode_page_cursor,
+    fill_balance_series, fill_flow_statistics, keyset_after_condition
+)
+from wallet_registry import wallet_ids_by_address
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MIRROR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mirror')
+
+# Scaled amount sums of the flow statistics query
+FLOW_SUMS = ('inflow', 'outflow', 'usd_inflow', 'usd_outflow')
+
+MIRRORED_COLUMNS = [
+    'hash', 'walletId', 'asset', 'value', 'direction', 'usdValue',
+    'fromAddress', 'toAddress', 'category', 'timestamp'
+]
+
+# Fractional digits kept by the mirror's sums, as in MySQL's DECIMAL(65, 30)
+MIRROR_AMOUNT_SCALE = 30
+
+# Hive partition directory name DuckDB reads back as a NULL network
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _scaled_amount(column: str) -> str:
+    """
+    DuckDB expression for a plain decimal string column as an arbitrary-precision
+    integer in units of 10^-MIRROR_AMOUNT_SCALE
+    
+    DuckDB's DECIMAL stops at 38 digits, which cannot hold DECIMAL(65, 30)
+    amounts; VARINT sums have no such limit.
+    """
+    magnitude = f"ltrim({column}, '+-')"
+    return (
+        f"(CASE WHEN starts_with({column}, '-') THEN '-' ELSE '' END"
+        f" || COALESCE(NULLIF(split_part({magnitude}, '.', 1), ''), '0')"
+        f" || rpad(left(split_part({magnitude}, '.', 2), {MIRROR_AMOUNT_SCALE}), {MIRROR_AMOUNT_SCALE}, '0'))::VARINT"
+    )
+
+
+# Same signed movement as database_service.SIGNED_VALUE, as scaled VARINTs (see _from_scaled)
+MIRROR_SIGNED_VALUE = (
+    f"CASE WHEN direction = 'incoming' THEN {_scaled_amount('value')} "
+    f"ELSE -{_scaled_amount('value')} END"
+)
+
+# DuckDB forms of database_service.TIME_BUCKETS (ISO weeks start on Monday)
+MIRROR_TIME_BUCKETS = {
+    'day': "CAST(timestamp AS DATE)",
+    'week': "CAST(date_trunc('week', timestamp) AS DATE)",
+    'month': "CAST(date_trunc('month', timestamp) AS DATE)",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise RuntimeError("The analytics mirror needs pyarrow: pip install pyarrow duckdb")
+
+
+def _require_duckdb():
+    try:
+        import duckdb
+        return duckdb
+    except ImportError:
+        raise RuntimeError("The analytics mirror needs duckdb: pip install pyarrow duckdb")
+
+
+def _as_text(value):
+    """Lossless text form of a MySQL value for the string columns of the mirror"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return str(value)
+
+
+def _as_plain_number(value):
+    """_as_text for amount columns: always plain notation (no exponent), which _scaled_amount expects"""
+    if value is None or isinstance(value, Decimal):
+        return _as_text(value)
+    try:
+        return format(Decimal(str(value).strip()), 'f')
+    except InvalidOperation:
+        return str(value)
+
+
+def _from_scaled(value) -> Decimal:
+    """Exact Decimal of a scaled VARINT sum (DuckDB returns them as text)"""
+    if value is None:
+        return Decimal(0)
+    return _exact_decimal(Decimal(str(value)).scaleb(-MIRROR_AMOUNT_SCALE, EXACT_CONTEXT))
+
+
+def _next_month(month: str) -> str:
+    """'2025-12' -> '2026-01'"""
+    year, mon = (int(part) for part in month.split('-'))
+    return f"{year + 1}-01" if mon == 12 else f"{year}-{mon + 1:02d}"
+
+
+class MirrorService:
+    """
+    Local columnar copy of the tracker database for offline analytics
+    
+    Layout under mirror_path:
+        transaction_history/network=<network>/month=<YYYY-MM>/part.parquet
+        wallets.parquet
+        manifest.json   (row count and latest timestamp per partition)
+    
+    A sync compares each remote (network, month) partition's row count and
+    latest timestamp with the manifest and only re-copies partitions that
+    changed, so routine syncs touch recent months only.
+    
+    Every read method of DatabaseService except the wallet and watermark
+    lookups has an equivalent here with the same arguments and result
+    shape. Rows without a network are mirrored into network=NULL_PARTITION
+    partitions, which DuckDB reads back with a NULL network. Amounts are
+    summed exactly at MIRROR_AMOUNT_SCALE digits, like MySQL's DECIMAL(65, 30).
+    """
+    
+    def __init__(self, mirror_path: str = DEFAULT_MIRROR_PATH):
+        self.mirror_path = mirror_path
+        self.history_path = os.path.join(mirror_path, 'transaction_history')
+        self.wallets_file = os.path.join(mirror_path, 'wallets.parquet')
+        self.manifest_file = os.path.join(mirror_path, 'manifest.json')
+        self._duckdb = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_file):
+            return {'partitions': {}, 'synced_at': None}
+        with open(self.manifest_file) as f:
+            return json.load(f)
+    
+    def _save_manifest(self, manifest: Dict):
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+    
+    def _partition_dir(self, network: Optional[str], month: str) -> str:
+        directory = network.replace('/', '_') if network is not None else NULL_PARTITION
+        return os.path.join(self.history_path, f"network={directory}", f"month={month}")
+    
+    def write_partition(self, network: Optional[str], month: str, row_batches) -> int:
+        """
+        Atomically replace one partition's Parquet file
+        
+        Args:
+            network: Partition network (None for rows without one)
+            month: Partition month (YYYY-MM)
+            row_batches: Iterable of lists of row dicts with MIRRORED_COLUMNS
+        
+        Returns:
+            int: Rows written
+        """
+        pa = _require_pyarrow()
+        schema = pa.schema(
+            [(column, pa.string()) for column in MIRRORED_COLUMNS if column != 'timestamp']
+            + [('timestamp', pa.timestamp('us'))]
+        )
+        
+        partition_dir = self._partition_dir(network, month)
+        os.makedirs(partition_dir, exist_ok=True)
+        final_file = os.path.join(partition_dir, 'part.parquet')
+        tmp_file = final_file + '.tmp'
+        
+        written = 0
+        writer = pa.parquet.ParquetWriter(tmp_file, schema, compression='zstd')
+        try:
+            for rows in row_batches:
+                if not rows:
+                    continue
+                columns = {
+                    column: [
+                        (_as_plain_number if column in ('value', 'usdValue') else _as_text)(row[column])
+                        for row in rows
+                    ]
+                    for column in MIRRORED_COLUMNS if column != 'timestamp'
+                }
+                columns['timestamp'] = [row['timestamp'] for row in rows]
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                written += len(rows)
+        finally:
+            writer.close()
+        
+        os.replace(tmp_file, final_file)
+        return written
+    
+    def _remove_partition(self, network: Optional[str], month: str):
+        shutil.rmtree(self._partition_dir(network, month), ignore_errors=True)
+    
+    def sync(self, database_service, chunk_size: int = 5000) -> Dict[str, int]:
+        """
+        Bring the mirror up to date with the remote database
+        
+        Args:
+            database_service: Connected DatabaseService for the remote MySQL
+            chunk_size: Rows fetched per round trip while copying a partition
+        
+        Returns:
+            dict: {'partitions': 40, 'copied': 2, 'removed': 0, 'rows_copied': 5120, 'wallets': 35}
+        """
+        pa = _require_pyarrow()
+        manifest = self._load_manifest()
+        stats = {'partitions': 0, 'copied': 0, 'removed': 0, 'rows_copied': 0, 'wallets': 0}
+        os.makedirs(self.history_path, exist_ok=True)
+        
+        with database_service.get_connection(statement_timeout_ms=0) as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT network, DATE_FORMAT(timestamp, '%Y-%m') AS month, "
+                "COUNT(*) AS row_count, MAX(timestamp) AS latest "
+                "FROM transaction_history "
+                "WHERE timestamp IS NOT NULL "
+                "GROUP BY network, month"
+            )
+            remote = {
+                f"{row['network'] or ''}|{row['month']}": {
+                    'network': row['network'],
+                    'month': row['month'],
+                    'row_count': int(row['row_count']),
+                    'latest': str(row['latest'])
+                }
+                for row in cursor.fetchall()
+            }
+            cursor.close()
+            stats['partitions'] = len(remote)
+            
+            for key, partition in sorted(remote.items()):
+                local = manifest['partitions'].get(key)
+                if local and local['row_count'] == partition['row_count'] and local['latest'] == partition['latest']:
+                    continue
+                
+                month_start = f"{partition['month']}-01 00:00:00"
+                month_end = f"{_next_month(partition['month'])}-01 00:00:00"
+                stream = connection.cursor(dictionary=True, buffered=False)
+                if partition['network'] is None:
+                    network_filter, params = "network IS NULL", (month_start, month_end)
+                else:
+                    network_filter, params = "network = %s", (partition['network'], month_start, month_end)
+                stream.execute(
+                    f"SELECT {', '.join(MIRRORED_COLUMNS)} FROM transaction_history "
+                    f"WHERE {network_filter} AND timestamp >= %s AND timestamp < %s",
+                    params
+                )
+                rows = self.write_partition(
+                    partition['network'], partition['month'],
+                    iter(lambda: stream.fetchmany(chunk_size), [])
+                )
+                stream.close()
+                
+                manifest['partitions'][key] = partition
+                stats['copied'] += 1
+                stats['rows_copied'] += rows
+                self.logger.info(f"🪞 Mirrored {partition['network']} {partition['month']}: {rows} rows")
+            
+            for key in list(manifest['partitions']):
+                if key not in remote:
+                    stale = manifest['partitions'].pop(key)
+                    self._remove_partition(stale['network'], stale['month'])
+                    stats['removed'] += 1
+            
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT id, address FROM wallets")
+            wallets = cursor.fetchall()
+            cursor.close()
+        
+        table = pa.Table.from_pydict({
+            'id': [_as_text(row['id']) for row in wallets],
+            'address': [_as_text(row['address']) for row in wallets]
+        })
+        pa.parquet.write_table(table, self.wallets_file + '.tmp')
+        os.replace(self.wallets_file + '.tmp', self.wallets_file)
+        stats['wallets'] = len(wallets)
+        
+        manifest['synced_at'] = datetime.now().isoformat(timespec='seconds')
+        self._save_manifest(manifest)
+        
+        self.logger.info(
+            f"✅ Mirror synced: {stats['copied']}/{stats['partitions']} partitions copied "
+            f"({stats['rows_copied']} rows), {stats['removed']} removed, {stats['wallets']} wallets"
+        )
+        return stats
+    
+    def is_available(self) -> bool:
+        """Whether a sync has produced a mirror to read from"""
+        return os.path.exists(self.manifest_file) and os.path.exists(self.wallets_file)
+    
+    def _cursor(self):
+        """DuckDB cursor with transaction_history and wallets views over the Parquet files"""
+        with self._lock:
+            if self._duckdb is None:
+                duckdb = _require_duckdb()
+                connection = duckdb.connect()
+                history_glob = os.path.join(self.history_path, '**', '*.parquet').replace("'", "''")
+                wallets_file = self.wallets_file.replace("'", "''")
+                # Views re-read the file list on every query, so syncs are picked up
+                connection.execute(
+                    "CREATE OR REPLACE VIEW transaction_history AS "
+                    f"SELECT * FROM read_parquet('{history_glob}', hive_partitioning = true)"
+                )
+                connection.execute(
+                    f"CREATE OR REPLACE VIEW wallets AS SELECT * FROM read_parquet('{wallets_file}')"
+                )
+                self._duckdb = connection
+            return self._duckdb.cursor()
+    
+    def query(self, sql: str, params: List = None) -> List[Dict]:
+        """Run ad-hoc SQL against the mirror (tables: transaction_history, wallets)"""
+        cursor = self._cursor()
+        try:
+            cursor.execute(sql, params or [])
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    
+    def _stream(self, sql: str, params: List, chunk_size: int) -> Iterator[Dict]:
+        """Execute a query now and return an iterator fetching its rows chunk_size at a time"""
+        cursor = self._cursor()
+        try:
+            cursor.execute(sql, params)
+        except Exception:
+            cursor.close()
+            raise
+        columns = [description[0] for description in cursor.description]
+        
+        def rows():
+            try:
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    for row in chunk:
+                        yield dict(zip(columns, row))
+            finally:
+                cursor.close()
+        return rows()
+    
+    def get_wallet_id(self, wallet_address):
+        """Wallet ID for an address (case-insensitive), or None"""
+        rows = self.query("SELECT id FROM wallets WHERE lower(address) = lower(?) LIMIT 1", [wallet_address])
+        return rows[0]['id'] if rows else None
+    
+    def _balances(self, wallet_id, upper_bound, inclusive, network=None):
+        query = f"""
+            SELECT asset, SUM({MIRROR_SIGNED_VALUE}) AS balance, COUNT(*) AS tx_count
+            FROM transaction_history
+            WHERE walletId = ?
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [wallet_id]
+        if upper_bound:
+            query += " AND timestamp <= ?" if inclusive else " AND timestamp < ?"
+            # Month partitions past the bound are pruned without being read
+            query += " AND month <= ?"
+            params.extend([upper_bound, upper_bound[:7]])
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        query += " GROUP BY asset"
+        
+        rows = self.query(query, params)
+        balances = {row['asset']: _from_scaled(row['balance']) for row in rows}
+        return balances, sum(int(row['tx_count']) for row in rows)
+    
+    def calculate_opening_balance(self, wallet_address, cutoff_date, network=None):
+        """Mirror equivalent of DatabaseService.calculate_opening_balance"""
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return {'opening_date': cutoff_date, 'balances': {}, 'transactions_counted': 0}
+        
+        balances, counted = self._balances(wallet_id, f"{cutoff_date} 23:59:59", False, network)
+        return {'opening_date': cutoff_date, 'balances': balances, 'transactions_counted': counted}
+    
+    def get_current_balance(self, wallet_address, end_date=None, network=None):
+        """Mirror equivalent of DatabaseService.get_current_balance"""
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return {'current_date': end_date, 'balances': {}}
+        
+        balances, _ = self._balances(wallet_id, f"{end_date} 23:59:59" if end_date else None, True, network)
+        return {'current_date': end_date or date.today().strftime('%Y-%m-%d'), 'balances': balances}
+    
+    def _period_transactions_query(self, wallet_id, start_date, end_date, network=None, oldest_first=False):
+        query = f"""
+            SELECT {PERIOD_TRANSACTION_COLUMNS}
+            FROM transaction_history
+            WHERE walletId = ?
+            AND timestamp >= ?
+            AND timestamp <= ?
+            AND month BETWEEN ? AND ?
+        """
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59", start_date[:7], end_date[:7]]
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        query += " ORDER BY timestamp ASC" if oldest_first else " ORDER BY timestamp DESC"
+        return query, params
+    
+    def _period_transactions(self, wallet_id, start_date, end_date, network=None):
+        return self.query(*self._period_transactions_query(wallet_id, start_date, end_date, network))
+    
+    def get_transactions_in_period(self, wallet_address, start_date, end_date, network=None):
+        """Mirror equivalent of DatabaseService.get_transactions_in_period"""
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return []
+        return self._period_transactions(wallet_id, start_date, end_date, network)
+    
+    def iter_transactions_in_period(self, wallet_address, start_date, end_date, network=None, chunk_size=1000,
+                                    oldest_first=False, wallet_id=None) -> Iterator[Dict]:
+        """Mirror equivalent of DatabaseService.iter_transactions_in_period (the query runs before returning)"""
+        wallet_id = wallet_id or self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return iter([])
+        query, params = self._period_transactions_query(wallet_id, start_date, end_date, network, oldest_first)
+        return self._stream(query, params, chunk_size)
+    
+    def get_transactions_page(self, wallet_address, start_date, end_date, network=None, limit=100, after=None):
+        """Mirror equivalent of DatabaseService.get_transactions_page"""
+        page = {'transactions': [], 'next_cursor': None, 'has_more': False}
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return page
+        
+        query = f"""
+            SELECT {PERIOD_TRANSACTION_COLUMNS}
+            FROM transaction_history
+            WHERE walletId = ?
+            AND timestamp >= ?
+            AND timestamp <= ?
+            AND month BETWEEN ? AND ?
+        """
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59", start_date[:7], end_date[:7]]
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        if after:
+            condition, condition_params = keyset_after_condition(
+                decode_page_cursor(after), placeholder='?', timestamp_placeholder='CAST(? AS TIMESTAMP)'
+            )
+            query += f" AND {condition}"
+            params.extend(condition_params)
+        query += " ORDER BY " + ", ".join(f"{column} DESC NULLS LAST" for column in KEYSET_COLUMNS)
+        query += " LIMIT ?"
+        params.append(int(limit) + 1)
+        
+        rows = self.query(query, params)
+        page['has_more'] = len(rows) > limit
+        page['transactions'] = rows[:limit]
+        if page['has_more']:
+            page['next_cursor'] = encode_page_cursor(page['transactions'][-1])
+        return page
+    
+    def get_statements_batch(self, wallet_addresses, start_date, end_date=None, network=None):
+        """Mirror equivalent of DatabaseService.get_statements_batch"""
+        end_date = end_date or date.today().strftime('%Y-%m-%d')
+        result = {'opening_date': start_date, 'end_date': end_date, 'wallets': {}, 'not_found': []}
+        if not wallet_addresses:
+            return result
+        
+        keys = sorted({address.strip().lower() for address in wallet_addresses})
+        found = wallet_ids_by_address(self.query(
+            f"SELECT id, address FROM wallets WHERE lower(address) IN ({', '.join(['?'] * len(keys))})", keys
+        ))
+        result['not_found'] = [address for address in wallet_addresses if address.strip().lower() not in found]
+        statements = {
+            wallet_id: {
+                'opening_balance': {},
+                'period_change': {},
+                'closing_balance': {},
+                'transactions_counted_for_opening': 0
+            }
+            for wallet_id in found.values()
+        }
+        if not statements:
+            return result
+        
+        cutoff = f"{start_date} 23:59:59"
+        query = f"""
+            SELECT walletId, asset,
+                   SUM(CASE WHEN timestamp < ? THEN {MIRROR_SIGNED_VALUE} ELSE 0 END) AS opening,
+                   SUM(CASE WHEN timestamp >= ? THEN {MIRROR_SIGNED_VALUE} ELSE 0 END) AS period_change,
+                   SUM(CASE WHEN timestamp < ? THEN 1 ELSE 0 END) AS opening_count
+            FROM transaction_history
+            WHERE walletId IN ({', '.join(['?'] * len(statements))})
+            AND timestamp <= ?
+            AND month <= ?
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [cutoff, cutoff, cutoff] + list(statements) + [f"{end_date} 23:59:59", end_date[:7]]
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        query += " GROUP BY walletId, asset"
+        
+        for row in self.query(query, params):
+            statement = statements[row['walletId']]
+            asset = row['asset']
+            opening = _from_scaled(row['opening'])
+            change = _from_scaled(row['period_change'])
+            opening_count = int(row['opening_count'] or 0)
+            if opening_count:
+                statement['opening_balance'][asset] = opening
+            statement['period_change'][asset] = change
+            statement['closing_balance'][asset] = _exact_sum(opening, change)
+            statement['transactions_counted_for_opening'] += opening_count
+        
+        for address in wallet_addresses:
+            wallet_id = found.get(address.strip().lower())
+            if wallet_id:
+                result['wallets'][address] = statements[wallet_id]
+        return result
+    
+    def get_balance_series(self, wallet_address, start_date, end_date=None, network=None,
+                           interval='day', max_points=500):
+        """Mirror equivalent of DatabaseService.get_balance_series"""
+        end_date = end_date or date.today().strftime('%Y-%m-%d')
+        result = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'interval': interval,
+            'series': {},
+            'points_before_downsampling': {}
+        }
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return result
+        
+        network_filter = " AND network = ?" if network else ""
+        query = f"""
+            SELECT asset, bucket,
+                   SUM(delta) OVER (PARTITION BY asset ORDER BY bucket) AS balance
+            FROM (
+                SELECT asset,
+                       GREATEST({MIRROR_TIME_BUCKETS[interval]}, CAST(? AS DATE)) AS bucket,
+                       SUM({MIRROR_SIGNED_VALUE}) AS delta
+                FROM transaction_history
+                WHERE walletId = ?
+                AND timestamp <= ?
+                AND month <= ?{network_filter}
+                AND value IS NOT NULL
+                AND asset IS NOT NULL
+                GROUP BY ALL
+            ) buckets
+            ORDER BY asset, bucket
+        """
+        params = [start_date, wallet_id, f"{end_date} 23:59:59", end_date[:7]] + ([network] if network else [])
+        rows = [dict(row, balance=_from_scaled(row['balance'])) for row in self.query(query, params)]
+        fill_balance_series(result, rows, max_points)
+        return result
+    
+    def get_flow_statistics(self, wallet_address, start_date, end_date=None, network=None, interval='month'):
+        """Mirror equivalent of DatabaseService.get_flow_statistics"""
+        end_date = end_date or date.today().strftime('%Y-%m-%d')
+        statistics = {
+            'interval': interval,
+            'buckets': [],
+            'totals': {},
+            'transaction_types': {},
+            'total_transactions': 0
+        }
+        wallet_id = self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return statistics
+        
+        amount = _scaled_amount('value')
+        usd = _scaled_amount('usdValue')
+        query = f"""
+            SELECT {MIRROR_TIME_BUCKETS[interval]} AS bucket,
+                   network,
+                   asset,
+                   category,
+                   SUM(CASE WHEN direction = 'incoming' THEN {amount} ELSE 0 END) AS inflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE {amount} END) AS outflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 1 ELSE 0 END) AS incoming_count,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE 1 END) AS outgoing_count,
+                   SUM(CASE WHEN direction = 'incoming' THEN {usd} ELSE 0 END) AS usd_inflow,
+                   SUM(CASE WHEN direction = 'incoming' THEN 0 ELSE {usd} END) AS usd_outflow
+            FROM transaction_history
+            WHERE walletId = ?
+            AND timestamp >= ?
+            AND timestamp <= ?
+            AND month BETWEEN ? AND ?
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [wallet_id, f"{start_date} 00:00:00", f"{end_date} 23:59:59", start_date[:7], end_date[:7]]
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        query += " GROUP BY ALL ORDER BY bucket, network, asset"
+        rows = [
+            dict(row, **{field: _from_scaled(row[field]) if row[field] is not None else None for field in FLOW_SUMS})
+            for row in self.query(query, params)
+        ]
+        fill_flow_statistics(statistics, rows)
+        return statistics
+    
+    def get_statement(self, wallet_address, start_date, end_date=None, network=None, include_transactions=True,
+                      wallet_id=None):
+        """Mirror equivalent of DatabaseService.get_statement"""
+        end_date = end_date or date.today().strftime('%Y-%m-%d')
+        statement = {
+            'opening_date': start_date,
+            'end_date': end_date,
+            'opening_balance': {},
+            'period_change': {},
+            'closing_balance': {},
+            'transactions': [],
+            'transactions_counted_for_opening': 0
+        }
+        
+        wallet_id = wallet_id or self.get_wallet_id(wallet_address)
+        if not wallet_id:
+            self.logger.warning(f"Wallet not found in mirror: {wallet_address}")
+            return statement
+        
+        cutoff = f"{start_date} 23:59:59"
+        query = f"""
+            SELECT asset,
+                   SUM(CASE WHEN timestamp < ? THEN {MIRROR_SIGNED_VALUE} ELSE 0 END) AS opening,
+                   SUM(CASE WHEN timestamp >= ? THEN {MIRROR_SIGNED_VALUE} ELSE 0 END) AS period_change,
+                   SUM(CASE WHEN timestamp < ? THEN 1 ELSE 0 END) AS opening_count
+            FROM transaction_history
+            WHERE walletId = ?
+            AND timestamp <= ?
+            AND month <= ?
+            AND value IS NOT NULL
+            AND asset IS NOT NULL
+        """
+        params = [cutoff, cutoff, cutoff, wallet_id, f"{end_date} 23:59:59", end_date[:7]]
+        if network:
+            query += " AND network = ?"
+            params.append(network)
+        query += " GROUP BY asset"
+        
+        for row in self.query(query, params):
+            asset = row['asset']
+            opening = _from_scaled(row['opening'])
+            change = _from_scaled(row['period_change'])
+            opening_count = int(row['opening_count'] or 0)
+            if opening_count:
+                statement['opening_balance'][asset] = opening
+            statement['period_change'][asset] = change
+            statement['closing_balance'][asset] = _exact_sum(opening, change)
+            statement['transactions_counted_for_opening'] += opening_count
+        
+        if include_transactions:
+            statement['transactions'] = self._period_transactions(wallet_id, start_date, end_date, network)
+        return statement
+
+
+if __name__ == '__main__':
+    # python mirror_service.py sync
+    import sys
+    from dotenv import load_dotenv
+    from database_service import DatabaseService
+    
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    if len(sys.argv) < 2 or sys.argv[1] != 'sync':
+        print("Usage: python mirror_service.py sync")
+        sys.exit(2)
+    
+    db = DatabaseService(
+        host=os.getenv('DB_HOST', '217.216.110.33'),
+        port=int(os.getenv('DB_PORT', '3306')),
+        username=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'nobicuan888'),
+        database=os.getenv('DB_NAME', 'nobi_wallet_tracker')
+    )
+    if not db.connect():
+        sys.exit(1)
+    
+    try:
+        MirrorService(os.getenv('DB_MIRROR_PATH', DEFAULT_MIRROR_PATH)).sync(db)
+    finally:
+        db.disconnect()
@@ -0,0 +1,695 @@
+"""
+Account Monitoring Daemon
+Polls every tracked wallet incrementally and stores new transactions, so DB
+statements are already current when they are requested
+
+Run from backend/: python monitor.py [--once]
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import mysql.connector
+from mysql.connector import Error
+
+from ingestion_service import EVM_CHAIN_IDS, NETWORK_NAMES, TransactionIngestor, network_name
+
+logger = logging.getLogger(__name__)
+
+
+MONITOR_WATERMARK_DDL = """
+    CREATE TABLE IF NOT EXISTS monitor_watermarks (
+        walletId VARCHAR(191) NOT NULL,
+        network VARCHAR(64) NOT NULL,
+        last_block BIGINT NULL,
+        last_signature VARCHAR(128) NULL,
+        last_timestamp DATETIME NULL,
+        updatedAt DATETIME NOT NULL,
+        PRIMARY KEY (walletId, network)
+    )
+"""
+
+# MySQL advisory lock held by the one monitor polling a database, so API
+# workers and the standalone daemon never poll side by side
+MONITOR_LOCK_NAME = 'nobi_account_monitor'
+
+# Upstream calls per minute background polling may spend, per API
+DEFAULT_BUDGETS = {
+    'etherscan': 240,   # one key for every EVM chain (Etherscan V2)
+    'solana': 100,
+    'tron': 60,
+    'cardano': 60,
+    'bitcoin': 30,
+}
+
+# Calls one poll is expected to make before its actual count is known
+POLL_COSTS = {
+    'etherscan': 4,     # eth_blockNumber, txlist, txlistinternal, tokentx
+    'solana': 2,        # getSignaturesForAddress, then one getTransaction per new signature
+    'tron': 4,
+    'cardano': 4,
+    'bitcoin': 1,
+}
+
+# Chains without an incremental fetch are polled by date window from their last seen day
+DATE_WINDOW_FETCHERS = {
+    'bitcoin': 'get_bitcoin_transactions',
+    'tron': 'get_tron_transactions',
+    'cardano': 'get_cardano_transactions',
+}
+
+BLOCKCHAINS_BY_NETWORK = {network: blockchain for blockchain, network in NETWORK_NAMES.items()}
+
+
+def budget_group(blockchain: str) -> str:
+    """Name of the rate budget a blockchain's polls draw from"""
+    return 'etherscan' if blockchain in EVM_CHAIN_IDS else blockchain
+
+
+def guess_blockchains(address: str) -> List[str]:
+    """Likely blockchain of a wallet with no stored history, from its address format"""
+    if address.startswith('0x') and len(address) == 42:
+        return ['ethereum']
+    if address.startswith(('addr1', 'stake1')):
+        return ['cardano']
+    if address.startswith('T') and len(address) == 34:
+        return ['tron']
+    if address.startswith('bc1') or (address[:1] in ('1', '3') and 26 <= len(address) <= 35):
+        return ['bitcoin']
+    if 32 <= len(address) <= 44:
+        return ['solana']
+    return []
+
+
+def monitor_settings_from_env() -> Dict:
+    """AccountMonitor keyword arguments from the MONITOR_* environment variables"""
+    return {
+        'poll_interval': int(os.getenv('MONITOR_POLL_INTERVAL', '300')),
+        'wallet_refresh': int(os.getenv('MONITOR_WALLET_REFRESH', '600')),
+        'min_interval': int(os.getenv('MONITOR_MIN_INTERVAL', '60')),
+        'max_interval': int(os.getenv('MONITOR_MAX_INTERVAL', '21600')),
+        'interactive_share': float(os.getenv('MONITOR_INTERACTIVE_SHARE', '0.25')),
+        'budgets': {
+            group: int(os.getenv(f'MONITOR_BUDGET_{group.upper()}', str(calls)))
+            for group, calls in DEFAULT_BUDGETS.items()
+        }
+    }
+
+
+class TokenBucket:
+    """Token bucket of upstream API calls per minute"""
+    
+    def __init__(self, calls_per_minute: float):
+        self.capacity = float(calls_per_minute)
+        self.tokens = float(calls_per_minute)
+        self.rate = calls_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def try_acquire(self, calls: float) -> float:
+        """Take calls from the bucket; returns 0, or the seconds until they are available"""
+        if self.rate <= 0:
+            return float('inf')
+        calls = min(calls, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= calls:
+                self.tokens -= calls
+                return 0.0
+            return (calls - self.tokens) / self.rate
+    
+    def charge(self, calls: float):
+        """Debit calls made beyond what was acquired up front (may go negative)"""
+        with self._lock:
+            self._refill()
+            self.tokens -= calls
+
+
+class RateBudget:
+    """
+    One upstream API's call budget, split between background and interactive use
+    
+    Background polls only ever draw from their (1 - interactive_share) of
+    the rate. Interactive refreshes use the reserved slice first and may
+    borrow from the background bucket, never the other way round, so a
+    backlog of polls cannot starve a request that is waiting on fresh data.
+    """
+    
+    def __init__(self, calls_per_minute: int, interactive_share: float = 0.0):
+        self.background = TokenBucket(calls_per_minute * (1 - interactive_share))
+        self.interactive = TokenBucket(calls_per_minute * interactive_share)
+    
+    def try_acquire(self, calls: float, interactive: bool = False) -> float:
+        """Take calls from the budget; returns 0, or the seconds until they are available"""
+        if not interactive:
+            return self.background.try_acquire(calls)
+        wait = self.interactive.try_acquire(calls)
+        if not wait:
+            return 0.0
+        borrowed = self.background.try_acquire(calls)
+        return 0.0 if not borrowed else min(wait, borrowed)
+    
+    def charge(self, calls: float, interactive: bool = False):
+        """Debit calls made beyond what was acquired up front"""
+        (self.interactive if interactive and self.interactive.rate > 0 else self.background).charge(calls)
+
+
+class AccountMonitor:
+    """
+    Polls each (wallet, blockchain) pair on a schedule and ingests new transactions
+    
+    Pairs come from the networks a wallet already has monitor watermarks
+    on; a wallet without any starts from the networks it has history on, or
+    from its address format. Every poll resumes from a watermark
+    in monitor_watermarks: the last block for EVM chains, the newest
+    signature for Solana, and the last seen day for the date-window chains;
+    pairs without one start initial_lookback_days back.
+    Polls are ordered by due time in a heap and only start when their API's
+    RateBudget has room, so one busy chain cannot exhaust another's quota.
+    
+    Each pair polls on its own interval between min_interval and
+    max_interval: halved (down to what its activity rate calls for) when a
+    poll finds new transactions and doubled when it finds none, so hot
+    wallets stay current while dormant ones cost almost nothing. Pairs due
+    at the same time are taken in order of activity.
+    
+    An optional AlertEngine is fed every batch of newly stored rows, as is
+    the database service's daily balance rollup when it has one.
+    
+    Only the monitor holding the MONITOR_LOCK_NAME advisory lock polls in
+    the background; others stand by and take over when it is released.
+    Interactive refreshes (poll_wallet_now) work in every process. A pair's
+    lock is held from its budget check through its watermark update, so an
+    interactive and a background poll of the same pair run one after the
+    other; the due-time heap has a lock of its own.
+    """
+    
+    def __init__(self, database_service, blockchain_service, poll_interval: int = 300,
+                 wallet_refresh: int = 600, budgets: Dict[str, int] = None, initial_lookback_days: int = 30,
+                 min_interval: int = 60, max_interval: int = 21600, interactive_share: float = 0.25,
+                 alert_engine=None):
+        self.db = database_service
+        self.chains = blockchain_service
+        self.ingestor = TransactionIngestor(database_service)
+        self.alerts = alert_engine
+        if alert_engine:
+            self.ingestor.add_listener(alert_engine.observe)
+        if database_service.daily_balances:
+            self.ingestor.add_listener(database_service.daily_balances.observe)
+        self.poll_interval = poll_interval
+        self.wallet_refresh = wallet_refresh
+        self.initial_lookback_days = initial_lookback_days
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budgets = {
+            group: RateBudget(calls, interactive_share)
+            for group, calls in dict(DEFAULT_BUDGETS, **(budgets or {})).items()
+        }
+        self.jobs: Dict[Tuple[str, str], Dict] = {}
+        self._queue: List[tuple] = []
+        self._queued = set()
+        self._sequence = 0
+        self._wallets_loaded_at = 0.0
+        self._wallets_lock = threading.Lock()
+        self._queue_lock = threading.RLock()
+        self._leading = False
+        self._stop = threading.Event()
+    
+    def ensure_schema(self):
+        """Create the watermark table if it does not exist"""
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(MONITOR_WATERMARK_DDL)
+            cursor.close()
+            connection.commit()
+    
+    def _acquire_lock(self):
+        """
+        Take the monitor lock on a dedicated connection (not a pooled one, which
+        would be reset and lose it when returned)
+        
+        Returns:
+            The connection holding the lock, or None while another monitor holds it
+        """
+        try:
+            connection = mysql.connector.connect(
+                host=self.db.host, port=self.db.port, user=self.db.username,
+                password=self.db.password, database=self.db.database
+            )
+        except Error as e:
+            logger.warning(f"Could not connect to take the monitor lock: {str(e)}")
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (MONITOR_LOCK_NAME,))
+            (acquired,) = cursor.fetchone()
+            cursor.close()
+            if acquired == 1:
+                return connection
+        except Error as e:
+            logger.warning(f"Could not take the monitor lock: {str(e)}")
+        connection.close()
+        return None
+    
+    @staticmethod
+    def _holds_lock(connection) -> bool:
+        """Whether the lock connection is still alive and still owns the lock"""
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (MONITOR_LOCK_NAME,))
+            (held,) = cursor.fetchone()
+            cursor.close()
+            return held == 1
+        except Error:
+            return False
+    
+    @staticmethod
+    def _release_lock(connection):
+        # Ending the session releases the lock
+        try:
+            connection.close()
+        except Error:
+            pass
+    
+    def _schedule(self, key: Tuple[str, str], due_at: float):
+        activity = self.jobs[key]['activity_rate'] if key in self.jobs else 0.0
+        with self._queue_lock:
+            self._sequence += 1
+            self._queued.add(key)
+            heapq.heappush(self._queue, (due_at, -activity, self._sequence, key))
+    
+    def _next_due(self) -> Optional[Tuple[float, Optional[Tuple[str, str]]]]:
+        """
+        Pop the first pair of the heap if it is due
+        
+        Returns:
+            tuple: (due time, key) with key None while nothing is due yet, or
+                None when the heap is empty
+        """
+        with self._queue_lock:
+            if not self._queue:
+                return None
+            due_at, _, _, key = self._queue[0]
+            if due_at > time.time():
+                return due_at, None
+            heapq.heappop(self._queue)
+            self._queued.discard(key)
+            return due_at, key
+    
+    def _interval_for_rate(self, activity_rate: float) -> float:
+        """Poll interval matching an activity rate (transactions per hour): twice per expected transaction"""
+        if activity_rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, 3600 / activity_rate / 2))
+    
+    def _adapt(self, job: Dict, inserted: int):
+        """Update a pair's activity rate and next interval after a poll"""
+        now = time.time()
+        elapsed_hours = max((now - (job['last_polled_at'] or now - job['interval'])) / 3600, 1 / 60)
+        observed_rate = inserted / elapsed_hours
+        # Exponentially weighted, so one burst does not pin a wallet at the minimum forever
+        job['activity_rate'] = 0.7 * job['activity_rate'] + 0.3 * observed_rate
+        job['last_polled_at'] = now
+        job['last_inserted'] = inserted
+        
+        if inserted:
+            job['last_change_at'] = now
+            job['interval'] = max(self.min_interval, min(job['interval'] / 2, self._interval_for_rate(job['activity_rate'])))
+        else:
+            job['interval'] = min(self.max_interval, job['interval'] * 2)
+    
+    def refresh_wallets(self) -> int:
+        """Reload tracked wallets and schedule any new (wallet, blockchain) pair immediately"""
+        # The monitor thread and interactive refreshes may both reload
+        with self._wallets_lock:
+            return self._refresh_wallets()
+    
+    def _refresh_wallets(self) -> int:
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT id, address FROM wallets")
+            wallets = cursor.fetchall()
+            cursor.execute("SELECT walletId, network, last_timestamp FROM monitor_watermarks")
+            networks = {}
+            for row in cursor.fetchall():
+                networks.setdefault(row['walletId'], {})[row['network']] = row['last_timestamp']
+            
+            # Wallets the monitor has never polled start from the networks they have
+            # history on: a loose scan of the (walletId, network) index prefix
+            unpolled = [wallet['id'] for wallet in wallets if wallet['id'] not in networks]
+            for start in range(0, len(unpolled), 500):
+                chunk = unpolled[start:start + 500]
+                cursor.execute(
+                    "SELECT DISTINCT walletId, network FROM transaction_history "
+                    f"WHERE walletId IN ({', '.join(['%s'] * len(chunk))}) AND network IS NOT NULL",
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    networks.setdefault(row['walletId'], {})[row['network']] = None
+            cursor.close()
+        
+        now = time.time()
+        recent = datetime.utcnow() - timedelta(days=7)
+        jobs = {}
+        for wallet in wallets:
+            address = (wallet['address'] or '').strip()
+            if not address:
+                continue
+            known = networks.get(wallet['id'], {})
+            if known:
+                blockchains = {
+                    BLOCKCHAINS_BY_NETWORK[network]: last_seen
+                    for network, last_seen in known.items() if network in BLOCKCHAINS_BY_NETWORK
+                }
+            else:
+                blockchains = {blockchain: None for blockchain in guess_blockchains(address)}
+            
+            for blockchain, last_seen in blockchains.items():
+                key = (wallet['id'], blockchain)
+                if key in self.jobs:
+                    # Keep the measured activity of pairs that are already monitored
+                    jobs[key] = self.jobs[key]
+                    continue
+                # Polls measure the activity rate; until then pairs quiet for a week start slow
+                jobs[key] = {
+                    'wallet_id': wallet['id'],
+                    'address': address,
+                    'blockchain': blockchain,
+                    'activity_rate': 0.0,
+                    'interval': self.max_interval if last_seen and last_seen < recent else self.poll_interval,
+                    'last_change_at': last_seen.replace(tzinfo=timezone.utc).timestamp() if last_seen else None,
+                    'last_polled_at': None,
+                    'last_inserted': 0,
+                    'lock': threading.Lock()
+                }
+        
+        # Pairs that disappeared are skipped when they come off the queue
+        self.jobs = jobs
+        with self._queue_lock:
+            for key in jobs:
+                if key not in self._queued:
+                    self._schedule(key, now)
+        self._wallets_loaded_at = now
+        
+        logger.info(f"👀 Monitoring {len(jobs)} wallet/chain pairs across {len(wallets)} wallets")
+        return len(jobs)
+    
+    def _load_watermark(self, wallet_id: str, network: str) -> Dict:
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT last_block, last_signature, last_timestamp FROM monitor_watermarks "
+                "WHERE walletId = %s AND network = %s",
+                (wallet_id, network)
+            )
+            row = cursor.fetchone()
+            cursor.close()
+        return row or {'last_block': None, 'last_signature': None, 'last_timestamp': None}
+    
+    def _save_watermark(self, wallet_id: str, network: str, watermark: Dict):
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO monitor_watermarks (walletId, network, last_block, last_signature, last_timestamp, updatedAt)
+                VALUES (%s, %s, %s, %s, %s, NOW())
+                ON DUPLICATE KEY UPDATE
+                    last_block = VALUES(last_block),
+                    last_signature = VALUES(last_signature),
+                    last_timestamp = VALUES(last_timestamp),
+                    updatedAt = VALUES(updatedAt)
+                """,
+                (wallet_id, network, watermark['last_block'], watermark['last_signature'], watermark['last_timestamp'])
+            )
+            cursor.close()
+            connection.commit()
+    
+    def poll(self, job: Dict) -> Tuple[int, int]:
+        """
+        Fetch and store a pair's transactions since its watermark
+        
+        Returns:
+            tuple: (upstream calls made, rows inserted)
+        """
+        blockchain = job['blockchain']
+        network = network_name(blockchain)
+        watermark = self._load_watermark(job['wallet_id'], network)
+        # A pair without a watermark starts initial_lookback_days back
+        lookback_start = datetime.now(timezone.utc) - timedelta(days=self.initial_lookback_days)
+        
+        if blockchain in EVM_CHAIN_IDS:
+            calls = POLL_COSTS['etherscan']
+            start_block = watermark['last_block']
+            if start_block is None:
+                start_block = self.chains.get_evm_block_by_time(EVM_CHAIN_IDS[blockchain], lookback_start.timestamp())
+                calls += 1
+                if start_block is None:
+                    raise RuntimeError('could not resolve the block at the start of the lookback window')
+            data = self.chains.get_evm_transactions_since(job['address'], EVM_CHAIN_IDS[blockchain], start_block)
+        elif blockchain == 'solana':
+            data = self.chains.get_solana_transactions_since(
+                job['address'], watermark['last_signature'],
+                since_timestamp=None if watermark['last_signature'] else int(lookback_start.timestamp())
+            )
+            calls = data.get('rpc_calls', 1)
+        else:
+            since = watermark['last_timestamp'] or lookback_start.replace(tzinfo=None)
+            # The live fetchers treat end_date as an exclusive midnight, so ask up to tomorrow
+            until = datetime.utcnow() + timedelta(days=1)
+            fetch = getattr(self.chains, DATE_WINDOW_FETCHERS[blockchain])
+            data = fetch(job['address'], since.strftime('%Y-%m-%d'), until.strftime('%Y-%m-%d'))
+            calls = POLL_COSTS[blockchain]
+        
+        if not data.get('success'):
+            raise RuntimeError(data.get('error') or 'fetch failed')
+        
+        transactions = data.get('transactions', [])
+        stats = self.ingestor.ingest(blockchain, job['address'], transactions, wallet_id=job['wallet_id'])
+        
+        latest_timestamp = watermark['last_timestamp']
+        for tx in transactions:
+            if tx.get('timestamp'):
+                seen = datetime.utcfromtimestamp(int(tx['timestamp']))
+                if latest_timestamp is None or seen > latest_timestamp:
+                    latest_timestamp = seen
+        
+        self._save_watermark(job['wallet_id'], network, {
+            'last_block': data.get('latest_block', watermark['last_block']),
+            'last_signature': data.get('latest_signature', watermark['last_signature']),
+            'last_timestamp': latest_timestamp
+        })
+        return calls, stats['inserted']
+    
+    def _run_job(self, job: Dict, interactive: bool = False,
+                 timeout: Optional[float] = None) -> Tuple[Optional[float], int]:
+        """
+        Poll one pair if its budget allows
+        
+        Args:
+            job: The pair's job
+            interactive: Draw on the interactive budget
+            timeout: Longest wait for another poll of the same pair to finish (None waits)
+        
+        Returns:
+            tuple: (seconds to wait before retrying, or None when the poll ran; rows inserted)
+        """
+        group = budget_group(job['blockchain'])
+        budget = self.budgets[group]
+        
+        if not job['lock'].acquire(timeout=-1 if timeout is None else max(timeout, 0)):
+            return max(timeout, 0), 0
+        try:
+            wait = budget.try_acquire(POLL_COSTS[group], interactive)
+            if wait:
+                return wait, 0
+            
+            started = time.time()
+            inserted = 0
+            try:
+                calls, inserted = self.poll(job)
+                budget.charge(max(0, calls - POLL_COSTS[group]), interactive)
+                self._adapt(job, inserted)
+                if inserted:
+                    logger.info(
+                        f"🔔 {job['address']} on {job['blockchain']}: {inserted} new transactions "
+                        f"({time.time() - started:.1f}s, next poll in {job['interval']:.0f}s)"
+                    )
+            except Exception as e:
+                logger.warning(f"Poll failed for {job['address']} on {job['blockchain']}: {str(e)}")
+            return None, inserted
+        finally:
+            job['lock'].release()
+    
+    def poll_wallet_now(self, wallet_address: str, max_wait: float = 5.0) -> int:
+        """
+        Interactive refresh of one wallet on every chain it is monitored on
+        
+        Draws on the reserved interactive budget, so it is not queued behind
+        background polls. max_wait bounds the whole refresh: waits for budget
+        or for a running poll of the same pair end at the deadline, and
+        chains not started by then are skipped.
+        
+        Returns:
+            int: New transactions stored
+        """
+        deadline = time.time() + max_wait
+        # A standby monitor does not reload wallets on its own
+        if not self._leading and time.time() - self._wallets_loaded_at > self.wallet_refresh:
+            self.refresh_wallets()
+        
+        address = wallet_address.strip().lower()
+        inserted = 0
+        for job in [job for job in list(self.jobs.values()) if job['address'].lower() == address]:
+            while True:
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    wait, polled = self._run_job(job, interactive=True, timeout=remaining)
+                    if wait is None:
+                        inserted += polled
+                        break
+                if remaining <= 0 or time.time() + wait >= deadline:
+                    logger.warning(f"Could not refresh {wallet_address} on {job['blockchain']} within {max_wait}s")
+                    break
+                time.sleep(wait)
+        return inserted
+    
+    def run_once(self):
+        """Poll every pair once, waiting for budget as needed (skipped while another monitor runs)"""
+        self.ensure_schema()
+        lock = self._acquire_lock()
+        if lock is None:
+            logger.warning("⏸️ Another account monitor holds the lock; not polling")
+            return
+        try:
+            self.refresh_wallets()
+            for job in list(self.jobs.values()):
+                while not self._stop.is_set():
+                    wait, _ = self._run_job(job)
+                    if wait is None:
+                        break
+                    self._stop.wait(wait)
+        finally:
+            self._release_lock(lock)
+    
+    def run(self):
+        """Poll until stop() is called, standing by while another monitor holds the lock"""
+        self.ensure_schema()
+        standing_by = False
+        
+        while not self._stop.is_set():
+            lock = self._acquire_lock()
+            if lock is None:
+                if not standing_by:
+                    logger.info("⏸️ Another account monitor holds the lock; standing by")
+                    standing_by = True
+                self._stop.wait(self.poll_interval)
+                continue
+            
+            standing_by = False
+            self._leading = True
+            try:
+                self._poll_while_locked(lock)
+            finally:
+                self._leading = False
+                self._release_lock(lock)
+        
+        logger.info("🛑 Account monitor stopped")
+    
+    def _poll_while_locked(self, lock):
+        self.refresh_wallets()
+        logger.info(f"🚀 Account monitor started (intervals {self.min_interval}s-{self.max_interval}s)")
+        
+        while not self._stop.is_set():
+            if time.time() - self._wallets_loaded_at > self.wallet_refresh:
+                if not self._holds_lock(lock):
+                    # Another monitor may have taken over while our session was down
+                    logger.warning("Lost the account monitor lock; standing by")
+                    return
+                try:
+                    self.refresh_wallets()
+                except Exception as e:
+                    logger.warning(f"Wallet refresh failed: {str(e)}")
+                    self._wallets_loaded_at = time.time()
+            
+            due = self._next_due()
+            if due is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            
+            due_at, key = due
+            now = time.time()
+            if key is None:
+                self._stop.wait(min(due_at - now, 5))
+                continue
+            
+            job = self.jobs.get(key)
+            if job is None:
+                continue
+            
+            wait, _ = self._run_job(job)
+            if wait is None:
+                self._schedule(key, time.time() + job['interval'])
+            else:
+                self._schedule(key, now + wait)
+    
+    def stop(self):
+        """Ask run() to return after the current poll"""
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    import signal
+    import sys
+    from dotenv import load_dotenv
+    from alerts import alert_engine_from_env
+    from blockchain_service import BlockchainService
+    from daily_balances import DailyBalanceService
+    from database_service import DatabaseService
+    
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    db = DatabaseService(
+        host=os.getenv('DB_HOST', '217.216.110.33'),
+        port=int(os.getenv('DB_PORT', '3306')),
+        username=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'nobicuan888'),
+        database=os.getenv('DB_NAME', 'nobi_wallet_tracker')
+    )
+    if not db.connect():
+        sys.exit(1)
+    if os.getenv('DB_DAILY_BALANCES', 'False').lower() == 'true':
+        db.daily_balances = DailyBalanceService(db)
+    
+    chains = BlockchainService(
+        api_key=os.getenv('ETHERSCAN_API_KEY'),
+        solscan_api_key=os.getenv('SOLSCAN_API_KEY'),
+        tronscan_api_key=os.getenv('TRONSCAN_API_KEY'),
+        cardanoscan_api_key=os.getenv('CARDANOSCAN_API_KEY')
+    )
+    alert_engine = alert_engine_from_env(db)
+    if alert_engine:
+        alert_engine.start()
+    monitor = AccountMonitor(db, chains, alert_engine=alert_engine, **monitor_settings_from_env())
+    signal.signal(signal.SIGTERM, lambda *_: monitor.stop())
+    
+    try:
+        if '--once' in sys.argv:
+            monitor.run_once()
+            monitor.ingestor.wait_for_listeners()
+        else:
+            monitor.run()
+    except KeyboardInterrupt:
+        monitor.stop()
+    finally:
+        db.disconnect()
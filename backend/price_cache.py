@@ -0,0 +1,186 @@
+"""
+Persistent Price Cache
+SQLite-backed cache of spot prices and the USD/AED rate, shared by every
+process on the host and surviving restarts and serverless cold starts
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# /tmp is the only writable location on Vercel and is kept while an instance is reused
+DEFAULT_PRICE_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'nobi_price_cache.sqlite3')
+
+PRICE_CACHE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS price_cache (
+        cache_key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS refresh_leases (
+        cache_key TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """
+]
+
+
+class PriceCache:
+    """
+    Key/value store of JSON values with the time they were fetched
+    
+    Entries older than max_age are treated as missing. Refreshes are
+    coordinated across processes with short leases: only the process that
+    holds a key's lease calls the upstream API, the others keep serving
+    what is stored until the new value lands. Every method degrades to a
+    miss (or a granted lease) if the database cannot be opened, so a broken
+    cache never breaks pricing.
+    """
+    
+    def __init__(self, path: str = DEFAULT_PRICE_CACHE_PATH, max_age: int = 86400, lease_seconds: int = 30):
+        self.path = path
+        self.max_age = max_age
+        self.lease_seconds = lease_seconds
+        self._token = uuid.uuid4().hex[:8]
+        self._local = threading.local()
+        self._schema_ready = False
+        self._disabled = False
+    
+    @property
+    def holder(self) -> str:
+        """Lease owner name, distinct per process even for workers forked after construction"""
+        return f"{os.getpid()}-{self._token}"
+    
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Per-thread connection, creating the schema on first use"""
+        if self._disabled:
+            return None
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+                connection.execute("PRAGMA journal_mode=WAL")
+                if not self._schema_ready:
+                    for statement in PRICE_CACHE_DDL:
+                        connection.execute(statement)
+                    self._schema_ready = True
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Price cache disabled, cannot open {self.path}: {str(e)}")
+                self._disabled = True
+                return None
+            self._local.connection = connection
+        return connection
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+        """
+        Stored values that are younger than max_age
+        
+        Returns:
+            dict: {key: (value, fetched_at)} for the keys that were found
+        """
+        keys = list(dict.fromkeys(keys))
+        connection = self._connection()
+        if not keys or connection is None:
+            return {}
+        
+        try:
+            rows = connection.execute(
+                f"SELECT cache_key, value, fetched_at FROM price_cache "
+                f"WHERE fetched_at >= ? AND cache_key IN ({', '.join(['?'] * len(keys))})",
+                [time.time() - self.max_age] + keys
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Price cache read failed: {str(e)}")
+            return {}
+        return {key: (json.loads(value), fetched_at) for key, value, fetched_at in rows}
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, fetched_at) of one key, or None"""
+        return self.get_many([key]).get(key)
+    
+    def put_many(self, values: Dict[str, Any], fetched_at: Optional[float] = None):
+        """Store values and release this process's leases on them"""
+        connection = self._connection()
+        if not values or connection is None:
+            return
+        
+        fetched_at = fetched_at or time.time()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR REPLACE INTO price_cache (cache_key, value, fetched_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), fetched_at) for key, value in values.items()]
+            )
+            connection.executemany(
+                "DELETE FROM refresh_leases WHERE cache_key = ? AND holder = ?",
+                [(key, self.holder) for key in values]
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            logger.warning(f"Price cache write failed: {str(e)}")
+    
+    def put(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        self.put_many({key: value}, fetched_at)
+    
+    def acquire_leases(self, keys: Iterable[str]) -> set:
+        """
+        Take the refresh lease of every key not currently leased by another process
+        
+        Returns:
+            set: Keys this process may now refresh
+        """
+        keys = list(dict.fromkeys(keys))
+        connection = self._connection()
+        if not keys or connection is None:
+            return set(keys)
+        
+        now = time.time()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO refresh_leases (cache_key, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(cache_key) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE refresh_leases.expires_at < ? OR refresh_leases.holder = excluded.holder",
+                [(key, self.holder, now + self.lease_seconds, now) for key in keys]
+            )
+            rows = connection.execute(
+                f"SELECT cache_key FROM refresh_leases "
+                f"WHERE holder = ? AND cache_key IN ({', '.join(['?'] * len(keys))})",
+                [self.holder] + keys
+            ).fetchall()
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            logger.warning(f"Price cache lease failed: {str(e)}")
+            return set(keys)
+        return {row[0] for row in rows}
+    
+    def release_leases(self, keys: Iterable[str]):
+        """Give up leases without storing a value (e.g. after a failed fetch)"""
+        connection = self._connection()
+        if connection is None:
+            return
+        try:
+            connection.executemany(
+                "DELETE FROM refresh_leases WHERE cache_key = ? AND holder = ?",
+                [(key, self.holder) for key in keys]
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Price cache lease release failed: {str(e)}")
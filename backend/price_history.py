@@ -0,0 +1,379 @@
+"""
+Historical Price Store
+Daily USD prices keyed by (coin_id, day), bulk-loaded from CoinGecko
+market_chart/range or imported from CSV files, persisted to disk and looked
+up for whole transaction lists at once
+
+Run from backend/:
+    python price_history.py load <symbol|coin_id> <start_date> <end_date>
+    python price_history.py import <file.csv> [coin_id]
+"""
+
+import csv
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PRICE_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_history')
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+# CoinGecko IDs of the symbols we see in statements
+COINGECKO_IDS = {
+    'ETH': 'ethereum', 'BTC': 'bitcoin', 'BNB': 'binancecoin',
+    'AVAX': 'avalanche-2', 'SOL': 'solana', 'ADA': 'cardano', 'TRX': 'tron',
+    'MATIC': 'polygon-ecosystem-token', 'POL': 'polygon-ecosystem-token',
+    'WPOL': 'polygon-ecosystem-token', 'WMATIC': 'polygon-ecosystem-token',
+    'USDT': 'tether', 'USDC': 'usd-coin', 'DAI': 'dai',
+    'WBTC': 'wrapped-bitcoin', 'WETH': 'weth', 'WBNB': 'wbnb',
+    'LINK': 'chainlink', 'UNI': 'uniswap', 'AAVE': 'aave',
+    'ARB': 'arbitrum',
+    'AUSDT': 'tether',  # Aave USDT uses same price as USDT
+    'AUSDC': 'usd-coin',  # Aave USDC uses same price as USDC
+    'HNST': 'honest-mining', 'PYTH': 'pyth-network',
+    # Solana SPL tokens
+    'PYUSD': 'paypal-usd', 'WSOL': 'wrapped-solana',
+    'JLP': 'jupiter-perpetuals-liquidity-provider-token', 'INF': 'infinity-2',
+    'USDCet': 'usd-coin',  # Wormhole USDC uses same price as USDC
+}
+
+# Longest range requested from market_chart/range at once (the public API serves one year)
+MAX_RANGE_DAYS = 365
+
+SECONDS_PER_DAY = 86400
+
+
+def coin_id_for(symbol: str) -> str:
+    """CoinGecko ID of a token symbol, falling back to the lowercased symbol"""
+    return COINGECKO_IDS.get(symbol) or COINGECKO_IDS.get(symbol.upper(), symbol.lower())
+
+
+def to_epoch_days(timestamps) -> np.ndarray:
+    """
+    Days since 1970-01-01 (UTC) for a sequence of timestamps
+    
+    Accepts unix seconds, datetime/date objects or ISO date strings.
+    """
+    values = np.asarray(timestamps)
+    if values.dtype.kind in 'iuf':
+        return np.floor_divide(values.astype(np.float64), SECONDS_PER_DAY).astype(np.int64)
+    if values.dtype.kind != 'M':
+        values = np.array([
+            value.replace(' UTC', '').replace('Z', '') if isinstance(value, str) else value
+            for value in values.tolist()
+        ], dtype='datetime64[s]')
+    return values.astype('datetime64[D]').astype(np.int64)
+
+
+def _day_label(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+class PriceHistoryStore:
+    """
+    Daily closing prices in USD per CoinGecko coin
+    
+    Each coin is kept in memory as a sorted array of days with a matching
+    array of prices, and persisted as <path>/<coin_id>.csv (date,price_usd),
+    the same format import_csv accepts. Lookups are as-of: a transaction is
+    valued at the latest known price on or before its day, within
+    max_gap_days, and NaN beyond that.
+    
+    Lookups never call CoinGecko themselves unless asked to: days without a
+    price are queued for a background thread that loads them, and answer
+    NaN until it has. Days CoinGecko could not price (a failed request or a
+    gap in its data) are not requested again for miss_ttl seconds.
+    """
+    
+    def __init__(self, path: str = DEFAULT_PRICE_HISTORY_PATH, api_key: Optional[str] = None,
+                 max_gap_days: int = 3, timeout: int = 30, miss_ttl: int = 3600,
+                 background_loads: bool = True):
+        self.path = path
+        self.api_key = api_key
+        self.max_gap_days = max_gap_days
+        self.timeout = timeout
+        self.miss_ttl = miss_ttl
+        self.background_loads = background_loads
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._misses: Dict[str, Dict[int, float]] = {}
+        self._lock = threading.RLock()
+        self._wanted: Dict[str, Tuple[int, int]] = {}
+        self._wanted_event = threading.Event()
+        self._loader = None
+    
+    def _file(self, coin_id: str) -> str:
+        return os.path.join(self.path, f"{coin_id}.csv")
+    
+    def _read_csv(self, path: str) -> Dict[int, float]:
+        """{epoch day: price} from a date,price CSV (also accepts CoinGecko's snapped_at,price export)"""
+        prices = {}
+        with open(path, 'r', newline='', encoding='utf-8') as handle:
+            reader = csv.DictReader(handle)
+            fields = {name.lower(): name for name in reader.fieldnames or []}
+            date_field = fields.get('date') or fields.get('snapped_at') or fields.get('timestamp')
+            price_field = fields.get('price_usd') or fields.get('price') or fields.get('close')
+            if not date_field or not price_field:
+                raise ValueError(f"{path} needs a date (or snapped_at) column and a price (or price_usd) column")
+            
+            for row in reader:
+                raw_date, raw_price = row.get(date_field), row.get(price_field)
+                if not raw_date or raw_price in (None, ''):
+                    continue
+                raw_date = raw_date.strip()
+                day = int(to_epoch_days([float(raw_date)] if raw_date.isdigit() else [raw_date])[0])
+                prices[day] = float(raw_price)
+        return prices
+    
+    def _series_for(self, coin_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted (days, prices) arrays of a coin, loaded from disk on first use"""
+        with self._lock:
+            series = self._series.get(coin_id)
+            if series is None:
+                prices = {}
+                if os.path.exists(self._file(coin_id)):
+                    try:
+                        prices = self._read_csv(self._file(coin_id))
+                    except Exception as e:
+                        logger.warning(f"Ignoring unreadable price history for {coin_id}: {str(e)}")
+                series = self._build(prices)
+                self._series[coin_id] = series
+            return series
+    
+    @staticmethod
+    def _build(prices: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+        days = np.array(sorted(prices), dtype=np.int64)
+        return days, np.array([prices[day] for day in days.tolist()], dtype=np.float64)
+    
+    def _merge(self, coin_id: str, prices: Dict[int, float]) -> int:
+        """Add daily prices for a coin and rewrite its file; returns the number of days stored"""
+        if not prices:
+            return 0
+        with self._lock:
+            days, values = self._series_for(coin_id)
+            merged = dict(zip(days.tolist(), values.tolist()))
+            merged.update(prices)
+            self._series[coin_id] = self._build(merged)
+            
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = self._file(coin_id) + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['date', 'price_usd'])
+                for day, price in zip(*self._series[coin_id]):
+                    writer.writerow([_day_label(day), repr(float(price))])
+            os.replace(tmp_path, self._file(coin_id))
+        return len(prices)
+    
+    def missing_days(self, coin_id: str, start_day: int, end_day: int) -> np.ndarray:
+        """Days in [start_day, end_day] without a stored price, less recent misses"""
+        days, _ = self._series_for(coin_id)
+        wanted = np.arange(start_day, end_day + 1, dtype=np.int64)
+        missing = wanted[~np.isin(wanted, days)]
+        
+        with self._lock:
+            misses = self._misses.get(coin_id)
+            if misses:
+                cutoff = time.time() - self.miss_ttl
+                for day in [day for day, missed_at in misses.items() if missed_at < cutoff]:
+                    del misses[day]
+                if misses:
+                    missing = missing[~np.isin(missing, np.fromiter(misses, dtype=np.int64, count=len(misses)))]
+        return missing
+    
+    def _record_misses(self, coin_id: str, days: np.ndarray):
+        """Remember days CoinGecko did not price so they are not requested again within miss_ttl"""
+        now = time.time()
+        with self._lock:
+            misses = self._misses.setdefault(coin_id, {})
+            for day in days.tolist():
+                misses[day] = now
+    
+    def fetch_range(self, coin_id: str, start_day: int, end_day: int) -> Dict[int, float]:
+        """
+        Daily closing prices from CoinGecko market_chart/range
+        
+        Ranges longer than MAX_RANGE_DAYS are requested in pieces. CoinGecko
+        returns hourly points for short ranges, so the last point of each
+        UTC day is kept.
+        """
+        headers = {'x-cg-demo-api-key': self.api_key} if self.api_key else {}
+        prices = {}
+        for chunk_start in range(start_day, end_day + 1, MAX_RANGE_DAYS):
+            chunk_end = min(end_day, chunk_start + MAX_RANGE_DAYS - 1)
+            response = requests.get(
+                f"{COINGECKO_API}/coins/{coin_id}/market_chart/range",
+                params={
+                    'vs_currency': 'usd',
+                    'from': chunk_start * SECONDS_PER_DAY,
+                    'to': (chunk_end + 1) * SECONDS_PER_DAY - 1
+                },
+                headers=headers,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            
+            for timestamp_ms, price in response.json().get('prices', []):
+                if price is not None:
+                    prices[int(timestamp_ms // 1000 // SECONDS_PER_DAY)] = float(price)
+        return prices
+    
+    def load_range(self, coin_id: str, start_day: int, end_day: int) -> int:
+        """
+        Fetch and store the days of a range that are not stored yet
+        
+        Args:
+            coin_id: CoinGecko coin ID
+            start_day: First day (days since epoch, see to_epoch_days)
+            end_day: Last day, inclusive
+        
+        Returns:
+            int: Days added
+        """
+        # Today's price is still moving, so the newest complete day is yesterday
+        today = int(time.time() // SECONDS_PER_DAY)
+        end_day = min(end_day, today - 1)
+        missing = self.missing_days(coin_id, start_day, end_day)
+        if not len(missing):
+            return 0
+        
+        try:
+            prices = self.fetch_range(coin_id, int(missing.min()), int(missing.max()))
+        except Exception:
+            self._record_misses(coin_id, missing)
+            raise
+        prices.pop(today, None)
+        added = self._merge(coin_id, prices)
+        fetched = np.fromiter(prices, dtype=np.int64, count=len(prices))
+        self._record_misses(coin_id, missing[~np.isin(missing, fetched)])
+        logger.info(
+            f"💹 Loaded {added} daily {coin_id} prices "
+            f"({_day_label(missing.min())} to {_day_label(missing.max())})"
+        )
+        return added
+    
+    def import_csv(self, path: str, coin_id: Optional[str] = None) -> int:
+        """
+        Import daily prices from a CSV file, e.g. a CoinGecko historical data export
+        
+        Args:
+            path: CSV with date (or snapped_at) and price (or price_usd) columns
+            coin_id: CoinGecko coin ID, defaults to the file name without extension
+        
+        Returns:
+            int: Days imported
+        """
+        coin_id = coin_id or os.path.splitext(os.path.basename(path))[0]
+        return self._merge(coin_id, self._read_csv(path))
+    
+    def request_range(self, coin_id: str, start_day: int, end_day: int):
+        """Queue a range for the background loader; returns at once"""
+        if not self.background_loads:
+            return
+        with self._lock:
+            if coin_id in self._wanted:
+                queued_start, queued_end = self._wanted[coin_id]
+                start_day, end_day = min(start_day, queued_start), max(end_day, queued_end)
+            self._wanted[coin_id] = (start_day, end_day)
+            if self._loader is None:
+                self._loader = threading.Thread(target=self._load_loop, name='price-history-loader', daemon=True)
+                self._loader.start()
+        self._wanted_event.set()
+    
+    def _load_loop(self):
+        while True:
+            self._wanted_event.wait()
+            self._wanted_event.clear()
+            with self._lock:
+                wanted, self._wanted = self._wanted, {}
+            for coin_id, (start_day, end_day) in wanted.items():
+                try:
+                    self.load_range(coin_id, start_day, end_day)
+                except Exception as e:
+                    logger.warning(f"Could not load price history for {coin_id}: {str(e)}")
+    
+    def lookup(self, coin_ids: Sequence[str], timestamps, fetch_missing: bool = False) -> np.ndarray:
+        """
+        USD price of each (coin_id, timestamp) pair of a transaction list
+        
+        Args:
+            coin_ids: CoinGecko coin ID per transaction
+            timestamps: Timestamp per transaction (unix seconds, datetimes or date strings)
+            fetch_missing: Load missing days from CoinGecko before answering, one range per
+                coin; otherwise they are queued for the background loader
+        
+        Returns:
+            numpy.ndarray: float64 prices aligned with the input, NaN where unknown
+        """
+        coin_ids = np.asarray(coin_ids, dtype=object)
+        days = to_epoch_days(timestamps)
+        prices = np.full(len(days), np.nan, dtype=np.float64)
+        if not len(days):
+            return prices
+        
+        unique_ids, inverse = np.unique(coin_ids.astype(str), return_inverse=True)
+        for index, coin_id in enumerate(unique_ids.tolist()):
+            mask = inverse == index
+            coin_days = days[mask]
+            
+            if fetch_missing:
+                try:
+                    self.load_range(coin_id, int(coin_days.min()), int(coin_days.max()))
+                except Exception as e:
+                    logger.warning(f"Could not load price history for {coin_id}: {str(e)}")
+            elif len(self.missing_days(coin_id, int(coin_days.min()), int(coin_days.max()))):
+                self.request_range(coin_id, int(coin_days.min()), int(coin_days.max()))
+            
+            known_days, known_prices = self._series_for(coin_id)
+            if not len(known_days):
+                continue
+            
+            position = np.searchsorted(known_days, coin_days, side='right') - 1
+            found = position >= 0
+            position = np.clip(position, 0, None)
+            found &= coin_days - known_days[position] <= self.max_gap_days
+            prices[mask] = np.where(found, known_prices[position], np.nan)
+        
+        return prices
+    
+    def lookup_symbols(self, symbols: Iterable[str], timestamps, fetch_missing: bool = False) -> np.ndarray:
+        """lookup() for token symbols instead of CoinGecko IDs"""
+        return self.lookup([coin_id_for(symbol) for symbol in symbols], timestamps, fetch_missing)
+    
+    def coins(self) -> List[str]:
+        """Coin IDs with a stored price file"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.path) if name.endswith('.csv'))
+
+
+if __name__ == '__main__':
+    import sys
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    store = PriceHistoryStore(
+        os.getenv('PRICE_HISTORY_PATH', DEFAULT_PRICE_HISTORY_PATH),
+        api_key=os.getenv('COINGECKO_API_KEY')
+    )
+    
+    if len(sys.argv) >= 5 and sys.argv[1] == 'load':
+        coin_id = coin_id_for(sys.argv[2])
+        start_day, end_day = to_epoch_days([sys.argv[3], sys.argv[4]]).tolist()
+        print(f"{coin_id}: {store.load_range(coin_id, start_day, end_day)} days added")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'import':
+        coin_id = sys.argv[3] if len(sys.argv) > 3 else None
+        print(f"{store.import_csv(sys.argv[2], coin_id)} days imported")
+    else:
+        print("Usage: python price_history.py load <symbol|coin_id> <start_date> <end_date>")
+        print("       python price_history.py import <file.csv> [coin_id]")
+        sys.exit(1)
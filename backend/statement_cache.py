@@ -0,0 +1,91 @@
+"""
+Statement Result Cache
+LRU + TTL cache for database statements, invalidated by a per-wallet watermark
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StatementCache:
+    """
+    Caches computed statements keyed by (walletId, network, start, end, ...)
+    
+    Every entry stores the wallet's history watermark (row count and latest
+    timestamp) from when it was computed. A lookup is only a hit when the
+    caller's freshly probed watermark still matches, so new or deleted rows
+    invalidate the entry without any explicit purge.
+    
+    Values are deep-copied in and out, so a caller that edits a statement
+    it got back cannot change what later hits see.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl: int = 900, max_rows_per_entry: int = 50000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows_per_entry = max_rows_per_entry
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+    
+    def get(self, key: tuple, watermark: tuple) -> Optional[Any]:
+        """Return the cached value if it is fresh and was built at this watermark"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry['watermark'] != watermark or time.time() - entry['stored_at'] > self.ttl:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry['value']
+        return copy.deepcopy(value)
+    
+    def put(self, key: tuple, watermark: tuple, value: Any, row_count: int = 0):
+        """Store a value, evicting the least recently used entries beyond max_entries"""
+        if row_count > self.max_rows_per_entry:
+            # Very large statements would crowd out everything else
+            return
+        
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = {'watermark': watermark, 'value': value, 'stored_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,210 @@
+"""
+Wallet Registry
+In-process cache of the wallets table keyed by normalized address
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+
+NORMALIZED_COLUMN = 'addressNormalized'
+
+
+def normalize_address(address: str) -> str:
+    """Normalize a wallet address for lookups (matches LOWER(address) in SQL)"""
+    return (address or '').strip().lower()
+
+
+def wallet_ids_by_address(rows) -> Dict[str, str]:
+    """
+    {normalized address: wallet ID} from (id, address) wallet rows
+    
+    Addresses that normalize to the same key (case or whitespace variants,
+    or one address registered twice) keep the first row, which is the one
+    the unordered SELECT ... WHERE LOWER(address) = LOWER(%s) of
+    DatabaseService.get_wallet_id returns; each collision is logged.
+    """
+    wallets = {}
+    for row in rows:
+        if not row['address']:
+            continue
+        key = normalize_address(row['address'])
+        if key in wallets:
+            if wallets[key] != row['id']:
+                logger.warning(f"⚠️ Wallets {wallets[key]} and {row['id']} share address {key}, using {wallets[key]}")
+            continue
+        wallets[key] = row['id']
+    return wallets
+
+
+class WalletRegistry:
+    """
+    Maps wallet addresses to wallet IDs without a query per request
+    
+    The whole wallets table is loaded into a dict and reloaded every
+    refresh_interval seconds. An address that is not in the dict falls back
+    to a single-row lookup (indexed when the addressNormalized column exists)
+    and the answer, found or not, is remembered.
+    """
+    
+    def __init__(self, database_service, refresh_interval: int = 300, negative_ttl: int = 60):
+        self.db = database_service
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self.wallets: Dict[str, str] = {}
+        self.misses: Dict[str, float] = {}
+        self.loaded_at = 0.0
+        self.has_normalized_column = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+    
+    def load(self) -> int:
+        """Reload every wallet into memory; returns the number of wallets loaded"""
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT id, address FROM wallets")
+            wallets = wallet_ids_by_address(cursor.fetchall())
+            cursor.execute("SHOW COLUMNS FROM wallets LIKE %s", (NORMALIZED_COLUMN,))
+            has_normalized_column = cursor.fetchone() is not None
+            cursor.close()
+        
+        with self._lock:
+            self.wallets = wallets
+            self.misses = {}
+            self.loaded_at = time.time()
+            self.has_normalized_column = has_normalized_column
+        
+        logger.info(f"👛 Wallet registry loaded: {len(wallets)} wallets")
+        return len(wallets)
+    
+    def get_wallet_id(self, wallet_address: str) -> Optional[str]:
+        """
+        Resolve a wallet address to its wallet ID
+        
+        Args:
+            wallet_address: Wallet address (any case)
+        
+        Returns:
+            str: Wallet ID (UUID) or None if not found
+        """
+        # Only one thread reloads; the others keep using the current snapshot
+        if time.time() - self.loaded_at > self.refresh_interval and self._refresh_lock.acquire(blocking=False):
+            try:
+                self.load()
+            except Error as e:
+                # Keep serving the previous snapshot if the reload fails
+                logger.warning(f"Wallet registry refresh failed: {e}")
+            finally:
+                self._refresh_lock.release()
+        
+        key = normalize_address(wallet_address)
+        with self._lock:
+            wallet_id = self.wallets.get(key)
+            missed_at = self.misses.get(key)
+        if wallet_id:
+            return wallet_id
+        if missed_at and time.time() - missed_at < self.negative_ttl:
+            return None
+        
+        wallet_id = self._lookup(key)
+        with self._lock:
+            if wallet_id:
+                self.wallets[key] = wallet_id
+                self.misses.pop(key, None)
+            else:
+                self.misses[key] = time.time()
+        return wallet_id
+    
+    def get_wallet_ids(self, wallet_addresses: List[str]) -> Dict[str, str]:
+        """
+        Resolve many wallet addresses, querying once for all snapshot misses
+        
+        Args:
+            wallet_addresses: Wallet addresses (any case)
+        
+        Returns:
+            dict: {address as given: wallet ID} for the addresses that exist
+        """
+        # Reuse the single-address path for the refresh check on the first one
+        if wallet_addresses and time.time() - self.loaded_at > self.refresh_interval:
+            self.get_wallet_id(wallet_addresses[0])
+        
+        resolved = {}
+        missing = {}
+        now = time.time()
+        with self._lock:
+            for address in wallet_addresses:
+                key = normalize_address(address)
+                if key in self.wallets:
+                    resolved[address] = self.wallets[key]
+                elif not (key in self.misses and now - self.misses[key] < self.negative_ttl):
+                    missing.setdefault(key, []).append(address)
+        
+        if missing:
+            found = self._lookup_many(list(missing))
+            with self._lock:
+                for key, addresses in missing.items():
+                    if key in found:
+                        self.wallets[key] = found[key]
+                        self.misses.pop(key, None)
+                        for address in addresses:
+                            resolved[address] = found[key]
+                    else:
+                        self.misses[key] = now
+        
+        return resolved
+    
+    def _lookup_many(self, keys: List[str]) -> Dict[str, str]:
+        """One IN-list lookup for several normalized addresses"""
+        column = NORMALIZED_COLUMN if self.has_normalized_column else 'LOWER(address)'
+        placeholders = ', '.join(['%s'] * len(keys))
+        
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(f"SELECT id, address FROM wallets WHERE {column} IN ({placeholders})", keys)
+            found = wallet_ids_by_address(cursor.fetchall())
+            cursor.close()
+        return found
+    
+    def _lookup(self, key: str) -> Optional[str]:
+        """Single-row lookup for an address missing from the snapshot"""
+        if self.has_normalized_column:
+            query = f"SELECT id FROM wallets WHERE {NORMALIZED_COLUMN} = %s LIMIT 1"
+        else:
+            query = "SELECT id FROM wallets WHERE LOWER(address) = %s LIMIT 1"
+        
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, (key,))
+            result = cursor.fetchone()
+            cursor.close()
+        return result['id'] if result else None
+    
+    def ensure_normalized_column(self):
+        """
+        Add an indexed addressNormalized generated column to wallets
+        
+        Optional migration: it lets the miss path use an index instead of
+        LOWER(address), which forces a full scan of the wallets table.
+        """
+        with self.db.get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SHOW COLUMNS FROM wallets LIKE %s", (NORMALIZED_COLUMN,))
+            if cursor.fetchone() is None:
+                cursor.execute(
+                    f"ALTER TABLE wallets ADD COLUMN {NORMALIZED_COLUMN} VARCHAR(191) "
+                    "GENERATED ALWAYS AS (LOWER(TRIM(address))) STORED"
+                )
+                cursor.execute(f"CREATE INDEX idx_wallets_{NORMALIZED_COLUMN} ON wallets ({NORMALIZED_COLUMN})")
+                logger.info(f"✅ Added wallets.{NORMALIZED_COLUMN} with index")
+            cursor.close()
+            connection.commit()
+        
+        with self._lock:
+            self.has_normalized_column = True
@@ -0,0 +1,216 @@
+"""
+XLSX Generator for Blockchain Transactions
+Generates Excel statements with opening balance, transactions and closing
+balance sheets in constant memory
+"""
+
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional
+
+import xlsxwriter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Excel's row limit per sheet, less the header row
+MAX_ROWS_PER_SHEET = 1048575
+
+TRANSACTION_COLUMNS = [
+    ('Date (UTC)', 20),
+    ('Hash', 68),
+    ('Type', 16),
+    ('Direction', 10),
+    ('From', 44),
+    ('To', 44),
+    ('Amount', 22),
+    ('Token', 10),
+    ('Status', 10),
+    ('Block', 12),
+    ('Fee', 16),
+    ('Value (USD)', 16),
+]
+
+
+class XLSXGenerator:
+    """
+    Generate Excel reports for blockchain transactions
+    
+    The workbook is written with xlsxwriter's constant_memory mode: each row
+    is flushed to a temporary file as soon as it is written, so memory does
+    not grow with the number of transactions. Dates, amounts, blocks and
+    fees are native Excel cells. Periods beyond Excel's row limit continue
+    on further transaction sheets.
+    """
+    
+    def write_statement(
+        self,
+        path: str,
+        address: str,
+        blockchain: str,
+        transactions: Iterable[Dict],
+        opening_balances: Dict[str, object],
+        closing_balances: Dict[str, object],
+        crypto_symbol: Optional[str] = None,
+        start_date: str = None,
+        end_date: str = None,
+        presorted: bool = False
+    ) -> Dict[str, int]:
+        """
+        Write an XLSX statement to path
+        
+        Args:
+            path: Output file path
+            address: Wallet address
+            blockchain: Blockchain or network name
+            transactions: Transactions in CSVGenerator's shape; an iterator must be
+                in timestamp order already (presorted=True)
+            opening_balances: {asset: balance} at the start of the period
+            closing_balances: {asset: balance} at the end of the period
+            crypto_symbol: Token of rows without a tokenSymbol
+            start_date: Start date
+            end_date: End date
+            presorted: Skip sorting (required to stay streaming for iterators)
+        
+        Returns:
+            dict: {'total': 120, 'incoming': 70, 'outgoing': 50}
+        """
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'tmpdir': tempfile.gettempdir()})
+        try:
+            return self._write_sheets(
+                workbook, address, blockchain, transactions, opening_balances, closing_balances,
+                crypto_symbol, start_date, end_date, presorted
+            )
+        finally:
+            # Also removes the per-sheet temporary files if writing failed
+            workbook.close()
+    
+    def _write_sheets(self, workbook, address, blockchain, transactions, opening_balances, closing_balances,
+                      crypto_symbol, start_date, end_date, presorted) -> Dict[str, int]:
+        bold = workbook.add_format({'bold': True})
+        title = workbook.add_format({'bold': True, 'font_size': 14})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        amount_format = workbook.add_format({'num_format': '#,##0.00000000'})
+        usd_format = workbook.add_format({'num_format': '#,##0.00'})
+        
+        def balance_sheet(name, heading, as_of, balances):
+            sheet = workbook.add_worksheet(name)
+            sheet.set_column(0, 0, 24)
+            sheet.set_column(1, 1, 24)
+            sheet.write_string(0, 0, heading, title)
+            sheet.write_string(1, 0, 'Blockchain')
+            sheet.write_string(1, 1, blockchain.upper())
+            sheet.write_string(2, 0, 'Address')
+            sheet.write_string(2, 1, address)
+            sheet.write_string(3, 0, 'As of')
+            sheet.write_string(3, 1, str(as_of))
+            sheet.write_string(5, 0, 'Asset', bold)
+            sheet.write_string(5, 1, 'Balance', bold)
+            row = 6
+            for asset, balance in balances.items():
+                sheet.write_string(row, 0, asset)
+                sheet.write_number(row, 1, float(balance), amount_format)
+                row += 1
+            return sheet, row
+        
+        def transaction_sheet(number):
+            sheet = workbook.add_worksheet('Transactions' if number == 1 else f'Transactions ({number})')
+            for column, (header, width) in enumerate(TRANSACTION_COLUMNS):
+                sheet.set_column(column, column, width)
+                sheet.write_string(0, column, header, bold)
+            sheet.freeze_panes(1, 0)
+            return sheet
+        
+        balance_sheet('Opening Balance', 'OPENING BALANCE', start_date, opening_balances)
+        
+        # Sort transactions by timestamp (oldest first)
+        if not presorted:
+            transactions = sorted(transactions, key=lambda x: x.get('timestamp', 0))
+        
+        summary = {'total': 0, 'incoming': 0, 'outgoing': 0}
+        sheet_number = 1
+        sheet = transaction_sheet(sheet_number)
+        row = 1
+        
+        for tx in transactions:
+            if row > MAX_ROWS_PER_SHEET:
+                sheet_number += 1
+                sheet = transaction_sheet(sheet_number)
+                row = 1
+            
+            timestamp = tx.get('timestamp', 0)
+            if timestamp:
+                sheet.write_datetime(
+                    row, 0,
+                    datetime.fromtimestamp(float(timestamp), tz=timezone.utc).replace(tzinfo=None),
+                    date_format
+                )
+            else:
+                sheet.write_string(row, 0, 'Unknown')
+            
+            # Same fee derivation as the CSV export
+            fee = tx.get('fee', 0)
+            if fee == 0:
+                gas_used = tx.get('gasUsed', 0)
+                gas_price = tx.get('gasPrice', 0)
+                if gas_used and gas_price:
+                    fee = (gas_used * gas_price) / 1e9
+            
+            sheet.write_string(row, 1, str(tx.get('hash', 'Unknown')))
+            sheet.write_string(row, 2, str(tx.get('type', 'Transfer')))
+            sheet.write_string(row, 3, str(tx.get('direction', 'unknown')))
+            sheet.write_string(row, 4, str(tx.get('from') or 'Unknown'))
+            sheet.write_string(row, 5, str(tx.get('to') or 'Unknown'))
+            sheet.write_number(row, 6, float(tx.get('amount') or 0), amount_format)
+            sheet.write_string(row, 7, str(tx.get('tokenSymbol', crypto_symbol) or ''))
+            sheet.write_string(row, 8, str(tx.get('status', 'Success')))
+            block = tx.get('blockNumber')
+            if block not in (None, ''):
+                sheet.write_number(row, 9, int(block))
+            sheet.write_number(row, 10, float(fee or 0), amount_format)
+            if tx.get('usdValue') is not None:
+                sheet.write_number(row, 11, float(tx['usdValue']), usd_format)
+            row += 1
+            
+            summary['total'] += 1
+            if tx.get('direction') == 'in':
+                summary['incoming'] += 1
+            elif tx.get('direction') == 'out':
+                summary['outgoing'] += 1
+        
+        sheet, row = balance_sheet('Closing Balance', 'CLOSING BALANCE', end_date, closing_balances)
+        row += 1
+        sheet.write_string(row, 0, 'SUMMARY', bold)
+        sheet.write_string(row + 1, 0, 'Total Transactions')
+        sheet.write_number(row + 1, 1, summary['total'])
+        sheet.write_string(row + 2, 0, 'Incoming Transactions')
+        sheet.write_number(row + 2, 1, summary['incoming'])
+        sheet.write_string(row + 3, 0, 'Outgoing Transactions')
+        sheet.write_number(row + 3, 1, summary['outgoing'])
+        sheet.write_string(row + 4, 0, 'Generated')
+        sheet.write_string(row + 4, 1, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        
+        return summary
+    
+    def stream_statement(self, *args, chunk_size: int = 65536, **kwargs) -> Iterator[bytes]:
+        """
+        write_statement() into a temporary file, then yield the file in chunks
+        
+        An XLSX file is a zip archive that is only complete once every sheet
+        is written, so the file is built on disk first and removed after it
+        has been sent. Nothing is yielded until then: the statement is built
+        when the first chunk is requested, so a caller streaming a response
+        sends its headers first and can only abort the body if writing fails.
+        """
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        try:
+            self.write_statement(path, *args, **kwargs)
+            with open(path, 'rb') as xlsx_file:
+                while True:
+                    chunk = xlsx_file.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            os.remove(path)
@@ -33,55 +33,56 @@ def check_wallets():
         return
     
     try:
-        cursor = db.connection.cursor(dictionary=True)
+        with db.get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
         
-        # Get all unique wallet addresses with transaction counts
-        query = """
-        SELECT 
-            walletAddress,
-            COUNT(*) as total_transactions,
-            COUNT(CASE WHEN value IS NOT NULL THEN 1 END) as transactions_with_value,
-            MIN(timestamp) as earliest,
-            MAX(timestamp) as latest,
-            network
-        FROM transaction_history
-        GROUP BY walletAddress, network
-        HAVING COUNT(*) > 0
-        ORDER BY transactions_with_value DESC
-        """
+            # Get all unique wallet addresses with transaction counts
+            query = """
+            SELECT 
+                walletAddress,
+                COUNT(*) as total_transactions,
+                COUNT(CASE WHEN value IS NOT NULL THEN 1 END) as transactions_with_value,
+                MIN(timestamp) as earliest,
+                MAX(timestamp) as latest,
+                network
+            FROM transaction_history
+            GROUP BY walletAddress, network
+            HAVING COUNT(*) > 0
+            ORDER BY transactions_with_value DESC
+            """
         
-        cursor.execute(query)
-        wallets = cursor.fetchall()
+            cursor.execute(query)
+            wallets = cursor.fetchall()
         
-        logger.info(f"\n📊 Found {len(wallets)} wallet-network combinations with transactions:\n")
+            logger.info(f"\n📊 Found {len(wallets)} wallet-network combinations with transactions:\n")
         
-        for i, wallet in enumerate(wallets, 1):
-            logger.info(f"{i}. Wallet: {wallet['walletAddress']}")
-            logger.info(f"   Network: {wallet['network']}")
-            logger.info(f"   Total transactions: {wallet['total_transactions']:,}")
-            logger.info(f"   With value: {wallet['transactions_with_value']:,}")
-            logger.info(f"   Date range: {wallet['earliest']} to {wallet['latest']}")
+            for i, wallet in enumerate(wallets, 1):
+                logger.info(f"{i}. Wallet: {wallet['walletAddress']}")
+                logger.info(f"   Network: {wallet['network']}")
+                logger.info(f"   Total transactions: {wallet['total_transactions']:,}")
+                logger.info(f"   With value: {wallet['transactions_with_value']:,}")
+                logger.info(f"   Date range: {wallet['earliest']} to {wallet['latest']}")
             
-            # Get sample transactions for this wallet
-            sample_query = """
-            SELECT timestamp, asset, value, direction
-            FROM transaction_history
-            WHERE walletAddress = %s AND network = %s AND value IS NOT NULL
-            ORDER BY timestamp DESC
-            LIMIT 3
-            """
+                # Get sample transactions for this wallet
+                sample_query = """
+                SELECT timestamp, asset, value, direction
+                FROM transaction_history
+                WHERE walletAddress = %s AND network = %s AND value IS NOT NULL
+                ORDER BY timestamp DESC
+                LIMIT 3
+                """
             
-            cursor.execute(sample_query, (wallet['walletAddress'], wallet['network']))
-            samples = cursor.fetchall()
+                cursor.execute(sample_query, (wallet['walletAddress'], wallet['network']))
+                samples = cursor.fetchall()
             
-            if samples:
-                logger.info(f"   Recent transactions:")
-                for sample in samples:
-                    logger.info(f"      {sample['timestamp']}: {sample['direction']} {sample['value']} {sample['asset']}")
+                if samples:
+                    logger.info(f"   Recent transactions:")
+                    for sample in samples:
+                        logger.info(f"      {sample['timestamp']}: {sample['direction']} {sample['value']} {sample['asset']}")
             
-            logger.info("")
+                logger.info("")
         
-        cursor.close()
+            cursor.close()
         
     finally:
         db.disconnect()
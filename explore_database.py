@@ -70,10 +70,11 @@ def explore_database():
             logger.info("-"*80)
             
             try:
-                cursor = db.connection.cursor(dictionary=True)
-                cursor.execute(f"SELECT * FROM {table} LIMIT 3")
-                rows = cursor.fetchall()
-                cursor.close()
+                with db.get_connection() as connection:
+                    cursor = connection.cursor(dictionary=True)
+                    cursor.execute(f"SELECT * FROM {table} LIMIT 3")
+                    rows = cursor.fetchall()
+                    cursor.close()
                 
                 if rows:
                     for i, row in enumerate(rows, 1):
@@ -91,10 +92,11 @@ def explore_database():
         logger.info("-"*80)
         for table in tables:
             try:
-                cursor = db.connection.cursor()
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                cursor.close()
+                with db.get_connection() as connection:
+                    cursor = connection.cursor()
+                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    count = cursor.fetchone()[0]
+                    cursor.close()
                 logger.info(f"{table:<40} {count:>10} records")
             except Exception as e:
                 logger.error(f"Error counting {table}: {e}")
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other by bare name (see api/index.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+
+@pytest.fixture(scope='session')
+def backend_app(tmp_path_factory):
+    """The Flask app module, imported against a database that refuses connections"""
+    os.environ.update({
+        'DB_HOST': '127.0.0.1',
+        'DB_PORT': '1',
+        'DEBUG': 'False',
+        'PRICE_CACHE_PATH': str(tmp_path_factory.mktemp('prices') / 'cache.sqlite3'),
+        'PRICE_HISTORY_PATH': str(tmp_path_factory.mktemp('price_history')),
+    })
+    import backend
+    backend.app.testing = True
+    return backend
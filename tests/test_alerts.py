@@ -0,0 +1,137 @@
+"""Balance-threshold and large-transfer alerts (the database is faked)"""
+
+import threading
+from decimal import Decimal
+
+import pytest
+
+from alerts import AlertEngine, AlertRule
+
+WALLET = '0xAbC'
+
+
+class FakeDatabase:
+    """Answers the seeding aggregate with fixed balances"""
+    
+    def __init__(self, balances):
+        self.balances = balances
+        self.seeds = 0
+    
+    def get_wallet_balances(self, wallet_id, network=None):
+        self.seeds += 1
+        return dict(self.balances)
+
+
+class ListSink:
+    def __init__(self):
+        self.sent = []
+    
+    def send(self, alerts):
+        self.sent.extend(alerts)
+
+
+def row(value, direction='outgoing', asset='USDC', tx_hash='0x1', usd=None):
+    return {'network': 'eth-mainnet', 'asset': asset, 'value': Decimal(value), 'direction': direction,
+            'usdValue': usd, 'hash': tx_hash, 'timestamp': '2025-01-01 00:00:00'}
+
+
+def make_engine(rules, balances=None, **settings):
+    sink = ListSink()
+    database = FakeDatabase(balances or {})
+    engine = AlertEngine(database, rules, sinks=[sink], **settings)
+    return engine, sink, database
+
+
+def test_large_transfer_respects_direction_and_dedup():
+    engine, sink, _ = make_engine([AlertRule('large_transfer', asset='usdc', min_amount='1000')])
+    
+    engine.observe('w1', WALLET, [row('5000'), row('5000', direction='incoming', tx_hash='0x2'), row('10', tx_hash='0x3')])
+    # The same transaction reported twice alerts once
+    engine.observe('w1', WALLET, [row('5000')])
+    engine.flush()
+    
+    assert [alert['hash'] for alert in sink.sent] == ['0x1']
+    assert sink.sent[0]['amount'] == '5000'
+
+
+def test_large_transfer_by_usd_value():
+    engine, sink, _ = make_engine([AlertRule('large_transfer', min_usd='1000', direction='any')])
+    
+    engine.observe('w1', WALLET, [row('1', asset='ETH', usd='3500'), row('1', asset='ETH', tx_hash='0x2')])
+    engine.flush()
+    
+    assert [alert['hash'] for alert in sink.sent] == ['0x1']
+
+
+def test_balance_below_fires_on_crossing_and_rearms():
+    rule = AlertRule('balance_below', wallet=WALLET, asset='USDC', threshold='1000')
+    engine, sink, database = make_engine([rule], balances={'USDC': Decimal('1500')}, dedup_window=0)
+    
+    # The seed already includes the first batch of stored rows
+    engine.observe('w1', WALLET, [row('100')])
+    engine.observe('w1', WALLET, [row('600', tx_hash='0x2')])
+    # Still below: no repeat while it stays there
+    engine.observe('w1', WALLET, [row('100', tx_hash='0x3')])
+    engine.observe('w1', WALLET, [row('2000', direction='incoming', tx_hash='0x4')])
+    engine.observe('w1', WALLET, [row('2000', tx_hash='0x5')])
+    engine.flush()
+    
+    assert database.seeds == 1
+    assert [alert['balance'] for alert in sink.sent] == ['900', '800']
+
+
+def test_other_wallets_and_assets_are_ignored():
+    rule = AlertRule('balance_below', wallet=WALLET, asset='USDC', threshold='1000')
+    engine, sink, database = make_engine([rule], balances={'USDC': Decimal('10')})
+    
+    engine.observe('w2', '0xother', [row('1')])
+    engine.observe('w1', WALLET, [row('1', asset='ETH')])
+    engine.flush()
+    
+    assert sink.sent == []
+    assert database.seeds == 1
+
+
+class SlowSink(ListSink):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.delivered = threading.Event()
+    
+    def send(self, alerts):
+        self.release.wait(5)
+        super().send(alerts)
+        self.delivered.set()
+
+
+def test_full_batch_is_delivered_without_waiting_for_the_interval():
+    sink = SlowSink()
+    engine = AlertEngine(FakeDatabase({}), [AlertRule('large_transfer', min_amount='1')], sinks=[sink],
+                         batch_size=2, batch_interval=60)
+    
+    # observe only wakes the flusher; the slow sink does not hold it up
+    engine.observe('w1', WALLET, [row('5', tx_hash='0x1'), row('5', tx_hash='0x2')])
+    assert sink.sent == []
+    
+    sink.release.set()
+    assert sink.delivered.wait(5)
+    assert len(sink.sent) == 2
+    engine.close()
+
+
+def test_pending_alerts_are_bounded():
+    engine, sink, _ = make_engine([AlertRule('large_transfer', min_amount='1')], max_pending=2)
+    
+    engine.observe('w1', WALLET, [row('5', tx_hash=f"0x{i}") for i in range(5)])
+    engine.flush()
+    
+    assert [alert['hash'] for alert in sink.sent] == ['0x3', '0x4']
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        AlertRule('balance_below', threshold='10')
+    with pytest.raises(ValueError):
+        AlertRule('large_transfer', min_amount='ten')
+    with pytest.raises(ValueError):
+        AlertRule.from_dict({'type': 'balance_above', 'asset': 'ETH', 'threshold': '1'})
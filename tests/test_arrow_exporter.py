@@ -0,0 +1,60 @@
+"""Parquet/Arrow statement export"""
+
+import io
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.ipc
+import pyarrow.parquet
+
+from arrow_exporter import ArrowStatementExporter, read_statement_metadata
+
+
+def transactions():
+    return [
+        {'timestamp': 1700000100, 'hash': '0x2', 'direction': 'out', 'from': 'a', 'to': 'b',
+         'amount': Decimal('12345678901.123456789012345678'), 'tokenSymbol': 'USDT', 'blockNumber': '11'},
+        {'timestamp': 1700000000, 'hash': '0x1', 'direction': 'in', 'from': 'b', 'to': 'a',
+         'amount': 0.1, 'blockNumber': '10', 'gasUsed': 21000, 'gasPrice': 2},
+    ]
+
+
+def export(export_format, rows, **kwargs):
+    return b''.join(ArrowStatementExporter(batch_size=1).stream_statement(
+        export_format, 'a', 'ethereum', rows, {'ETH': Decimal('1.5')}, {'ETH': Decimal('2')},
+        crypto_symbol='ETH', start_date='2025-01-01', end_date='2025-01-31', **kwargs
+    ))
+
+
+def test_parquet_keeps_large_amounts_exact():
+    table = pyarrow.parquet.read_table(io.BytesIO(export('parquet', transactions())))
+    
+    assert table.column('hash').to_pylist() == ['0x1', '0x2']
+    assert table.column('amount').to_pylist() == [Decimal('0.1'), Decimal('12345678901.123456789012345678')]
+    assert table.column('token').to_pylist() == ['ETH', 'USDT']
+    assert table.column('fee').to_pylist()[0] == pytest.approx(21000 * 2 / 1e9)
+    
+    metadata = read_statement_metadata(table.schema)
+    assert metadata['opening_balance'] == {'ETH': '1.5'}
+    assert metadata['closing_balance'] == {'ETH': '2'}
+
+
+def test_arrow_stream_round_trips():
+    table = pyarrow.ipc.open_stream(export('arrow', transactions())).read_all()
+    
+    assert table.num_rows == 2
+    assert read_statement_metadata(table.schema)['end_date'] == '2025-01-31'
+
+
+def test_amount_beyond_the_column_fails_the_export():
+    rows = [{'timestamp': 1700000000, 'hash': '0x1', 'amount': Decimal('1e21')}]
+    
+    with pytest.raises(ValueError):
+        export('parquet', rows)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        export('feather', [])
@@ -0,0 +1,81 @@
+"""LTTB downsampling of balance series"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from database_service import _exact_decimal, _exact_sum, downsample_lttb, fill_balance_series, fill_flow_statistics
+
+
+def test_short_series_are_returned_unchanged():
+    points = [(1, 1), (2, 2), (3, 3)]
+    
+    assert downsample_lttb(points, 10) == points
+    assert downsample_lttb(points, 2) == points
+
+
+def test_keeps_the_ends_and_the_peak():
+    points = [(x, 0) for x in range(100)]
+    points[57] = (57, 1000)
+    
+    sampled = downsample_lttb(points, 10)
+    
+    assert len(sampled) == 10
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert (57, 1000) in sampled
+    assert [x for x, _ in sampled] == sorted(x for x, _ in sampled)
+
+
+def test_returns_the_original_point_objects():
+    start = datetime(2025, 1, 1)
+    points = [(start + timedelta(hours=i), Decimal(i % 7)) for i in range(50)]
+    # x values are converted for the geometry only
+    sampled = downsample_lttb([(x.timestamp(), y) for x, y in points], 5)
+    
+    assert all(isinstance(y, Decimal) for _, y in sampled)
+    assert len(sampled) == 5
+
+
+def test_series_are_downsampled_per_asset():
+    start = datetime(2025, 1, 1)
+    rows = [{'asset': 'ETH', 'bucket': start + timedelta(days=i), 'balance': '%d.5' % (i % 9)} for i in range(40)]
+    rows[23]['balance'] = '1000.000000000000000000000000000001'
+    rows += [{'asset': 'USDC', 'bucket': start + timedelta(days=i), 'balance': '12.50'} for i in (0, 30)]
+    result = {'series': {}, 'points_before_downsampling': {}}
+    
+    fill_balance_series(result, rows, 8)
+    
+    assert result['points_before_downsampling'] == {'ETH': 40, 'USDC': 2}
+    eth = result['series']['ETH']
+    assert len(eth) == 8
+    assert eth[0]['date'] == '2025-01-01' and eth[-1]['date'] == '2025-02-09'
+    assert {'date': '2025-01-24', 'balance': Decimal('1000.000000000000000000000000000001')} in eth
+    assert result['series']['USDC'] == [
+        {'date': '2025-01-01', 'balance': Decimal('12.5')},
+        {'date': '2025-01-31', 'balance': Decimal('12.5')},
+    ]
+
+# 35 integer digits: more than the default decimal context's 28 significant digits
+WIDE = '12345678901234567890123456789012345.12345678901234567890123456789'
+WIDE_TWICE = '24691357802469135780246913578024690.24691357802469135780246913578'
+
+
+def test_exact_sums_keep_every_digit_of_wide_decimals():
+    assert str(_exact_decimal(WIDE)) == WIDE
+    assert str(_exact_sum(WIDE, WIDE)) == WIDE_TWICE
+    assert str(_exact_sum(WIDE, '1e-29', '-' + WIDE)) == '1E-29'
+
+
+def test_flow_statistics_are_exact():
+    statistics = {'buckets': [], 'totals': {}, 'transaction_types': {}, 'total_transactions': 0}
+    row = {
+        'bucket': datetime(2025, 1, 1), 'network': 'eth-mainnet', 'asset': 'ETH', 'category': 'external',
+        'inflow': WIDE, 'outflow': '1e-29', 'incoming_count': 1, 'outgoing_count': 1,
+        'usd_inflow': None, 'usd_outflow': None
+    }
+    
+    fill_flow_statistics(statistics, [row, dict(row, category='erc20')])
+    
+    totals = statistics['totals']['ETH']
+    assert str(totals['inflow']) == WIDE_TWICE
+    assert str(totals['net']) == '24691357802469135780246913578024690.24691357802469135780246913576'
+    assert statistics['total_transactions'] == 4
@@ -0,0 +1,203 @@
+"""Incremental fetches used by the account monitor (no network access)"""
+
+import pytest
+
+from blockchain_service import BlockchainService
+
+ADDRESS = '0x' + 'ab' * 20
+
+
+def normal_tx(block, n=0):
+    return {
+        'hash': f'0x{block:x}{n:04x}', 'timeStamp': str(1700000000 + block), 'blockNumber': str(block),
+        'from': '0x' + 'cd' * 20, 'to': ADDRESS, 'value': str(10 ** 18), 'isError': '0',
+        'gasUsed': '21000', 'gasPrice': '1000000000', 'confirmations': '1'
+    }
+
+
+class FakeEtherscan:
+    """Answers fetch_with_retry by action, recording the URLs asked for"""
+    
+    def __init__(self, head=500, **answers):
+        self.head = head
+        self.answers = answers
+        self.urls = []
+    
+    def __call__(self, url, max_retries=3):
+        self.urls.append(url)
+        if 'action=eth_blockNumber' in url:
+            if self.head is None:
+                return {'status': '0', 'result': [], 'message': 'Max retries exceeded'}
+            return {'jsonrpc': '2.0', 'id': 83, 'result': hex(self.head)}
+        action = url.split('action=')[1].split('&')[0]
+        return self.answers.get(action, {'status': '0', 'message': 'No transactions found', 'result': []})
+
+
+@pytest.fixture
+def service():
+    return BlockchainService(api_key='test')
+
+
+def test_no_transactions_found_is_an_empty_action(service):
+    service.fetch_with_retry = FakeEtherscan(txlist={'status': '1', 'message': 'OK', 'result': [normal_tx(450)]})
+    
+    data = service.get_evm_transactions_since(ADDRESS, 1, start_block=400)
+    
+    assert data['success']
+    assert [tx['blockNumber'] for tx in data['transactions']] == [450]
+    assert data['latest_block'] == 500
+
+
+def test_exhausted_retries_fail_the_poll(service):
+    # fetch_with_retry reports a transport failure as status 0 with an empty list
+    service.fetch_with_retry = FakeEtherscan(
+        txlist={'status': '1', 'message': 'OK', 'result': [normal_tx(450)]},
+        tokentx={'status': '0', 'result': [], 'message': 'Connection reset by peer'}
+    )
+    
+    data = service.get_evm_transactions_since(ADDRESS, 1, start_block=400)
+    
+    assert not data['success']
+    assert 'tokentx' in data['error']
+    assert 'latest_block' not in data
+
+
+def test_rate_limit_answer_fails_the_poll(service):
+    service.fetch_with_retry = FakeEtherscan(
+        txlistinternal={'status': '0', 'message': 'NOTOK', 'result': 'Max rate limit reached'}
+    )
+    
+    assert not service.get_evm_transactions_since(ADDRESS, 1, start_block=400)['success']
+
+
+def test_unknown_head_fails_the_poll(service):
+    service.fetch_with_retry = FakeEtherscan(head=None)
+    
+    assert not service.get_evm_transactions_since(ADDRESS, 1)['success']
+
+
+def test_truncated_action_holds_the_watermark_back(service, monkeypatch):
+    monkeypatch.setattr(BlockchainService, 'ETHERSCAN_MAX_RESULTS', 3)
+    service.fetch_with_retry = FakeEtherscan(
+        txlist={'status': '1', 'message': 'OK', 'result': [normal_tx(410), normal_tx(420), normal_tx(430)]},
+        txlistinternal={'status': '1', 'message': 'OK', 'result': [normal_tx(490)]}
+    )
+    
+    data = service.get_evm_transactions_since(ADDRESS, 1, start_block=400)
+    
+    assert data['success']
+    # txlist may have more rows in block 430 and after; resume there
+    assert data['latest_block'] == 430
+
+
+def test_actions_are_bounded_by_the_head_block(service):
+    fake = FakeEtherscan(head=777)
+    service.fetch_with_retry = fake
+    
+    service.get_evm_transactions_since(ADDRESS, 1, start_block=5)
+    
+    account_urls = [url for url in fake.urls if 'module=account' in url]
+    assert len(account_urls) == 3
+    assert all('startblock=5' in url and 'endblock=777' in url for url in account_urls)
+
+
+class FakeSolanaRpc:
+    """getSignaturesForAddress over signatures s0 (oldest) .. s{n-1} (newest)"""
+    
+    def __init__(self, count):
+        self.signatures = [
+            {'signature': f's{i}', 'blockTime': 1700000000 + i, 'err': None} for i in range(count)
+        ][::-1]
+        self.looked_up = []
+        # Signatures getTransaction answers with result null (not at the node's commitment yet)
+        self.unavailable = set()
+    
+    def __call__(self, url, json, timeout):
+        method, params = json['method'], json['params']
+        if method == 'getSignaturesForAddress':
+            options = params[1]
+            rows = self.signatures
+            if 'before' in options:
+                rows = rows[[sig['signature'] for sig in rows].index(options['before']) + 1:]
+            if 'until' in options:
+                names = [sig['signature'] for sig in rows]
+                rows = rows[:names.index(options['until'])] if options['until'] in names else rows
+            return FakeResponse(rows[:options['limit']])
+        self.looked_up.append(params[0])
+        return FakeResponse(None if params[0] in self.unavailable else {'signature': params[0]})
+
+
+class FakeResponse:
+    def __init__(self, result):
+        self.result = result
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return {'result': self.result}
+
+
+def test_solana_backlog_is_worked_off_without_gaps(service, monkeypatch):
+    rpc = FakeSolanaRpc(2500)
+    monkeypatch.setattr('blockchain_service.requests.post', rpc)
+    service.rate_limiter.wait_if_needed = lambda: None
+    service._parse_solana_tx = lambda tx, address, signature: {'hash': signature, 'timestamp': 1}
+    
+    first = service.get_solana_transactions_since('wallet', 's99', max_signatures=1000)
+    assert rpc.looked_up[0] == 's100'
+    assert first['latest_signature'] == 's1099'
+    assert first['has_more']
+    
+    second = service.get_solana_transactions_since('wallet', first['latest_signature'], max_signatures=1000)
+    third = service.get_solana_transactions_since('wallet', second['latest_signature'], max_signatures=1000)
+    
+    assert rpc.looked_up == [f's{i}' for i in range(100, 2500)]
+    assert third['latest_signature'] == 's2499'
+    assert not third['has_more']
+
+
+def test_solana_first_poll_honours_the_lookback(service, monkeypatch):
+    rpc = FakeSolanaRpc(3000)
+    monkeypatch.setattr('blockchain_service.requests.post', rpc)
+    service.rate_limiter.wait_if_needed = lambda: None
+    service._parse_solana_tx = lambda tx, address, signature: {'hash': signature, 'timestamp': 1}
+    
+    data = service.get_solana_transactions_since('wallet', None, since_timestamp=1700000000 + 2800)
+    
+    assert rpc.looked_up == [f's{i}' for i in range(2800, 3000)]
+    assert data['latest_signature'] == 's2999'
+
+
+def test_solana_batch_stops_before_an_unavailable_transaction(service, monkeypatch):
+    rpc = FakeSolanaRpc(10)
+    rpc.unavailable = {'s5'}
+    monkeypatch.setattr('blockchain_service.requests.post', rpc)
+    service.rate_limiter.wait_if_needed = lambda: None
+    service._parse_solana_tx = lambda tx, address, signature: {'hash': signature, 'timestamp': 1}
+    
+    first = service.get_solana_transactions_since('wallet', 's2')
+    
+    assert [tx['hash'] for tx in first['transactions']] == ['s3', 's4']
+    assert first['latest_signature'] == 's4'
+    assert first['has_more']
+    
+    rpc.unavailable = set()
+    second = service.get_solana_transactions_since('wallet', first['latest_signature'])
+    
+    assert [tx['hash'] for tx in second['transactions']] == ['s5', 's6', 's7', 's8', 's9']
+    assert second['latest_signature'] == 's9'
+    assert not second['has_more']
+
+
+def test_solana_watermark_holds_when_the_first_transaction_is_unavailable(service, monkeypatch):
+    rpc = FakeSolanaRpc(5)
+    rpc.unavailable = {'s3'}
+    monkeypatch.setattr('blockchain_service.requests.post', rpc)
+    service.rate_limiter.wait_if_needed = lambda: None
+    service._parse_solana_tx = lambda tx, address, signature: {'hash': signature, 'timestamp': 1}
+    
+    data = service.get_solana_transactions_since('wallet', 's2')
+    
+    assert data['transactions'] == []
+    assert data['latest_signature'] == 's2'
@@ -0,0 +1,83 @@
+"""Pooled connection checkout (the MySQL pool is faked)"""
+
+import database_service
+from database_service import DatabaseService
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+    
+    def execute(self, query, params=None):
+        self.connection.statements.append((query, params))
+    
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, connection_id):
+        self.connection_id = connection_id
+        self.statements = []
+        self.pings = 0
+        self.unread_result = False
+    
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.pings += 1
+    
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+    
+    def is_connected(self):
+        return True
+    
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, **config):
+        self.config = config
+        self.connection = FakeConnection(7)
+    
+    def get_connection(self):
+        return self.connection
+
+
+def make_database(monkeypatch, **settings):
+    monkeypatch.setattr(database_service.pooling, 'MySQLConnectionPool', FakePool)
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db', statement_timeout_ms=5000, **settings)
+    assert database.connect()
+    return database
+
+
+def test_statement_timeout_is_set_once_per_session(monkeypatch):
+    database = make_database(monkeypatch)
+    connection = database.pool.connection
+    
+    assert database.pool.config['init_command'] == 'SET SESSION MAX_EXECUTION_TIME = 5000'
+    with database.get_connection():
+        pass
+    with database.get_connection(statement_timeout_ms=5000):
+        pass
+    assert connection.statements == []
+    
+    # Overrides are set on checkout; the session reset on return restores the default
+    with database.get_connection(statement_timeout_ms=0):
+        pass
+    assert connection.statements == [('SET SESSION MAX_EXECUTION_TIME = %s', (0,))]
+
+
+def test_connections_are_pinged_only_after_idling(monkeypatch):
+    database = make_database(monkeypatch, ping_after_idle=60)
+    connection = database.pool.connection
+    pings = connection.pings
+    
+    with database.get_connection():
+        pass
+    assert connection.pings == pings
+    
+    database._returned_at[connection.connection_id] -= 61
+    with database.get_connection():
+        pass
+    assert connection.pings == pings + 1
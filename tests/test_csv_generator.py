@@ -0,0 +1,84 @@
+"""Streaming CSV statements"""
+
+import gzip
+from decimal import Decimal
+
+from csv_generator import CSVGenerator
+
+
+def transactions(count=3):
+    return [
+        {'timestamp': 1700000000 + i, 'hash': f'0x{i}', 'type': 'Transfer', 'direction': 'in' if i % 2 else 'out',
+         'from': 'a', 'to': 'b', 'amount': Decimal('0.5') * i, 'tokenSymbol': 'ETH', 'blockNumber': i}
+        for i in range(count)
+    ]
+
+
+def statement(chunks):
+    # The Generated line is the only part that depends on the clock
+    return [line for line in b''.join(chunks).decode('utf-8').splitlines() if not line.startswith('Generated')]
+
+
+def stream(rows, **kwargs):
+    return CSVGenerator().stream_transaction_csv(
+        'a', 'ethereum', rows, 1, 2, 'ETH', start_date='2025-01-01', end_date='2025-01-31', **kwargs
+    )
+
+
+def test_stream_matches_the_whole_file():
+    whole = CSVGenerator().generate_transaction_csv(
+        'a', 'ethereum', transactions()[::-1], 1, 2, 'ETH', start_date='2025-01-01', end_date='2025-01-31'
+    )
+    
+    assert statement(stream(transactions()[::-1])) == statement([whole.encode('utf-8')])
+
+
+def test_gzip_body_holds_the_same_csv():
+    assert statement([gzip.decompress(b''.join(stream(transactions(), compress=True)))]) == \
+        statement(stream(transactions()))
+
+
+def test_iterators_are_consumed_chunk_by_chunk():
+    consumed = []
+    
+    def rows():
+        for tx in transactions(10):
+            consumed.append(tx['hash'])
+            yield tx
+    
+    chunks = stream(rows(), presorted=True, rows_per_chunk=4)
+    next(chunks)
+    assert consumed == []
+    next(chunks)
+    assert len(consumed) == 4
+    
+    lines = statement([b''] + list(chunks))
+    assert 'Total Transactions,10' in lines
+    assert 'Incoming Transactions,5' in lines
+
+
+def test_large_amounts_and_token_balances_are_exact():
+    rows = [dict(transactions(1)[0], amount=Decimal('12345678901.123456789'))]
+    lines = statement(CSVGenerator().stream_transaction_csv(
+        'a', 'ethereum', rows, 0, 0, None,
+        opening_token_balances={'USDC': {'balance': Decimal('98765432109.87654321')}},
+        current_token_balances={'USDC': {'balance': Decimal('1e10')}},
+        start_date='2025-01-01', end_date='2025-01-31', presorted=True
+    ))
+    
+    assert 'USDC,98765432109.87654321' in lines
+    assert 'USDC,10000000000.00000000' in lines
+    assert any(',12345678901.12345679,' in line for line in lines)
+
+
+def test_dates_are_utc_whatever_the_local_zone(monkeypatch):
+    import time
+    monkeypatch.setenv('TZ', 'Asia/Jakarta')
+    time.tzset()
+    try:
+        row = CSVGenerator()._transaction_row({'timestamp': 1735689599, 'hash': '0x1', 'amount': 1}, 'ETH')
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    
+    assert row[:2] == ['2024-12-31', '23:59:59']
@@ -0,0 +1,124 @@
+"""Stale-while-revalidate spot prices (CoinGecko and the rate API are faked)"""
+
+import threading
+import time
+
+import pytest
+
+from currency_service import CurrencyExchangeService
+from price_cache import PriceCache
+from price_history import PriceHistoryStore
+
+
+class FakeUpstream:
+    """Stands in for the CoinGecko and exchange-rate requests of one service"""
+    
+    def __init__(self, service, price=2000.0, rate=3.6725):
+        self.service = service
+        self.price = price
+        self.rate = rate
+        self.calls = []
+        self.rate_calls = 0
+        self.release = threading.Event()
+        self.release.set()
+    
+    def fetch_prices(self, symbols):
+        self.calls.append(list(symbols))
+        self.release.wait(5)
+        for symbol in symbols:
+            self.service.cache[f"{symbol}_price"] = {
+                'prices': {'usd': self.price, 'aed': self.price * self.service.usd_to_aed_rate},
+                'timestamp': time.time()
+            }
+    
+    def fetch_rate(self):
+        self.rate_calls += 1
+        self.service.usd_to_aed_rate = self.rate
+        return True
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = CurrencyExchangeService(
+        price_history=PriceHistoryStore(str(tmp_path / 'history'), background_loads=False),
+        price_cache=PriceCache(str(tmp_path / 'cache'))
+    )
+    service.upstream = FakeUpstream(service)
+    service._fetch_from_coingecko = service.upstream.fetch_prices
+    service._fetch_live_usd_aed_rate = service.upstream.fetch_rate
+    service.usd_to_aed_rate = 3.5
+    service.cache['usd_aed_rate_timestamp'] = time.time()
+    return service
+
+
+def cache_price(service, symbol, usd, age):
+    service.cache[f"{symbol}_price"] = {'prices': {'usd': usd, 'aed': usd * 3.5}, 'timestamp': time.time() - age}
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_expired_price_is_served_and_refreshed_in_the_background(service):
+    cache_price(service, 'ETH', 1500.0, age=service.cache_duration + 1)
+    service.upstream.release.clear()
+    
+    # Returned without waiting for the (blocked) upstream call
+    assert service.get_crypto_prices(['ETH']) == {'ETH': {'usd': 1500.0, 'aed': 5250.0}}
+    assert wait_until(lambda: service.upstream.calls == [['ETH']])
+    assert service._refresher.name == 'price-refresher'
+    
+    service.upstream.release.set()
+    assert wait_until(lambda: service.get_crypto_prices(['ETH'])['ETH']['usd'] == 2000.0)
+
+
+def test_unknown_symbols_are_fetched_while_the_caller_waits(service):
+    assert service.get_crypto_prices(['SOL']) == {'SOL': {'usd': 2000.0, 'aed': 7000.0}}
+    assert service.upstream.calls == [['SOL']]
+    assert service._refresher is None
+
+
+def test_hot_symbols_are_refreshed_ahead_of_expiry(service):
+    cache_price(service, 'ETH', 1500.0, age=service.refresh_interval + 1)
+    cache_price(service, 'BTC', 1500.0, age=1)
+    cache_price(service, 'DOGE', 1500.0, age=service.refresh_interval + 1)
+    service.hot_symbols = 2
+    service._requested.update(['ETH', 'ETH', 'BTC', 'BTC', 'DOGE'])
+    service._stale.add('MATIC')
+    
+    service._refresh_due()
+    
+    # DOGE is close to expiry but not among the two most requested symbols
+    assert service.upstream.calls == [['ETH', 'MATIC']]
+    assert service._stale == set()
+
+
+def test_concurrent_fetches_of_a_symbol_make_one_upstream_call(service):
+    service.upstream.release.clear()
+    first = threading.Thread(target=service._fetch_prices, args=(['ETH'],))
+    first.start()
+    assert wait_until(lambda: service.upstream.calls == [['ETH']])
+    
+    second = threading.Thread(target=service._fetch_prices, args=(['ETH', 'BTC'],))
+    second.start()
+    assert wait_until(lambda: len(service.upstream.calls) == 2)
+    # The second fetch asks only for what is not already in flight, then waits for the rest
+    assert service.upstream.calls == [['ETH'], ['BTC']]
+    
+    service.upstream.release.set()
+    first.join(5)
+    second.join(5)
+    assert service.cache['ETH_price']['prices']['usd'] == 2000.0
+    assert service._inflight == {}
+
+
+def test_expired_rate_is_refreshed_in_the_background(service):
+    service.cache['usd_aed_rate_timestamp'] = time.time() - service.cache_duration - 1
+    
+    assert service.get_usd_to_aed_rate() == 3.5
+    assert wait_until(lambda: service.get_usd_to_aed_rate() == 3.6725)
+    assert service.upstream.rate_calls == 1
+    assert service.store.get('USD/AED')[0] == 3.6725
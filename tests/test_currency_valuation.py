@@ -0,0 +1,84 @@
+"""Vectorized valuation of transaction lists (prices are faked)"""
+
+import time
+
+import numpy as np
+import pytest
+
+from currency_service import CurrencyExchangeService
+from price_cache import PriceCache
+from price_history import to_epoch_days
+
+DAY = 86400
+
+
+class FakeHistory:
+    """USD price of a symbol on a day: a per-symbol base plus the day number"""
+    
+    BASE = {'ETH': 1000.0, 'USDC': 1.0}
+    
+    def __init__(self):
+        self.calls = []
+    
+    def lookup_symbols(self, symbols, days, fetch_missing=True):
+        self.calls.append(list(zip(symbols, np.asarray(days).astype(int).tolist())))
+        return np.array([
+            self.BASE[symbol] + day if symbol in self.BASE else np.nan
+            for symbol, day in zip(symbols, to_epoch_days(days).tolist())
+        ])
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = CurrencyExchangeService(price_history=FakeHistory(), price_cache=PriceCache(str(tmp_path / 'cache')))
+    service.usd_to_aed_rate = 3.5
+    service.cache['usd_aed_rate_timestamp'] = time.time()
+    return service
+
+
+def test_each_row_is_valued_at_its_own_day(service):
+    timestamps = [10 * DAY + 5, 10 * DAY + 600, 11 * DAY, 10 * DAY]
+    
+    values = service.value_transactions(['ETH', 'ETH', 'ETH', 'USDC'], [1, 2, 1, 100], timestamps)
+    
+    np.testing.assert_allclose(values['unit_price_usd'], [1010, 1010, 1011, 11])
+    np.testing.assert_allclose(values['usd'], [1010, 2020, 1011, 1100])
+    np.testing.assert_allclose(values['aed'], values['usd'] * 3.5)
+
+
+def test_prices_are_looked_up_once_per_symbol_and_day(service):
+    symbols = ['ETH', 'USDC'] * 500
+    timestamps = [(i % 3) * DAY for i in range(1000)]
+    
+    service.value_transactions(symbols, np.ones(1000), timestamps)
+    
+    (pairs,) = service.history.calls
+    assert len(pairs) == len(set(pairs)) == 6
+
+
+def test_unknown_symbols_are_nan(service):
+    values = service.value_transactions(['ETH', 'NOPE'], [1, 1], [0, 0])
+    
+    assert values['usd'][0] == 1000
+    assert np.isnan(values['usd'][1])
+
+
+def test_spot_valuation_without_timestamps(service):
+    requested = []
+    
+    def spot(symbols):
+        requested.append(symbols)
+        return {symbol: {'usd': {'ETH': 2000.0, 'USDC': 1.0}.get(symbol, 0)} for symbol in symbols}
+    service.get_crypto_prices = spot
+    
+    values = service.value_transactions(['ETH', 'USDC', 'ETH', 'NOPE'], [1, 10, 0.5, 3])
+    
+    assert requested == [['ETH', 'NOPE', 'USDC']]
+    np.testing.assert_allclose(values['usd'][:3], [2000, 10, 1000])
+    assert np.isnan(values['usd'][3])
+
+
+def test_empty_list(service):
+    values = service.value_transactions([], [], [])
+    
+    assert len(values['usd']) == 0
@@ -0,0 +1,275 @@
+"""Daily rollup coverage checks and maintenance (run against SQLite)"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from daily_balances import DailyBalanceService
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+    
+    def execute(self, query, params=None):
+        self.db.queries.append(' '.join(query.split()))
+        if 'FROM transaction_history' in query:
+            self.result = self.db.latest
+        elif 'FROM daily_balances_watermark' in query:
+            self.result = self.db.watermarks
+        else:
+            self.result = self.db.rollup
+    
+    def fetchall(self):
+        return self.result
+    
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self, latest, watermarks, rollup=None):
+        self.latest = latest
+        self.watermarks = watermarks
+        self.rollup = rollup or [{'asset': 'USDT', 'running_balance': Decimal('5'), 'running_count': 2}]
+        self.queries = []
+    
+    @contextmanager
+    def get_connection(self):
+        db = self
+        
+        class Connection:
+            def cursor(self, dictionary=False):
+                return FakeCursor(db)
+        
+        yield Connection()
+
+
+def test_lookup_does_not_scan_the_history():
+    db = FakeDatabase(
+        latest=[{'network': 'ethereum', 'latest': datetime(2025, 1, 3, 12)}],
+        watermarks=[{'network': 'ethereum', 'last_timestamp': datetime(2025, 1, 3, 12)}]
+    )
+    
+    assert DailyBalanceService(db).get_balances_at('w', '2025-01-02') == ({'USDT': Decimal('5')}, 2)
+    history_queries = [q for q in db.queries if 'FROM transaction_history' in q]
+    assert history_queries == [
+        'SELECT network, MAX(timestamp) AS latest FROM transaction_history WHERE walletId = %s GROUP BY network'
+    ]
+    assert not any('COUNT(' in q for q in db.queries)
+
+
+def test_rows_beyond_the_watermark_only_matter_up_to_the_day():
+    db = FakeDatabase(
+        latest=[{'network': 'ethereum', 'latest': datetime(2025, 1, 9)}],
+        watermarks=[{'network': 'ethereum', 'last_timestamp': datetime(2025, 1, 3, 12)}]
+    )
+    service = DailyBalanceService(db)
+    
+    assert service.get_balances_at('w', '2025-01-02') is not None
+    # The unfolded rows may fall on or before these days
+    assert service.get_balances_at('w', '2025-01-03') is None
+    assert service.get_balances_at('w', '2025-01-05') is None
+
+
+def test_unrolled_networks_fall_back():
+    watermarks = [{'network': 'ethereum', 'last_timestamp': datetime(2025, 1, 3)}]
+    
+    # A network that was never refreshed
+    db = FakeDatabase(
+        latest=[
+            {'network': 'ethereum', 'latest': datetime(2025, 1, 3)},
+            {'network': 'tron', 'latest': datetime(2025, 1, 1)},
+        ],
+        watermarks=watermarks
+    )
+    assert DailyBalanceService(db).get_balances_at('w', '2025-01-05') is None
+    
+    # Rows without a network are never rolled up
+    db = FakeDatabase(
+        latest=[
+            {'network': 'ethereum', 'latest': datetime(2025, 1, 3)},
+            {'network': None, 'latest': datetime(2025, 1, 1)},
+        ],
+        watermarks=watermarks
+    )
+    assert DailyBalanceService(db).get_balances_at('w', '2025-01-05') is None
+    
+    # No history at all
+    assert DailyBalanceService(FakeDatabase(latest=[], watermarks=[])).get_balances_at('w', '2025-01-05') is None
+
+
+# (timestamp, asset, value, direction, network); amounts are exact in binary
+HISTORY = [
+    ('2025-01-02 10:00:00', 'ETH', '2.5', 'incoming', 'eth-mainnet'),
+    ('2025-01-02 18:00:00', 'ETH', '0.25', 'outgoing', 'eth-mainnet'),
+    ('2025-01-04 09:00:00', 'USDC', '100', 'incoming', 'polygon-mainnet'),
+    ('2025-01-06 09:00:00', 'ETH', '1', 'incoming', 'eth-mainnet'),
+    ('2025-01-08 09:00:00', 'USDC', '40', 'outgoing', 'polygon-mainnet'),
+    ('2025-01-09 09:00:00', 'ETH', '0.5', 'outgoing', 'eth-mainnet'),
+]
+
+DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _to_mysql(value):
+    """DATETIME and DATE results as mysql.connector returns them"""
+    if isinstance(value, str) and DATETIME.match(value):
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str) and DATE.match(value):
+        return date.fromisoformat(value)
+    return value
+
+
+def _to_sqlite(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class SqliteCursor:
+    """The parts of a mysql.connector dictionary cursor the rollup uses"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.sqlite.cursor()
+    
+    def _translate(self, query):
+        query = ' '.join(query.split())
+        self.connection.queries.append(query)
+        query = query.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+        return re.sub(r'VALUES\((\w+)\)', r'excluded.\1', query).replace('%s', '?')
+    
+    def execute(self, query, params=()):
+        self.cursor.execute(self._translate(query), [_to_sqlite(param) for param in params])
+    
+    def executemany(self, query, values):
+        self.cursor.executemany(self._translate(query), [[_to_sqlite(param) for param in row] for row in values])
+    
+    def _row(self, row):
+        return {column[0]: _to_mysql(value) for column, value in zip(self.cursor.description, row)}
+    
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return self._row(row) if row else None
+    
+    def fetchall(self):
+        return [self._row(row) for row in self.cursor.fetchall()]
+    
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self):
+        self.sqlite = sqlite3.connect(':memory:')
+        self.sqlite.create_function('NOW', 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        self.sqlite.execute(
+            "CREATE TABLE transaction_history (walletId, hash, timestamp, asset, value, direction, network)"
+        )
+        self.queries = []
+        for row in HISTORY:
+            self.insert(*row)
+    
+    def insert(self, timestamp, asset, value, direction, network, wallet_id='w1'):
+        self.sqlite.execute(
+            "INSERT INTO transaction_history VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (wallet_id, f"h{timestamp}{asset}", timestamp, asset, value, direction, network)
+        )
+    
+    def cursor(self, dictionary=False):
+        return SqliteCursor(self)
+    
+    def commit(self):
+        self.sqlite.commit()
+
+
+class SqliteDatabase:
+    def __init__(self):
+        self.connection = SqliteConnection()
+    
+    @contextmanager
+    def get_connection(self):
+        yield self.connection
+
+
+def expected_balances(connection, day):
+    """Balance per asset at the close of day, summed straight from the history"""
+    rows = connection.sqlite.execute(
+        "SELECT asset, value, direction FROM transaction_history WHERE walletId = 'w1' AND timestamp < ?",
+        (f"{day} 24",)
+    ).fetchall()
+    balances = {}
+    for asset, value, direction in rows:
+        amount = Decimal(value) if direction == 'incoming' else -Decimal(value)
+        balances[asset] = balances.get(asset, Decimal(0)) + amount
+    return balances, len(rows)
+
+
+@pytest.fixture
+def rollup():
+    rollup = DailyBalanceService(SqliteDatabase())
+    rollup.ensure_schema()
+    return rollup
+
+
+@pytest.mark.parametrize('day', ['2025-01-02', '2025-01-05', '2025-01-08', '2025-01-31'])
+def test_refresh_matches_the_history(rollup, day):
+    stats = rollup.refresh()
+    
+    assert stats == {'pairs_checked': 2, 'pairs_updated': 2, 'pairs_rebuilt': 0, 'rows_processed': len(HISTORY)}
+    assert rollup.get_balances_at('w1', day) == expected_balances(rollup.db.connection, day)
+
+
+def test_refresh_only_folds_new_rows(rollup):
+    connection = rollup.db.connection
+    rollup.refresh()
+    
+    # A second row on the watermark's day extends that day's bucket
+    connection.insert('2025-01-09 20:00:00', 'ETH', '2', 'incoming', 'eth-mainnet')
+    connection.insert('2025-01-12 09:00:00', 'ETH', '4', 'incoming', 'eth-mainnet')
+    assert rollup.refresh()['rows_processed'] == 2
+    
+    assert rollup.get_balances_at('w1', '2025-01-09') == expected_balances(connection, '2025-01-09')
+    assert rollup.get_balances_at('w1', '2025-01-31') == expected_balances(connection, '2025-01-31')
+
+
+def test_rows_behind_the_watermark_rebuild_the_pair(rollup):
+    connection = rollup.db.connection
+    rollup.refresh()
+    # Written behind the watermark without going through observe()
+    connection.insert('2025-01-03 09:00:00', 'ETH', '8', 'incoming', 'eth-mainnet')
+    
+    stats = rollup.refresh()
+    assert stats['pairs_rebuilt'] == 1 and stats['rows_processed'] == 5
+    assert rollup.get_balances_at('w1', '2025-01-31') == expected_balances(connection, '2025-01-31')
+
+
+def test_observe_rewinds_to_the_day_of_the_oldest_row(rollup):
+    connection = rollup.db.connection
+    rollup.refresh()
+    connection.insert('2025-01-06 07:00:00', 'ETH', '8', 'incoming', 'eth-mainnet')
+    connection.insert('2025-01-10 07:00:00', 'USDC', '1', 'incoming', 'polygon-mainnet')
+    connection.queries.clear()
+    
+    rollup.observe('w1', '0xabc', [
+        {'network': 'eth-mainnet', 'timestamp': datetime(2025, 1, 6, 7)},
+        {'network': 'polygon-mainnet', 'timestamp': datetime(2025, 1, 10, 7)},
+        {'network': None, 'timestamp': datetime(2025, 1, 1)},
+    ])
+    
+    # Only eth-mainnet is behind its watermark, and only its days from Jan 6 are recomputed
+    deletes = [query for query in connection.queries if query.startswith('DELETE')]
+    assert deletes == ['DELETE FROM daily_balances WHERE walletId = %s AND network = %s AND day >= %s']
+    for day in ('2025-01-05', '2025-01-06', '2025-01-10'):
+        assert rollup.get_balances_at('w1', day) == expected_balances(connection, day)
@@ -0,0 +1,165 @@
+"""Database-backed statement exports (the database service is faked)"""
+
+import csv
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from mysql.connector import Error
+
+from database_service import DatabaseService
+
+
+@pytest.fixture
+def client(backend_app, monkeypatch):
+    database = backend_app.database_service
+    monkeypatch.setattr(database, 'is_connected', lambda: True)
+    monkeypatch.setattr(database, 'get_wallet_id', lambda address, strict=False: 'wallet-1')
+    # Missing prices would otherwise be queued for CoinGecko
+    monkeypatch.setattr(backend_app.currency_service.history, 'background_loads', False)
+    return backend_app.app.test_client()
+
+
+def period_row(amount, usd_value=None, token_symbol='USDC'):
+    return {
+        'transaction_date': datetime(2025, 1, 2, 3, 4, 5), 'transaction_hash': '0x1', 'transaction_type': 'erc20',
+        'direction': 'incoming', 'from_address': 'a', 'to_address': 'b', 'amount': amount,
+        'token_symbol': token_symbol, 'usd_value': usd_value
+    }
+
+
+def test_failed_statement_is_an_error_not_empty_balances(backend_app, client, monkeypatch):
+    def failing(*args, **kwargs):
+        raise Error('Lost connection to MySQL server during query')
+    monkeypatch.setattr(backend_app.database_service, 'get_statement', failing)
+    
+    for export_format in ('csv', 'xlsx'):
+        response = client.get(f'/api/export-csv-db/0xabc?start_date=2025-01-01&format={export_format}')
+        assert response.status_code == 500
+        assert 'Lost connection' in response.get_json()['error']
+
+
+def test_unreachable_database_is_503(backend_app, client, monkeypatch):
+    monkeypatch.setattr(backend_app.database_service, 'is_connected', lambda: False)
+    
+    assert client.get('/api/export-csv-db/0xabc?start_date=2025-01-01').status_code == 503
+
+
+def test_failed_wallet_lookup_is_503(backend_app, client, monkeypatch):
+    def failing(address, strict=False):
+        raise Error('Too many connections')
+    monkeypatch.setattr(backend_app.database_service, 'get_wallet_id', failing)
+    
+    assert client.get('/api/export-csv-db/0xabc?start_date=2025-01-01').status_code == 503
+
+
+def test_amounts_from_the_cursor_are_exported_exactly(backend_app, client, monkeypatch):
+    database = backend_app.database_service
+    resolved = []
+    monkeypatch.setattr(database, 'get_statement', lambda *args, wallet_id=None, **kwargs: resolved.append(wallet_id) or {
+        'end_date': '2025-01-31', 'opening_balance': {'USDC': Decimal('1')}, 'closing_balance': {'USDC': Decimal('2')}
+    })
+    # MySQL may return DECIMAL columns as strings
+    monkeypatch.setattr(database, 'iter_transactions_in_period', lambda *args, wallet_id=None, **kwargs: resolved.append(wallet_id) or iter([
+        period_row('12345678901.123456789'), period_row(None)
+    ]))
+    
+    response = client.get('/api/export-csv-db/0xabc?start_date=2025-01-01')
+    lines = response.get_data(as_text=True).splitlines()
+    
+    assert response.status_code == 200
+    assert any(',12345678901.12345679,' in line for line in lines)
+    assert any(',0.00000000,' in line for line in lines)
+    assert resolved == ['wallet-1', 'wallet-1']
+
+
+def test_rows_are_valued_in_usd_without_fetching_prices(backend_app, client, monkeypatch):
+    database = backend_app.database_service
+    monkeypatch.setattr(database, 'get_statement', lambda *args, **kwargs: {
+        'end_date': '2025-01-31', 'opening_balance': {}, 'closing_balance': {}
+    })
+    monkeypatch.setattr(database, 'iter_transactions_in_period', lambda *args, **kwargs: iter([
+        period_row('2', usd_value=Decimal('7.25')), period_row('3'), period_row('1', token_symbol='NOPE')
+    ]))
+    lookups = []
+    
+    def lookup_symbols(symbols, timestamps, fetch_missing=False):
+        lookups.append(fetch_missing)
+        return np.array([0.5 if symbol == 'USDC' else np.nan for symbol in symbols])
+    monkeypatch.setattr(backend_app.currency_service.history, 'lookup_symbols', lookup_symbols)
+    
+    lines = client.get('/api/export-csv-db/0xabc?start_date=2025-01-01').get_data(as_text=True).splitlines()
+    header = lines.index('TRANSACTION HISTORY') + 1
+    rows = list(csv.reader(lines[header + 1:header + 4]))
+    
+    assert lines[header].endswith(',Value (USD)')
+    # Stored value kept, missing one priced at its day, unknown token left empty
+    assert [row[-1] for row in rows] == ['7.25', '1.50', '']
+    assert lookups == [False]
+
+
+def test_xlsx_headers_are_sent_before_the_workbook_is_built(backend_app):
+    built = []
+    
+    def failing_write(*args, **kwargs):
+        built.append(1)
+        raise RuntimeError('disk full')
+    generator = backend_app.XLSXGenerator()
+    generator.write_statement = failing_write
+    
+    with backend_app.app.test_request_context():
+        response = backend_app._statement_download(generator.stream_statement('0xabc', 'eth', [], {}, {}), 'f', 'xlsx')
+        
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'] == 'attachment; filename="f.xlsx"'
+        assert built == []
+        # A failure while writing aborts the body
+        with pytest.raises(RuntimeError):
+            b''.join(response.response)
+        assert built == [1]
+
+
+def test_statistics_and_series_are_json_numbers(backend_app, client, monkeypatch):
+    database = backend_app.database_service
+    monkeypatch.setattr(database, 'get_statement', lambda *args, **kwargs: {
+        'opening_date': '2025-01-01', 'end_date': '2025-01-31', 'transactions': [], 'transactions_counted_for_opening': 0,
+        'opening_balance': {}, 'closing_balance': {}, 'period_change': {}
+    })
+    amounts = {'inflow': Decimal('5'), 'outflow': Decimal('1.2'), 'net': Decimal('3.8'),
+               'usd_inflow': Decimal('15000'), 'usd_outflow': Decimal('3600'), 'incoming_count': 3, 'outgoing_count': 1}
+    monkeypatch.setattr(database, 'get_flow_statistics', lambda *args, **kwargs: {
+        'interval': 'month', 'transaction_types': {'external': 4}, 'total_transactions': 4,
+        'buckets': [dict(amounts, period='2025-01-01', network='eth-mainnet', asset='ETH', transaction_types={'external': 4})],
+        'totals': {'ETH': dict(amounts)}
+    })
+    monkeypatch.setattr(database, 'get_balance_series', lambda *args, **kwargs: {
+        'start_date': '2025-01-01', 'end_date': '2025-01-31', 'interval': 'day', 'points_before_downsampling': {'ETH': 1},
+        'series': {'ETH': [{'date': '2025-01-02', 'balance': Decimal('3.8')}]}
+    })
+    
+    statistics = client.get('/api/analyze-db/0xabc?start_date=2025-01-01').get_json()['statistics']
+    assert statistics['buckets'][0]['net'] == 3.8 and statistics['buckets'][0]['incoming_count'] == 3
+    assert statistics['totals']['ETH']['usd_inflow'] == 15000
+    assert statistics['buckets'][0]['period'] == '2025-01-01'
+    
+    series = client.get('/api/balance-series-db/0xabc?start_date=2025-01-01').get_json()['series']
+    assert series == {'ETH': [{'date': '2025-01-02', 'balance': 3.8}]}
+
+
+def test_get_statement_raises_when_the_database_fails():
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    database.pool = object()
+    database.get_wallet_id = lambda address: 'wallet-1'
+    
+    def failing(*args, **kwargs):
+        raise Error('Lost connection to MySQL server during query')
+    database.get_connection = failing
+    
+    with pytest.raises(Error):
+        database.get_statement('0xabc', '2025-01-01', '2025-01-31')
+
+
+def test_get_statement_raises_when_not_connected():
+    with pytest.raises(Error):
+        DatabaseService('127.0.0.1', 1, 'user', 'password', 'db').get_statement('0xabc', '2025-01-01')
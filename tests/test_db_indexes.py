@@ -0,0 +1,118 @@
+"""Index migrations and EXPLAIN-based plan checks (MySQL is faked)"""
+
+from contextlib import contextmanager
+
+from database_service import DatabaseService
+from db_indexes import apply_migrations, verify_query_plans
+
+INDEXED = {'table': 'transaction_history', 'type': 'range', 'key': 'idx_th_wallet_ts_cover', 'rows': 12,
+           'possible_keys': 'idx_th_wallet_ts_cover'}
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.result = []
+    
+    def execute(self, query, params=()):
+        query = ' '.join(query.split())
+        self.server.statements.append((query, params))
+        if query.startswith('EXPLAIN'):
+            assert query.count('%s') == len(params)
+            self.result = self.server.plan(query)
+        elif 'NON_UNIQUE = 0' in query:
+            self.result = [{'index_name': name, 'column_name': column}
+                           for name, columns in self.server.unique.items() for column in columns]
+        elif 'information_schema.STATISTICS' in query:
+            self.result = [{'index_name': name, 'column_name': column}
+                           for name, columns in self.server.indexes.items() for column in columns]
+        elif 'HAVING COUNT(*) > 1' in query:
+            self.result = [(self.server.duplicates,)]
+    
+    def fetchall(self):
+        return self.result
+    
+    def fetchone(self):
+        return self.result[0]
+    
+    def close(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self, indexes=None, unique=None, duplicates=0, plan=None):
+        self.indexes = indexes or {}
+        self.unique = unique or {}
+        self.duplicates = duplicates
+        self.plan = plan or (lambda query: [dict(INDEXED)])
+        self.statements = []
+    
+    def created(self):
+        return [query for query, _ in self.statements if query.startswith('CREATE')]
+
+
+def make_database(server):
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    
+    @contextmanager
+    def get_connection(statement_timeout_ms=None):
+        class Connection:
+            def cursor(self, dictionary=False):
+                return FakeCursor(server)
+            
+            def commit(self):
+                pass
+        
+        yield Connection()
+    
+    database.get_connection = get_connection
+    return database
+
+
+def test_every_statement_query_is_explained():
+    server = FakeServer()
+    
+    assert verify_query_plans(make_database(server), 'w1', '2025-01-01', '2025-01-31', 'eth-mainnet') == []
+    explained = [query for query, _ in server.statements if query.startswith('EXPLAIN')]
+    assert len(explained) == len(make_database(server).statement_queries('w1', '2025-01-01', '2025-01-31'))
+
+
+def test_full_scans_are_reported():
+    def plan(query):
+        if 'CRC32' in query:
+            return [dict(INDEXED, type='index')]
+        if 'GROUP BY walletId, asset' in query:
+            return [dict(INDEXED, type='ref', key=None)]
+        # Full scans of other tables in a plan are not the statement's concern
+        return [dict(INDEXED), {'table': 'wallets', 'type': 'ALL', 'key': None}]
+    
+    failures = verify_query_plans(make_database(FakeServer(plan=plan)), 'w1', '2025-01-01', '2025-01-31')
+    
+    assert [failure.split(':')[0] for failure in failures] == ['history_watermark', 'batch_statement_aggregate']
+
+
+def test_migrations_create_only_missing_indexes():
+    server = FakeServer(indexes={
+        'idx_th_wallet_keyset': ('walletId', 'timestamp', 'hash', 'asset', 'direction'),
+        # Same columns under another name counts as present
+        'legacy_cover': ('walletId', 'timestamp', 'network', 'asset', 'direction', 'value'),
+    })
+    
+    assert apply_migrations(make_database(server)) == ['idx_th_wallet_network_keyset', 'uq_th_wallet_hash_asset_direction']
+    assert server.created() == [
+        'CREATE INDEX `idx_th_wallet_network_keyset` ON `transaction_history` '
+        '(`walletId`, `network`, `timestamp`, `hash`, `asset`, `direction`)',
+        'CREATE UNIQUE INDEX `uq_th_wallet_hash_asset_direction` ON `transaction_history` '
+        '(`walletId`, `hash`, `asset`, `direction`)',
+    ]
+
+
+def test_unique_key_waits_for_duplicates_to_be_removed():
+    server = FakeServer(duplicates=3, indexes={
+        'idx_th_wallet_network_keyset': ('walletId', 'network', 'timestamp', 'hash', 'asset', 'direction'),
+        'idx_th_wallet_keyset': ('walletId', 'timestamp', 'hash', 'asset', 'direction'),
+        'idx_th_wallet_ts_cover': ('walletId', 'timestamp', 'network', 'asset', 'direction', 'value'),
+    })
+    
+    assert apply_migrations(make_database(server)) == []
+    assert server.created() == []
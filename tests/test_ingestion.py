@@ -0,0 +1,157 @@
+"""Transaction ingestion: wallet resolution per network and listener delivery"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database_service import DatabaseService
+from ingestion_service import TransactionIngestor
+
+
+class FakeCursor:
+    def __init__(self):
+        self.rowcount = 0
+    
+    def execute(self, query, params=None):
+        self.rowcount = 1
+    
+    def executemany(self, query, values):
+        self.rowcount = len(values)
+    
+    def fetchall(self):
+        return []
+    
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return FakeCursor()
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.lookups = []
+    
+    def get_wallet_id_for_network(self, address, network):
+        self.lookups.append((address, network))
+        return f"wallet-{network}"
+    
+    def get_table_structure(self, table):
+        return []
+    
+    @contextmanager
+    def get_connection(self):
+        yield FakeConnection()
+
+
+def transfer(tx_hash):
+    return {'hash': tx_hash, 'direction': 'in', 'timestamp': 1736496000, 'amount': '1', 'from': 'a', 'to': 'b'}
+
+
+def test_wallet_is_resolved_per_network():
+    db = FakeDatabase()
+    ingestor = TransactionIngestor(db, background_listeners=False)
+    received = []
+    ingestor.add_listener(lambda wallet_id, address, rows: received.append((wallet_id, rows[0]['walletId'])))
+    
+    ingestor.ingest('polygon', '0xAbc', [transfer('0x1')])
+    ingestor.ingest('ethereum', '0xAbc', [transfer('0x2')])
+    ingestor.ingest('polygon', '0xabc', [transfer('0x3')])
+    
+    assert db.lookups == [('0xAbc', 'polygon-mainnet'), ('0xAbc', 'eth-mainnet')]
+    assert received == [
+        ('wallet-polygon-mainnet', 'wallet-polygon-mainnet'),
+        ('wallet-eth-mainnet', 'wallet-eth-mainnet'),
+        ('wallet-polygon-mainnet', 'wallet-polygon-mainnet'),
+    ]
+
+
+def test_listeners_do_not_hold_up_ingestion():
+    ingestor = TransactionIngestor(FakeDatabase())
+    release = threading.Event()
+    delivered = []
+    
+    def slow_listener(wallet_id, address, rows):
+        release.wait(5)
+        delivered.append((threading.current_thread().name, [row['hash'] for row in rows]))
+    
+    ingestor.add_listener(slow_listener)
+    assert ingestor.ingest('ethereum', '0xabc', [transfer('0x1')])['inserted'] == 1
+    assert ingestor.ingest('ethereum', '0xabc', [transfer('0x2')])['inserted'] == 1
+    assert delivered == []
+    
+    release.set()
+    ingestor.wait_for_listeners()
+    assert delivered == [('ingestion-listeners', ['0x1']), ('ingestion-listeners', ['0x2'])]
+
+
+def test_full_queue_is_delivered_inline():
+    ingestor = TransactionIngestor(FakeDatabase(), max_pending=1)
+    release = threading.Event()
+    threads = []
+    
+    def listener(wallet_id, address, rows):
+        threads.append(threading.current_thread().name)
+        if threading.current_thread().name == 'ingestion-listeners':
+            release.wait(5)
+    
+    ingestor.add_listener(listener)
+    for tx_hash in ('0x1', '0x2', '0x3', '0x4'):
+        ingestor.ingest('ethereum', '0xabc', [transfer(tx_hash)])
+    assert threading.current_thread().name in threads
+    
+    release.set()
+    ingestor.wait_for_listeners()
+    assert len(threads) == 4
+
+
+class SqliteCursor:
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+    
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+    
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return dict(zip([d[0] for d in self.cursor.description], row)) if row else None
+    
+    def fetchall(self):
+        return [dict(zip([d[0] for d in self.cursor.description], row)) for row in self.cursor.fetchall()]
+    
+    def close(self):
+        self.cursor.close()
+
+
+def test_shared_address_resolves_to_the_wallet_with_network_history():
+    connection = sqlite3.connect(':memory:')
+    connection.execute("CREATE TABLE wallets (id, address)")
+    connection.execute("CREATE TABLE transaction_history (walletId, network)")
+    connection.executemany("INSERT INTO wallets VALUES (?, ?)", [('w-eth', '0xABC'), ('w-polygon', '0xabc')])
+    connection.execute("INSERT INTO transaction_history VALUES ('w-polygon', 'polygon-mainnet')")
+    
+    class Connection:
+        def cursor(self, dictionary=False):
+            return SqliteCursor(connection)
+    
+    db = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    db.pool = object()
+    
+    @contextmanager
+    def get_connection(statement_timeout_ms=None):
+        yield Connection()
+    
+    db.get_connection = get_connection
+    
+    assert db.get_wallet_id_for_network('0xAbC', 'polygon-mainnet') == 'w-polygon'
+    # No history on the network yet: the first row, as get_wallet_id picks
+    assert db.get_wallet_id_for_network('0xabc', 'eth-mainnet') == 'w-eth'
+    assert db.get_wallet_id_for_network('0xdef', 'eth-mainnet') is None
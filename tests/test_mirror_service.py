@@ -0,0 +1,152 @@
+"""Local analytics mirror: exact sums, NULL-network rows and the remote fallback"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip('duckdb')
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet  # noqa: E402
+
+from database_service import DatabaseService  # noqa: E402
+from mirror_service import MirrorService  # noqa: E402
+
+# Beyond DuckDB's DECIMAL(38, 18): 23 integer digits and 30 fractional digits
+WIDE = '12345678901234567890123.123456789012345678901234567891'
+DUST = '0.000000000000000000000000000001'
+TWICE_WIDE = Decimal('24691357802469135780246.246913578024691357802469135782')
+OPENING = Decimal('24691357802469135780246.246913578024691357802469135783')
+
+
+def row(value, direction='incoming', timestamp='2025-01-10 08:00:00', asset='ETH', usd_value=None):
+    return {
+        'hash': None, 'walletId': 'w', 'asset': asset, 'value': value, 'direction': direction,
+        'usdValue': usd_value, 'fromAddress': 'a', 'toAddress': 'b', 'category': 'erc20',
+        'timestamp': datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+    }
+
+
+def make_mirror(tmp_path, partitions, wallets=(('w', '0xabc'),)):
+    mirror = MirrorService(str(tmp_path))
+    for (network, month), rows in partitions.items():
+        mirror.write_partition(network, month, [rows])
+    pyarrow.parquet.write_table(
+        pa.table({'id': [w[0] for w in wallets], 'address': [w[1] for w in wallets]}), mirror.wallets_file
+    )
+    with open(mirror.manifest_file, 'w') as manifest:
+        json.dump({'partitions': {}, 'synced_at': None}, manifest)
+    return mirror
+
+
+def test_sums_keep_every_digit(tmp_path):
+    mirror = make_mirror(tmp_path, {('eth-mainnet', '2025-01'): [
+        row(WIDE, timestamp='2025-01-02 08:00:00'),
+        row(WIDE, timestamp='2025-01-03 08:00:00'),
+        row(DUST, timestamp='2025-01-04 08:00:00'),
+        row('1e-30', direction='outgoing', timestamp='2025-01-20 08:00:00', usd_value='2.5E+3'),
+    ]})
+    
+    statement = mirror.get_statement('0xabc', '2025-01-15', '2025-01-31', include_transactions=False)
+    assert statement['opening_balance']['ETH'] == OPENING
+    assert statement['period_change']['ETH'] == -Decimal(DUST)
+    assert statement['closing_balance']['ETH'] == TWICE_WIDE
+    
+    balance = mirror.get_current_balance('0xabc')
+    assert balance['balances']['ETH'] == TWICE_WIDE
+    
+    flows = mirror.get_flow_statistics('0xabc', '2025-01-01', '2025-01-31')
+    flow = flows['totals']['ETH']
+    assert flow['inflow'] == OPENING
+    assert flow['outflow'] == Decimal(DUST)
+    assert flow['usd_outflow'] == Decimal(2500)
+
+
+def test_rows_without_a_network_are_mirrored(tmp_path):
+    mirror = make_mirror(tmp_path, {
+        ('eth-mainnet', '2025-01'): [row('2')],
+        (None, '2025-01'): [row('3', timestamp='2025-01-11 08:00:00')],
+    })
+    
+    assert mirror.get_current_balance('0xabc')['balances'] == {'ETH': Decimal(5)}
+    assert mirror.get_current_balance('0xabc', network='eth-mainnet')['balances'] == {'ETH': Decimal(2)}
+    
+    networks = [tx['network'] for tx in mirror.get_transactions_in_period('0xabc', '2025-01-01', '2025-01-31')]
+    assert sorted(networks, key=str) == [None, 'eth-mainnet']
+
+
+class SqliteCursor:
+    """The parts of a mysql.connector dictionary cursor the sync uses"""
+    
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+    
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+    
+    def _rows(self, rows):
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, values)) for values in rows]
+    
+    def fetchall(self):
+        return self._rows(self.cursor.fetchall())
+    
+    def fetchmany(self, size):
+        return self._rows(self.cursor.fetchmany(size))
+    
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+        self.connection.create_function('DATE_FORMAT', 2, lambda timestamp, fmt: timestamp[:7])
+        self.connection.execute(
+            "CREATE TABLE transaction_history (walletId, hash, timestamp TIMESTAMP, asset, value, direction, "
+            "usdValue, network, fromAddress, toAddress, category)"
+        )
+        self.connection.execute("CREATE TABLE wallets (id, address)")
+        self.connection.execute("INSERT INTO wallets VALUES ('w', '0xabc')")
+        self.connection.executemany(
+            "INSERT INTO transaction_history VALUES ('w', NULL, ?, 'ETH', ?, 'incoming', NULL, ?, 'a', 'b', 'erc20')",
+            [('2025-01-10 08:00:00', '2', 'eth-mainnet'), ('2025-01-11 08:00:00', '3', None)]
+        )
+    
+    def cursor(self, dictionary=False, buffered=True):
+        return SqliteCursor(self.connection)
+
+
+def test_sync_copies_rows_without_a_network(tmp_path):
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    connection = SqliteConnection()
+    
+    @contextmanager
+    def get_connection(statement_timeout_ms=None):
+        yield connection
+    
+    database.get_connection = get_connection
+    mirror = MirrorService(str(tmp_path))
+    
+    stats = mirror.sync(database)
+    assert stats['partitions'] == 2 and stats['rows_copied'] == 2
+    assert mirror.get_current_balance('0xabc')['balances'] == {'ETH': Decimal(5)}
+    
+    # Unchanged partitions, including the NULL-network one, are not copied again
+    assert mirror.sync(database)['copied'] == 0
+
+
+def test_wallets_missing_from_the_mirror_read_the_remote_database(tmp_path):
+    mirror = make_mirror(tmp_path, {('eth-mainnet', '2025-01'): [row('2')]})
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    database.read_mode = 'mirror'
+    database.mirror = mirror
+    
+    assert database._from_mirror('get_current_balance', '0xabc', None, None)['balances'] == {'ETH': Decimal(2)}
+    # Added to MySQL after the last sync
+    assert database._from_mirror('get_current_balance', '0xnew', None, None) is None
+    assert database._from_mirror('get_statements_batch', ['0xabc', '0xnew'], '2025-01-01', None, None) is None
+    assert database._from_mirror('get_statements_batch', ['0xabc'], '2025-01-01', None, None) is not None
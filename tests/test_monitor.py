@@ -0,0 +1,197 @@
+"""Account monitor scheduling (no database access)"""
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from monitor import AccountMonitor, RateBudget
+
+
+class FakeDatabase:
+    daily_balances = None
+
+
+def make_monitor(**settings):
+    monitor = AccountMonitor(FakeDatabase(), None, **settings)
+    monitor.ensure_schema = lambda: None
+    return monitor
+
+
+def test_standby_monitor_does_not_poll():
+    monitor = make_monitor(poll_interval=0.01)
+    attempts = []
+    monitor._acquire_lock = lambda: attempts.append(1)
+    monitor.refresh_wallets = lambda: (_ for _ in ()).throw(AssertionError('standby monitor polled'))
+    
+    thread = threading.Thread(target=monitor.run)
+    thread.start()
+    time.sleep(0.1)
+    monitor.stop()
+    thread.join(1)
+    
+    assert not thread.is_alive()
+    # It keeps trying to take over
+    assert len(attempts) > 1
+
+
+def test_monitor_releases_the_lock_when_stopped():
+    monitor = make_monitor(poll_interval=0.01)
+    released = []
+    monitor._acquire_lock = lambda: 'lock'
+    monitor._holds_lock = lambda lock: True
+    monitor._release_lock = released.append
+    monitor.refresh_wallets = lambda: 0
+    
+    thread = threading.Thread(target=monitor.run)
+    thread.start()
+    time.sleep(0.05)
+    assert monitor._leading
+    monitor.stop()
+    thread.join(1)
+    
+    assert released == ['lock']
+    assert not monitor._leading
+
+
+def test_run_once_skips_while_another_monitor_runs():
+    monitor = make_monitor()
+    monitor._acquire_lock = lambda: None
+    monitor.refresh_wallets = lambda: (_ for _ in ()).throw(AssertionError('polled without the lock'))
+    
+    monitor.run_once()
+
+
+def test_adaptive_interval_follows_activity():
+    monitor = make_monitor(min_interval=60, max_interval=3600)
+    job = {'interval': 600, 'activity_rate': 0.0, 'last_polled_at': time.time() - 600, 'last_change_at': None}
+    
+    monitor._adapt(job, inserted=0)
+    assert job['interval'] == 1200
+    
+    monitor._adapt(job, inserted=50)
+    assert 60 <= job['interval'] <= 600
+    assert job['activity_rate'] > 0
+
+
+def test_rate_budget_keeps_an_interactive_reserve():
+    budget = RateBudget(60, interactive_share=0.5)
+    
+    assert budget.try_acquire(30) == 0
+    # Background polls cannot dip into the reserve
+    assert budget.try_acquire(30) > 0
+    assert budget.try_acquire(30, interactive=True) == 0
+
+
+def test_monitor_stands_by_after_losing_the_lock():
+    monitor = make_monitor(poll_interval=0.01, wallet_refresh=0)
+    acquired, released = [], []
+    monitor._acquire_lock = lambda: acquired.append('lock') or ('lock' if len(acquired) == 1 else None)
+    monitor._holds_lock = lambda lock: False
+    monitor._release_lock = released.append
+    monitor.refresh_wallets = lambda: 0
+    
+    thread = threading.Thread(target=monitor.run)
+    thread.start()
+    time.sleep(0.1)
+    monitor.stop()
+    thread.join(1)
+    
+    assert released == ['lock']
+    assert len(acquired) > 1
+
+
+def make_job(wallet_id='w', blockchain='ethereum', address='0xabc'):
+    return {
+        'wallet_id': wallet_id, 'address': address, 'blockchain': blockchain, 'activity_rate': 0.0,
+        'interval': 300, 'last_change_at': None, 'last_polled_at': None, 'last_inserted': 0,
+        'lock': threading.Lock()
+    }
+
+
+def test_interactive_and_background_polls_of_a_pair_do_not_overlap():
+    monitor = make_monitor(interactive_share=0.5)
+    job = make_job()
+    monitor.jobs = {('w', 'ethereum'): job}
+    monitor._wallets_loaded_at = time.time()
+    running, overlaps = [], []
+    
+    def poll(polled_job):
+        overlaps.append(bool(running))
+        running.append(1)
+        time.sleep(0.05)
+        running.pop()
+        return 1, 2
+    monitor.poll = poll
+    
+    background = threading.Thread(target=monitor._run_job, args=(job,))
+    background.start()
+    time.sleep(0.01)
+    inserted = monitor.poll_wallet_now('0xABC', max_wait=1)
+    background.join(1)
+    
+    assert overlaps == [False, False]
+    # The interactive refresh reports its own poll, not whatever ran last
+    assert inserted == 2
+
+
+def test_interactive_refresh_has_one_deadline_for_every_chain():
+    monitor = make_monitor(budgets={'etherscan': 0, 'tron': 0})
+    monitor.jobs = {
+        ('w', 'ethereum'): make_job(),
+        ('w', 'polygon'): make_job(blockchain='polygon'),
+        ('w', 'tron'): make_job(blockchain='tron'),
+    }
+    monitor._wallets_loaded_at = time.time()
+    monitor.poll = lambda job: (_ for _ in ()).throw(AssertionError('polled without budget'))
+    for budget in monitor.budgets.values():
+        budget.try_acquire = lambda calls, interactive=False: 0.2
+    
+    started = time.time()
+    assert monitor.poll_wallet_now('0xabc', max_wait=0.3) == 0
+    assert time.time() - started < 0.5
+
+
+class FakeWalletDatabase(FakeDatabase):
+    def __init__(self):
+        self.queries = []
+    
+    @contextmanager
+    def get_connection(self):
+        database = self
+        
+        class Cursor:
+            def execute(self, query, params=None):
+                database.queries.append(' '.join(query.split()))
+                if 'FROM wallets' in query:
+                    self.rows = [{'id': 'w1', 'address': '0xabc'}, {'id': 'w2', 'address': '0xdef'}]
+                elif 'FROM monitor_watermarks' in query:
+                    self.rows = [{'walletId': 'w1', 'network': 'polygon-mainnet', 'last_timestamp': datetime(2020, 1, 1)}]
+                else:
+                    self.rows = [{'walletId': 'w2', 'network': 'bnb-mainnet'}]
+            
+            def fetchall(self):
+                return self.rows
+            
+            def close(self):
+                pass
+        
+        class Connection:
+            def cursor(self, dictionary=False):
+                return Cursor()
+        
+        yield Connection()
+
+
+def test_pairs_come_from_watermarks_without_aggregating_history():
+    monitor = AccountMonitor(FakeWalletDatabase(), None, poll_interval=300, max_interval=3600)
+    
+    assert monitor.refresh_wallets() == 2
+    
+    assert set(monitor.jobs) == {('w1', 'polygon'), ('w2', 'bsc')}
+    # Quiet for over a week: starts at the slowest interval
+    assert monitor.jobs[('w1', 'polygon')]['interval'] == 3600
+    history = [query for query in monitor.db.queries if 'transaction_history' in query]
+    assert history == [
+        'SELECT DISTINCT walletId, network FROM transaction_history WHERE walletId IN (%s) AND network IS NOT NULL'
+    ]
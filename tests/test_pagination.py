@@ -0,0 +1,143 @@
+"""Keyset pagination across rows with NULL key columns"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from database_service import DatabaseService, decode_page_cursor, encode_page_cursor
+
+BOUNDARY = '2025-01-15 12:00:00'
+
+# Several rows share the boundary timestamp; some have no hash or asset
+ROWS = [
+    ('0xc', BOUNDARY, 'ETH', 'incoming'),
+    ('0xb', BOUNDARY, 'ETH', 'outgoing'),
+    (None, BOUNDARY, 'USDC', 'incoming'),
+    (None, BOUNDARY, None, 'incoming'),
+    (None, BOUNDARY, None, None),
+    ('0xa', '2025-01-10 08:00:00', None, 'outgoing'),
+    ('0xd', '2025-01-20 09:00:00', 'ETH', 'incoming'),
+]
+
+
+class SqliteCursor:
+    """The parts of a mysql.connector dictionary cursor the page query uses"""
+    
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+    
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+    
+    def fetchall(self):
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    # SQLite, like MySQL, sorts NULLs as the smallest value (last in DESC order)
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute(
+            "CREATE TABLE transaction_history (walletId, hash, timestamp, asset, value, direction, usdValue, "
+            "network, fromAddress, toAddress, category)"
+        )
+        self.connection.executemany(
+            "INSERT INTO transaction_history VALUES ('w', ?, ?, ?, '1', ?, NULL, 'eth-mainnet', 'a', 'b', 'erc20')",
+            ROWS
+        )
+    
+    def cursor(self, dictionary=False, buffered=True):
+        return SqliteCursor(self.connection)
+
+
+def page_through(get_page, limit):
+    listed, after, pages = [], None, 0
+    while True:
+        page = get_page(limit, after)
+        listed.extend((row['transaction_hash'], str(row['transaction_date']), row['token_symbol'], row['direction'])
+                      for row in page['transactions'])
+        pages += 1
+        if not page['has_more']:
+            return listed
+        after = page['next_cursor']
+        assert pages < 20
+
+
+def expected_order():
+    # DESC with NULLs last on every key column
+    def key(row):
+        return tuple((value is not None, value or '') for value in (row[1], row[0], row[2], row[3]))
+    return sorted(ROWS, key=key, reverse=True)
+
+
+@pytest.fixture
+def database():
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    database.pool = object()
+    database.get_wallet_id = lambda address: 'w'
+    sqlite = SqliteConnection()
+    
+    @contextmanager
+    def get_connection(statement_timeout_ms=None):
+        yield sqlite
+    database.get_connection = get_connection
+    return database
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 10])
+def test_pages_cover_every_row_across_null_keys(database, limit):
+    listed = page_through(
+        lambda limit, after: database.get_transactions_page('0xabc', '2025-01-01', '2025-01-31', limit=limit, after=after),
+        limit
+    )
+    
+    assert listed == expected_order()
+
+
+def test_cursor_keeps_null_apart_from_empty():
+    cursor = encode_page_cursor({
+        'transaction_date': datetime(2025, 1, 15, 12), 'transaction_hash': None,
+        'token_symbol': '', 'direction': 'incoming'
+    })
+    
+    assert decode_page_cursor(cursor) == ['2025-01-15 12:00:00', None, '', 'incoming']
+
+
+def test_malformed_cursors_are_rejected():
+    import base64
+    for key in ([None, None, None, None], [1, 2, 3, 4], ['a', 'b']):
+        with pytest.raises(ValueError):
+            decode_page_cursor(base64.urlsafe_b64encode(json.dumps(key).encode()).decode())
+
+
+def test_mirror_pages_cover_every_row_across_null_keys(tmp_path):
+    pytest.importorskip('duckdb')
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    from mirror_service import MirrorService
+    
+    mirror = MirrorService(str(tmp_path))
+    mirror.write_partition('eth-mainnet', '2025-01', [[
+        {'hash': tx_hash, 'walletId': 'w', 'asset': asset, 'value': '1', 'direction': direction, 'usdValue': None,
+         'fromAddress': 'a', 'toAddress': 'b', 'category': 'erc20',
+         'timestamp': datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')}
+        for tx_hash, timestamp, asset, direction in ROWS
+    ]])
+    pyarrow.parquet.write_table(pa.table({'id': ['w'], 'address': ['0xabc']}), mirror.wallets_file)
+    with open(mirror.manifest_file, 'w') as manifest:
+        json.dump({'partitions': {}, 'synced_at': None}, manifest)
+    
+    for limit in (1, 2, 10):
+        listed = page_through(
+            lambda limit, after: mirror.get_transactions_page('0xabc', '2025-01-01', '2025-01-31', limit=limit, after=after),
+            limit
+        )
+        assert listed == expected_order()
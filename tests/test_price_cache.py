@@ -0,0 +1,61 @@
+"""SQLite price cache shared between processes"""
+
+import time
+
+import pytest
+
+from price_cache import PriceCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'prices.sqlite3')
+
+
+def test_values_are_shared_and_expire(path):
+    writer, reader = PriceCache(path, max_age=60), PriceCache(path, max_age=60)
+    writer.put_many({'spot:ETH': {'usd': 3500.5}, 'spot:BTC': {'usd': 60000}})
+    writer.put('spot:OLD', {'usd': 1}, fetched_at=time.time() - 120)
+    
+    found = reader.get_many(['spot:ETH', 'spot:BTC', 'spot:OLD', 'spot:SOL'])
+    
+    assert {key: value for key, (value, _) in found.items()} == {
+        'spot:ETH': {'usd': 3500.5}, 'spot:BTC': {'usd': 60000}
+    }
+    assert reader.get('spot:OLD') is None
+
+
+def test_only_one_process_holds_a_lease(path):
+    first, second = PriceCache(path), PriceCache(path)
+    
+    assert first.acquire_leases(['spot:ETH', 'spot:BTC']) == {'spot:ETH', 'spot:BTC'}
+    assert second.acquire_leases(['spot:ETH', 'spot:SOL']) == {'spot:SOL'}
+    # Holding a lease again is allowed
+    assert first.acquire_leases(['spot:ETH']) == {'spot:ETH'}
+
+
+def test_storing_or_releasing_frees_the_lease(path):
+    first, second = PriceCache(path), PriceCache(path)
+    first.acquire_leases(['spot:ETH', 'spot:BTC'])
+    
+    first.put('spot:ETH', {'usd': 3500})
+    first.release_leases(['spot:BTC'])
+    
+    assert second.acquire_leases(['spot:ETH', 'spot:BTC']) == {'spot:ETH', 'spot:BTC'}
+
+
+def test_expired_leases_are_taken_over(path):
+    first, second = PriceCache(path, lease_seconds=-1), PriceCache(path)
+    first.acquire_leases(['spot:ETH'])
+    
+    assert second.acquire_leases(['spot:ETH']) == {'spot:ETH'}
+
+
+def test_unusable_path_degrades_to_misses_and_granted_leases(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = PriceCache(str(blocker / 'prices.sqlite3'))
+    
+    cache.put('spot:ETH', {'usd': 1})
+    assert cache.get('spot:ETH') is None
+    assert cache.acquire_leases(['spot:ETH']) == {'spot:ETH'}
@@ -0,0 +1,77 @@
+"""Historical price store: request-path lookups and miss caching (CoinGecko is faked)"""
+
+import time
+
+import numpy as np
+
+from price_history import PriceHistoryStore, SECONDS_PER_DAY
+
+DAY = 20000
+
+
+class FakeCoinGecko:
+    """fetch_range stand-in pricing the days in prices; raises while failing is set"""
+    
+    def __init__(self, prices=None, failing=False):
+        self.prices = prices or {}
+        self.failing = failing
+        self.calls = []
+    
+    def __call__(self, coin_id, start_day, end_day):
+        self.calls.append((coin_id, start_day, end_day))
+        if self.failing:
+            raise ConnectionError('CoinGecko is unreachable')
+        return {day: price for day, price in self.prices.items() if start_day <= day <= end_day}
+
+
+def test_lookup_queues_missing_days_instead_of_fetching(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.fetch_range = FakeCoinGecko({DAY: 2.0, DAY + 1: 3.0})
+    loaded = []
+    store.load_range = lambda coin_id, start_day, end_day: loaded.append((coin_id, start_day, end_day))
+    store.request_range = lambda coin_id, start_day, end_day: loaded.append(('queued', coin_id, start_day, end_day))
+    
+    prices = store.lookup(['ethereum', 'ethereum'], [DAY * SECONDS_PER_DAY, (DAY + 1) * SECONDS_PER_DAY])
+    
+    assert np.isnan(prices).all()
+    assert loaded == [('queued', 'ethereum', DAY, DAY + 1)]
+    assert store.fetch_range.calls == []
+
+
+def test_background_loader_fills_the_store(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.fetch_range = FakeCoinGecko({DAY: 2.0})
+    
+    store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY])
+    deadline = time.time() + 5
+    while not len(store._series_for('ethereum')[0]) and time.time() < deadline:
+        time.sleep(0.01)
+    
+    assert store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY]).tolist() == [2.0]
+
+
+def test_failed_and_unpriced_days_are_not_refetched_within_the_ttl(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), background_loads=False)
+    store.fetch_range = FakeCoinGecko(failing=True)
+    
+    store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY], fetch_missing=True)
+    store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY], fetch_missing=True)
+    assert len(store.fetch_range.calls) == 1
+    
+    # A successful fetch with a gap in CoinGecko's data remembers the gap
+    store.fetch_range = FakeCoinGecko({DAY + 10: 5.0})
+    assert store.load_range('ethereum', DAY + 10, DAY + 11) == 1
+    assert store.load_range('ethereum', DAY + 10, DAY + 11) == 0
+    assert len(store.fetch_range.calls) == 1
+
+
+def test_misses_expire(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), miss_ttl=60, background_loads=False)
+    store.fetch_range = FakeCoinGecko(failing=True)
+    store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY], fetch_missing=True)
+    
+    store._misses['ethereum'][DAY] -= 61
+    store.fetch_range.failing = False
+    store.fetch_range.prices = {DAY: 4.0}
+    
+    assert store.lookup(['ethereum'], [DAY * SECONDS_PER_DAY], fetch_missing=True).tolist() == [4.0]
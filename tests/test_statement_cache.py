@@ -0,0 +1,69 @@
+"""Watermark-invalidated statement cache"""
+
+from decimal import Decimal
+
+from database_service import DatabaseService
+from statement_cache import StatementCache
+
+
+def test_hit_only_at_the_same_watermark():
+    cache = StatementCache()
+    cache.put(('w', None, '2025-01-01', '2025-01-31'), (10, '2025-01-31'), {'closing': 1})
+    
+    assert cache.get(('w', None, '2025-01-01', '2025-01-31'), (10, '2025-01-31')) == {'closing': 1}
+    # A new row moved the watermark
+    assert cache.get(('w', None, '2025-01-01', '2025-01-31'), (11, '2025-02-01')) is None
+    # and the stale entry is gone
+    assert cache.get(('w', None, '2025-01-01', '2025-01-31'), (10, '2025-01-31')) is None
+    
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+
+
+def test_expired_entries_miss():
+    cache = StatementCache(ttl=-1)
+    cache.put(('w',), (1, None), 'statement')
+    
+    assert cache.get(('w',), (1, None)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = StatementCache(max_entries=2)
+    cache.put(('a',), (1,), 'a')
+    cache.put(('b',), (1,), 'b')
+    cache.get(('a',), (1,))
+    cache.put(('c',), (1,), 'c')
+    
+    assert cache.get(('b',), (1,)) is None
+    assert cache.get(('a',), (1,)) == 'a'
+    assert cache.get(('c',), (1,)) == 'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_oversized_statements_are_not_cached():
+    cache = StatementCache(max_rows_per_entry=10)
+    cache.put(('w',), (1,), 'statement', row_count=11)
+    
+    assert cache.stats()['entries'] == 0
+
+
+def test_callers_cannot_change_cached_statements():
+    cache = StatementCache()
+    statement = {'closing_balance': {'USDC': Decimal('1')}, 'transactions': [{'hash': '0x1'}]}
+    cache.put(('w',), (1,), statement)
+    
+    statement['closing_balance']['USDC'] = Decimal('0')
+    hit = cache.get(('w',), (1,))
+    hit['transactions'].append({'hash': '0x2'})
+    
+    assert cache.get(('w',), (1,)) == {'closing_balance': {'USDC': Decimal('1')}, 'transactions': [{'hash': '0x1'}]}
+
+
+def test_watermark_probe_is_plan_checked_and_sees_rewritten_rows():
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    
+    query, params = database.statement_queries('wallet-1', '2025-01-01', '2025-01-31', 'eth-mainnet')['history_watermark']
+    
+    # An in-place update keeps the row count and latest timestamp but changes the checksum
+    assert 'CRC32(CONCAT_WS(' in query and 'value' in query
+    assert params == ['wallet-1', 'eth-mainnet']
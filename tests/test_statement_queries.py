@@ -0,0 +1,158 @@
+"""Statement, batch statement and streaming queries run against SQLite"""
+
+import sqlite3
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+
+from database_service import DatabaseService
+
+# (walletId, timestamp, asset, value, direction, network); amounts are exact in binary
+HISTORY = [
+    ('w1', '2025-01-02 10:00:00', 'ETH', '2.5', 'incoming', 'eth-mainnet'),
+    ('w1', '2025-01-10 10:00:00', 'ETH', '0.25', 'outgoing', 'eth-mainnet'),
+    ('w1', '2025-01-10 11:00:00', 'USDC', '100', 'incoming', 'polygon-mainnet'),
+    ('w1', '2025-01-20 09:00:00', 'ETH', '1', 'incoming', 'eth-mainnet'),
+    ('w1', '2025-01-21 09:00:00', 'USDC', '40', 'outgoing', 'polygon-mainnet'),
+    ('w1', '2025-01-22 09:00:00', 'ETH', None, 'incoming', 'eth-mainnet'),
+    ('w1', '2025-02-05 09:00:00', 'ETH', '8', 'incoming', 'eth-mainnet'),
+    ('w2', '2025-01-03 10:00:00', 'SOL', '12', 'incoming', 'sol-mainnet'),
+    ('w2', '2025-01-25 10:00:00', 'SOL', '4.5', 'outgoing', 'sol-mainnet'),
+    ('w3', '2025-01-26 10:00:00', 'BTC', '0.5', 'incoming', 'btc-mainnet'),
+]
+
+
+class SqliteCursor:
+    """The parts of a mysql.connector dictionary cursor the statement queries use"""
+    
+    def __init__(self, connection, buffered):
+        self.connection = connection
+        self.cursor = connection.sqlite.cursor()
+        self.buffered = buffered
+    
+    def execute(self, query, params=()):
+        self.connection.queries.append((' '.join(query.split()), self.buffered))
+        self.cursor.execute(query.replace('%s', '?'), params)
+    
+    def _rows(self, rows):
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return self._rows([row])[0] if row else None
+    
+    def fetchall(self):
+        return self._rows(self.cursor.fetchall())
+    
+    def fetchmany(self, size):
+        self.connection.fetches.append(size)
+        return self._rows(self.cursor.fetchmany(size))
+    
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self):
+        self.sqlite = sqlite3.connect(':memory:')
+        self.sqlite.execute("CREATE TABLE wallets (id, address)")
+        self.sqlite.executemany(
+            "INSERT INTO wallets VALUES (?, ?)", [('w1', '0xAAA'), ('w2', '0xbbb'), ('w3', '0xccc')]
+        )
+        self.sqlite.execute(
+            "CREATE TABLE transaction_history (walletId, hash, timestamp, asset, value, direction, usdValue, "
+            "network, fromAddress, toAddress, category)"
+        )
+        self.sqlite.executemany(
+            "INSERT INTO transaction_history VALUES (?, 'h' || ?, ?, ?, ?, ?, NULL, ?, 'a', 'b', 'erc20')",
+            [(wallet_id, i, timestamp, asset, value, direction, network)
+             for i, (wallet_id, timestamp, asset, value, direction, network) in enumerate(HISTORY)]
+        )
+        self.queries = []
+        self.fetches = []
+        self.unread_result = False
+    
+    def cursor(self, dictionary=False, buffered=True):
+        return SqliteCursor(self, buffered)
+
+
+@pytest.fixture
+def database():
+    connection = SqliteConnection()
+    database = DatabaseService('127.0.0.1', 1, 'user', 'password', 'db')
+    database.pool = object()
+    
+    @contextmanager
+    def get_connection(statement_timeout_ms=None):
+        yield connection
+    
+    database.get_connection = get_connection
+    database.connection = connection
+    return database
+
+
+def history_queries(database):
+    return [query for query, _ in database.connection.queries if 'FROM transaction_history' in query]
+
+
+@pytest.mark.parametrize('network', [None, 'eth-mainnet'])
+def test_statement_matches_the_separate_balance_queries(database, network):
+    opening = database.calculate_opening_balance('0xaaa', '2025-01-15', network)
+    current = database.get_current_balance('0xaaa', '2025-01-31', network)
+    database.connection.queries.clear()
+    
+    statement = database.get_statement('0xaaa', '2025-01-15', '2025-01-31', network, include_transactions=False)
+    
+    assert statement['opening_balance'] == opening['balances']
+    assert statement['closing_balance'] == current['balances']
+    assert statement['transactions_counted_for_opening'] == opening['transactions_counted']
+    # One conditional-aggregation scan instead of one per balance
+    queries = history_queries(database)
+    assert len(queries) == 1
+    assert 'AS opening' in queries[0] and 'AS period_change' in queries[0]
+
+
+def test_statement_values(database):
+    statement = database.get_statement('0xaaa', '2025-01-15', '2025-01-31')
+    
+    assert statement['opening_balance'] == {'ETH': Decimal('2.25'), 'USDC': Decimal('100')}
+    assert statement['period_change'] == {'ETH': Decimal('1'), 'USDC': Decimal('-40')}
+    assert statement['closing_balance'] == {'ETH': Decimal('3.25'), 'USDC': Decimal('60')}
+    assert statement['transactions_counted_for_opening'] == 3
+    assert len(statement['transactions']) == 3
+
+
+def test_batch_matches_single_statements(database):
+    addresses = ['0xaaa', '0xBBB', '0xccc', '0xmissing']
+    batch = database.get_statements_batch(addresses, '2025-01-15', '2025-01-31', wallets_per_query=2)
+    
+    assert batch['not_found'] == ['0xmissing']
+    for address in addresses[:3]:
+        single = database.get_statement(address, '2025-01-15', '2025-01-31', include_transactions=False)
+        for field in ('opening_balance', 'period_change', 'closing_balance', 'transactions_counted_for_opening'):
+            assert batch['wallets'][address][field] == single[field]
+
+
+def test_batch_groups_wallets_into_few_queries(database):
+    database.get_statements_batch(['0xaaa', '0xbbb', '0xccc'], '2025-01-15', '2025-01-31', wallets_per_query=2)
+    
+    queries = history_queries(database)
+    assert len(queries) == 2
+    assert all('GROUP BY walletId, asset' in query for query in queries)
+
+
+def test_period_rows_stream_from_an_unbuffered_cursor(database):
+    listed = database.get_transactions_in_period('0xaaa', '2025-01-01', '2025-01-31')
+    database.connection.queries.clear()
+    
+    rows = database.iter_transactions_in_period('0xaaa', '2025-01-01', '2025-01-31', chunk_size=2)
+    assert database.connection.fetches == []
+    first = next(rows)
+    assert database.connection.fetches == [2]
+    
+    streamed = [first] + list(rows)
+    assert [row['transaction_hash'] for row in streamed] == [row['transaction_hash'] for row in listed]
+    assert database.connection.fetches == [2, 2, 2, 2]
+    assert [buffered for query, buffered in database.connection.queries if 'FROM transaction_history' in query] == [False]
@@ -0,0 +1,63 @@
+"""In-process wallet registry lookups"""
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+from wallet_registry import WalletRegistry
+
+
+class SqliteCursor:
+    """The parts of a mysql.connector dictionary cursor the registry uses"""
+    
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+    
+    def execute(self, query, params=()):
+        if query.startswith('SHOW COLUMNS'):
+            # No addressNormalized column
+            query, params = "SELECT NULL WHERE 0", ()
+        self.cursor.execute(query.replace('%s', '?'), params)
+    
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return dict(zip([d[0] for d in self.cursor.description], row)) if row else None
+    
+    def fetchall(self):
+        return [dict(zip([d[0] for d in self.cursor.description], row)) for row in self.cursor.fetchall()]
+    
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteDatabase:
+    def __init__(self, wallets):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute("CREATE TABLE wallets (id, address)")
+        self.connection.executemany("INSERT INTO wallets VALUES (?, ?)", wallets)
+    
+    @contextmanager
+    def get_connection(self):
+        database = self
+        
+        class Connection:
+            def cursor(self, dictionary=False):
+                return SqliteCursor(database.connection)
+        
+        yield Connection()
+
+
+def test_colliding_addresses_keep_the_first_wallet(caplog):
+    registry = WalletRegistry(SqliteDatabase([('w-1', '0xABC'), ('w-2', ' 0xabc'), ('w-3', '0xdef')]))
+    
+    with caplog.at_level(logging.WARNING, logger='wallet_registry'):
+        assert registry.load() == 2
+    assert registry.get_wallet_id('0xAbc') == 'w-1'
+    assert 'w-1 and w-2 share address 0xabc' in caplog.text
+
+
+def test_batch_lookups_keep_the_first_wallet_too():
+    registry = WalletRegistry(SqliteDatabase([('w-1', '0xabc'), ('w-2', '0xABC'), ('w-3', '0xdef')]))
+    registry.loaded_at = float('inf')
+    
+    assert registry.get_wallet_ids(['0xAbc', '0xDEF', '0x0']) == {'0xAbc': 'w-1', '0xDEF': 'w-3'}
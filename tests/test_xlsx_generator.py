@@ -0,0 +1,80 @@
+"""Constant-memory XLSX statements (read back as the raw sheet XML)"""
+
+import zipfile
+import xml.etree.ElementTree as ET
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip('xlsxwriter')
+
+import xlsx_generator
+from xlsx_generator import XLSXGenerator
+
+NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def read_workbook(path):
+    """{sheet name: {cell ref: text}}"""
+    with zipfile.ZipFile(path) as archive:
+        names = [sheet.get('name') for sheet in ET.fromstring(archive.read('xl/workbook.xml')).iterfind('.//x:sheet', NS)]
+        sheets = {}
+        for number, name in enumerate(names, start=1):
+            cells = {}
+            for cell in ET.fromstring(archive.read(f'xl/worksheets/sheet{number}.xml')).iterfind('.//x:c', NS):
+                cells[cell.get('r')] = ''.join(cell.itertext())
+            sheets[name] = cells
+        return sheets
+
+
+def transactions(count=3):
+    return [
+        {'timestamp': 1700000000 + i, 'hash': f'0x{i}', 'direction': 'in' if i % 2 else 'out',
+         'from': 'a', 'to': 'b', 'amount': Decimal('0.25') * i, 'blockNumber': str(100 + i)}
+        for i in range(count)
+    ]
+
+
+def write(path, rows, **kwargs):
+    return XLSXGenerator().write_statement(
+        str(path), 'a', 'ethereum', rows, {'ETH': Decimal('1.5')}, {'USDC': Decimal('12345678901.5')},
+        crypto_symbol='ETH', start_date='2025-01-01', end_date='2025-01-31', **kwargs
+    )
+
+
+def test_statement_sheets_and_typed_cells(tmp_path):
+    rows = transactions()[::-1] + [dict(transactions(1)[0], hash='0xbig', amount=Decimal('12345678901.25'), timestamp=1700000009)]
+    
+    summary = write(tmp_path / 'statement.xlsx', rows)
+    sheets = read_workbook(tmp_path / 'statement.xlsx')
+    
+    assert summary == {'total': 4, 'incoming': 1, 'outgoing': 3}
+    assert list(sheets) == ['Opening Balance', 'Transactions', 'Closing Balance']
+    transactions_sheet = sheets['Transactions']
+    assert [transactions_sheet[f'B{row}'] for row in range(2, 6)] == ['0x0', '0x1', '0x2', '0xbig']
+    assert float(transactions_sheet['G5']) == 12345678901.25
+    assert transactions_sheet['J2'] == '100'
+    assert float(sheets['Closing Balance']['B7']) == 12345678901.5
+
+
+def test_long_periods_continue_on_further_sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(xlsx_generator, 'MAX_ROWS_PER_SHEET', 2)
+    
+    write(tmp_path / 'statement.xlsx', iter(transactions(5)), presorted=True)
+    sheets = read_workbook(tmp_path / 'statement.xlsx')
+    
+    assert list(sheets) == [
+        'Opening Balance', 'Transactions', 'Transactions (2)', 'Transactions (3)', 'Closing Balance'
+    ]
+    assert sheets['Transactions (3)']['B2'] == '0x4'
+
+
+def test_stream_removes_its_temporary_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(xlsx_generator.tempfile, 'tempdir', str(tmp_path))
+    
+    data = b''.join(XLSXGenerator().stream_statement(
+        'a', 'ethereum', transactions(), {}, {}, start_date='2025-01-01', end_date='2025-01-31', chunk_size=1024
+    ))
+    
+    assert data[:2] == b'PK'
+    assert not list(tmp_path.glob('*.xlsx'))